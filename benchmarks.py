@@ -0,0 +1,325 @@
+"""Benchmarks and load tests for the voice assistant, run with ``python voiceAssistant.py --benchmark``."""
+import os
+import time
+import json
+import asyncio
+import tempfile
+import subprocess
+import sys
+from typing import Optional, Dict, Any, Iterable
+from pathlib import Path
+import speech_recognition as sr
+from voiceAssistant import (
+    Contact, ContactIndex, Endpointer, INTEGRATIONS, IntentRouter, ScreenCapture, VoiceAssistant,
+    WakeWordDetector, load_script, read_wav,
+)
+from fakes import FakeIntegrations, FakeScreen, headless_assistant, write_wake_word_fixtures
+
+def percentile(values: Iterable[float], q: float) -> Optional[float]:
+    """Return the nearest-rank percentile of values, with q between 0 and 1."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[max(0, min(len(ordered) - 1, int(-(-q * len(ordered) // 1)) - 1))]
+
+BENCHMARK_CORPUS = [
+    "what's the time",
+    "tell me a joke",
+    "check battery",
+    "what's the weather",
+    "search wikipedia for alan turing",
+    "play lofi beats on youtube",
+    "search google for weather radar",
+    "send a whatsapp to mom saying i'll be late",
+    "take a screenshot called desktop",
+    "volume up",
+    "good morning",
+    "hello",
+    "what can you do",
+]
+
+def benchmark_dispatch(sizes: Iterable[int] = (20, 100, 500, 1000), repeats: int = 20):
+    """Compare router dispatch cost with an if/elif substring chain as custom intents grow."""
+    import random
+    
+    rng = random.Random(0)
+    vocabulary = [f"word{i}" for i in range(5000)]
+    filler = "please could you go ahead and do the thing for me right now".split()
+    
+    print(f"{'intents':>8} {'router us/cmd':>14} {'chain us/cmd':>13}")
+    for size in sizes:
+        router = IntentRouter()
+        phrases = []
+        for i in range(size):
+            phrase = " ".join(rng.sample(vocabulary, 2))
+            router.register(f"custom_{i}", lambda command: None, [phrase], priority=rng.randint(0, 100))
+            phrases.append(phrase)
+        
+        commands = []
+        for _ in range(200):
+            words = rng.sample(filler, 6)
+            if rng.random() < 0.5:
+                words.insert(rng.randint(0, 6), rng.choice(phrases))
+            commands.append(" ".join(words))
+        
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for command in commands:
+                router.match(command)
+        router_cost = (time.perf_counter() - start) / (repeats * len(commands))
+        
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for command in commands:
+                for phrase in phrases:
+                    if phrase in command:
+                        break
+        chain_cost = (time.perf_counter() - start) / (repeats * len(commands))
+        
+        print(f"{size:>8} {router_cost * 1e6:>14.2f} {chain_cost * 1e6:>13.2f}")
+
+def benchmark_contacts(size: int = 10000, lookups: int = 500):
+    """Measure contact index build time and exact/fuzzy lookup latency on a synthetic address book."""
+    import random
+    
+    rng = random.Random(0)
+    first = ["raj", "amit", "priya", "neha", "rahul", "anita", "vikram", "sunita", "arjun", "kavya"]
+    last = ["sharma", "verma", "gupta", "singh", "patel", "kumar", "mehta", "joshi", "reddy", "nair"]
+    contacts = [
+        Contact(f"{rng.choice(first)} {rng.choice(last)} {i}", f"+91{i:010d}", [f"{rng.choice(first)}{i}"])
+        for i in range(size)
+    ]
+    
+    start = time.perf_counter()
+    index = ContactIndex(contacts)
+    print(f"Indexed {size} contacts in {(time.perf_counter() - start) * 1000:.1f} ms")
+    
+    def misspell(name: str) -> str:
+        position = rng.randrange(len(name))
+        return name[:position] + rng.choice("aeiou") + name[position + 1:]
+    
+    for label, make_query in [("exact", lambda c: c.name), ("misspelled", lambda c: misspell(c.name))]:
+        queries = [(contact, make_query(contact)) for contact in rng.sample(contacts, lookups)]
+        start = time.perf_counter()
+        correct = sum(index.resolve(query) is contact for contact, query in queries)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>10}: {elapsed / lookups * 1000:.3f} ms/lookup, {correct / lookups:.1%} resolved correctly")
+
+def benchmark_turns():
+    """Count the ASR and TTS calls each multi-step flow needs, prompted step by step vs. in one utterance."""
+    flows = [
+        ("whatsapp", "send whatsapp message", "send a whatsapp to mom saying i'll be late", ["mom", "i'll be late", "yes"]),
+        ("youtube", "play on youtube", "play lofi beats on youtube", ["lofi beats"]),
+        ("spotify", "open spotify", "play lofi beats on spotify", ["lofi beats"]),
+        ("google", "search on google", "search google for weather radar", ["weather radar"]),
+        ("screenshot", "take a screenshot", "take a screenshot called desktop", ["desktop"]),
+    ]
+    fakes = FakeIntegrations({name: 0 for name in FakeIntegrations.DEFAULT_LATENCY})
+    
+    def run_flow(commands: list, overrides: Dict[str, Any]) -> tuple:
+        with headless_assistant(fakes, overrides) as assistant:
+            asr_before = sum(name == "asr" for name, _ in fakes.calls)
+            assistant.run_script([{"text": command} for command in commands])
+            asr_calls = sum(name == "asr" for name, _ in fakes.calls) - asr_before
+            return asr_calls, len(assistant.sink.records)
+    
+    print(f"{'flow':<12} {'step-by-step ASR/TTS':>21} {'one utterance ASR/TTS':>22}")
+    for name, bare, full, replies in flows:
+        before = run_flow([bare] + replies, {"confirm_messages": True})
+        after = run_flow([full], {})
+        print(f"{name:<12} {before[0]:>14}/{before[1]:<6} {after[0]:>15}/{after[1]:<6}")
+
+def benchmark_latency(corpus: Optional[str] = None, repeats: int = 5, latency: Optional[Dict[str, float]] = None):
+    """Replay a command corpus headlessly against fake integrations and report turn latency per intent."""
+    entries = load_script(corpus) if corpus else [{"text": command} for command in BENCHMARK_CORPUS]
+    fakes = FakeIntegrations(latency)
+    by_intent: Dict[str, list] = {}
+    
+    with headless_assistant(fakes) as assistant:
+        for _ in range(repeats):
+            for result in assistant.run_script(entries):
+                by_intent.setdefault(result.intent, []).append(result.seconds)
+    
+    print(f"Fake latencies: {fakes.latency}")
+    print(f"{'intent':<20} {'turns':>6} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, samples in sorted(by_intent.items()):
+        print(f"{name:<20} {len(samples):>6} {percentile(samples, 0.5) * 1000:>9.1f} {percentile(samples, 0.95) * 1000:>9.1f}")
+    samples = [seconds for values in by_intent.values() for seconds in values]
+    print(f"{'all':<20} {len(samples):>6} {percentile(samples, 0.5) * 1000:>9.1f} {percentile(samples, 0.95) * 1000:>9.1f}")
+
+def load_test(host: str, port: int, sessions: int = 10, turns: int = 10, corpus: Optional[str] = None,
+              token: Optional[str] = None):
+    """Simulate concurrent text clients against a running server and report turn latency and throughput."""
+    commands = [entry['text'] for entry in load_script(corpus)] if corpus else BENCHMARK_CORPUS
+    latencies = []
+    errors = []
+    
+    async def client(index: int):
+        try:
+            reader, writer = await asyncio.open_connection(host, port, limit=16 * 1024 * 1024)
+            hello = {"type": "hello", "name": f"load-{index}", "audio": False}
+            if token:
+                hello["token"] = token
+            writer.write((json.dumps(hello) + "\n").encode())
+            for turn in range(turns):
+                command = commands[(index + turn) % len(commands)]
+                started = time.perf_counter()
+                writer.write((json.dumps({"type": "text", "text": command}) + "\n").encode())
+                await writer.drain()
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        raise ConnectionError("server closed the connection")
+                    if json.loads(line).get('type') == "turn_done":
+                        break
+                latencies.append(time.perf_counter() - started)
+            writer.write(b'{"type": "bye"}\n')
+            await writer.drain()
+            writer.close()
+        except Exception as e:
+            errors.append(f"load-{index}: {e!r}")
+    
+    async def run_all():
+        await asyncio.gather(*(client(index) for index in range(sessions)))
+    
+    started = time.perf_counter()
+    asyncio.run(run_all())
+    elapsed = time.perf_counter() - started
+    
+    print(f"{sessions} sessions x {turns} turns against {host}:{port} in {elapsed:.2f}s")
+    print(f"Completed turns: {len(latencies)}, errors: {len(errors)}, throughput: {len(latencies) / elapsed:.1f} turns/s")
+    if latencies:
+        print(f"Turn latency p50: {percentile(latencies, 0.5) * 1000:.1f} ms, p95: {percentile(latencies, 0.95) * 1000:.1f} ms")
+    for error in errors[:5]:
+        print(f"  {error}")
+
+def benchmark_screenshot(width: int = 3840, height: int = 2160, repeats: int = 3):
+    """Time capture and encoding of a fake 4K screen in each format, and a burst through the writer queue."""
+    screen = FakeScreen(width, height)
+    settings = [("png", {"compress_level": 1}), ("png", {"compress_level": 6}),
+                ("jpeg", {"quality": 85}), ("webp", {"quality": 80}), ("raw", {})]
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"Screen {width}x{height}, median of {repeats}")
+        for fmt, options in settings:
+            capture = ScreenCapture(screen, directory, fmt, **options)
+            timings = [capture.capture(capture.path(f"frame{index}")) for index in range(repeats)]
+            encode = sorted(timing.encode for timing in timings)[repeats // 2]
+            label = f"{fmt} {' '.join(f'{key}={value}' for key, value in options.items())}"
+            print(f"{label:<22} encode {encode * 1000:>8.1f} ms  {timings[0].size / 1024:>8.0f} KiB")
+        
+        capture = ScreenCapture(screen, directory, "png", compress_level=1, queue_size=2)
+        started = time.perf_counter()
+        timings, dropped = capture.burst("burst", 10, 0.05)
+        print(f"Burst of 10 frames every 50 ms: {len(timings)} written, {dropped} dropped "
+              f"in {time.perf_counter() - started:.2f}s")
+
+def benchmark_streaming(repeats: int = 3, latency: Optional[Dict[str, float]] = None):
+    """Measure the turn latency that speculative prefetch saves per intent with streamed fake recognition."""
+    corpus = ["what's the weather like", "search wikipedia alan turing", "tell me a joke"]
+    results = {}
+    head_starts = {}
+    for speculate in (False, True):
+        for _ in range(repeats):
+            fakes = FakeIntegrations(latency)
+            overrides = {"asr_streaming": True, "speculative_prefetch": speculate}
+            with headless_assistant(fakes, overrides) as assistant:
+                words_per_second = assistant.streaming.words_per_second
+                for result in assistant.run_script({"text": command} for command in corpus):
+                    speech = len(result.command.split()) / words_per_second
+                    results.setdefault((result.intent, speculate), []).append(result.seconds - speech)
+                if speculate:
+                    for name, values in assistant.speculator.head_start.items():
+                        head_starts.setdefault(name, []).extend(values)
+    
+    print("Turn latency after the user stops speaking (p50), streamed recognition")
+    print(f"{'intent':<12} {'no prefetch':>12} {'speculative':>12} {'saved':>9} {'head start':>14}")
+    for intent_name in dict.fromkeys(intent_name for intent_name, _ in results):
+        baseline = percentile(results[(intent_name, False)], 0.5)
+        speculative = percentile(results[(intent_name, True)], 0.5)
+        values = head_starts.get(intent_name)
+        work = f"{sum(values) / len(values) * 1000:.0f} ms" if values else "-"
+        print(f"{intent_name:<12} {baseline * 1000:>9.0f} ms {speculative * 1000:>9.0f} ms "
+              f"{(baseline - speculative) * 1000:>6.0f} ms {work:>14}")
+
+def benchmark_startup():
+    """Report import time per dependency and initialization time per assistant component."""
+    dependencies = ["speech_recognition", "gtts", "requests", "pygame"] + [module.name for module in INTEGRATIONS]
+    probe = "import time, importlib, sys; t = time.perf_counter(); importlib.import_module(sys.argv[1]); print(time.perf_counter() - t)"
+    
+    print("Import time per dependency (fresh interpreter each):")
+    for name in dependencies:
+        result = subprocess.run([sys.executable, "-c", probe, name], capture_output=True, text=True)
+        if result.returncode == 0:
+            print(f"  {name:<20} {float(result.stdout.strip().splitlines()[-1]) * 1000:>9.1f} ms")
+        else:
+            error = (result.stderr.strip().splitlines() or ["unknown error"])[-1]
+            print(f"  {name:<20} {'failed':>9}    {error[:80]}")
+    
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", "import voiceAssistant"], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    print(f"  {'voiceAssistant':<20} {(time.perf_counter() - start) * 1000:>9.1f} ms (including interpreter start)")
+    
+    print("Initialization time per component:")
+    try:
+        assistant = VoiceAssistant()
+    except Exception as e:
+        print(f"  initialization failed: {e}")
+        return
+    for step, elapsed in assistant.startup_timings.items():
+        print(f"  {step:<20} {elapsed * 1000:>9.1f} ms")
+    assistant.output.close(timeout=5)
+
+def benchmark_wake_word(fixtures: str, templates: Optional[str] = None, threshold: float = 0.6,
+                        energy_threshold: float = 300):
+    """Replay WAV fixtures through the local wake-word stage and report error rates and CPU cost.
+
+    Expects ``fixtures/positive/*.wav`` (contain the wake word) and
+    ``fixtures/negative/*.wav`` (do not). Templates default to
+    ``fixtures/templates``. Without a fixtures directory, synthetic tone
+    fixtures are generated and used instead.
+    """
+    synthetic = None
+    if not os.path.isdir(fixtures):
+        print(f"No fixtures in {fixtures}, using synthetic tone fixtures")
+        synthetic = tempfile.TemporaryDirectory()
+        fixtures, templates = write_wake_word_fixtures(synthetic.name), None
+    detector = WakeWordDetector.from_directory(templates or os.path.join(fixtures, "templates"), threshold)
+    if detector is None:
+        print("No wake word templates found")
+        return
+    
+    results = {"positive": [], "negative": []}
+    audio_seconds = 0.0
+    cpu_start = time.process_time()
+    for label in results:
+        for path in sorted(Path(fixtures, label).glob("*.wav")):
+            audio = read_wav(path)
+            audio_seconds += len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+            endpointer = Endpointer(audio.sample_rate, audio.sample_width, energy_threshold)
+            chunk = 1024 * audio.sample_width
+            fired = False
+            best = float('inf')
+            data = audio.frame_data + b"\x00" * int(audio.sample_rate * audio.sample_width)
+            for offset in range(0, len(data), chunk):
+                span = endpointer.feed(data[offset:offset + chunk])
+                if span:
+                    segment = data[span[0]:span[1]]
+                    detected, distance = detector.detect(sr.AudioData(segment, audio.sample_rate, audio.sample_width))
+                    fired = fired or detected
+                    best = min(best, distance)
+            results[label].append((path.name, fired, best))
+    cpu = time.process_time() - cpu_start
+    
+    for label, rows in results.items():
+        for name, fired, best in rows:
+            print(f"  {label:<8} {name:<30} {'fired' if fired else 'quiet':<6} distance {best:.3f}")
+    positives, negatives = results["positive"], results["negative"]
+    if positives:
+        print(f"False reject rate: {sum(not fired for _, fired, _ in positives) / len(positives):.1%} ({len(positives)} files)")
+    if negatives:
+        print(f"False accept rate: {sum(fired for _, fired, _ in negatives) / len(negatives):.1%} ({len(negatives)} files)")
+    if audio_seconds:
+        print(f"CPU: {cpu / audio_seconds * 1000:.1f} ms per second of audio ({audio_seconds:.1f}s total)")
+    if synthetic:
+        synthetic.cleanup()
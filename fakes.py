@@ -0,0 +1,273 @@
+"""Local stand-ins for the network, speech and desktop integrations, for headless runs and tests."""
+import os
+import time
+import json
+import tempfile
+import hashlib
+import contextlib
+import threading
+from collections import deque
+from typing import Optional, Dict, Any, Callable
+import speech_recognition as sr
+import webbrowser
+from voiceAssistant import (
+    CaptureSink, HttpClient, LazyModule, RecognitionBackend, RecognitionStream, VoiceAssistant, kit, np,
+    psutil, pyautogui, pyjokes, speedtest, wikipedia, write_wav,
+)
+
+class FakeResponse:
+    def __init__(self, text: str, data: Any):
+        self.text = text
+        self._data = data
+    
+    def json(self) -> Any:
+        return self._data
+
+class FakeHttpClient(HttpClient):
+    """HttpClient that answers geolocation and weather requests locally after a fixed delay."""
+
+    def __init__(self, fakes: "FakeIntegrations"):
+        super().__init__()
+        self.fakes = fakes
+    
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        self.fakes.call("http", url, kwargs.get('params'))
+        return FakeResponse('<div class="BNeawe iBp4i AP7Wnd">21°C</div>', {"city": "Testville"})
+
+class FakeBackend(RecognitionBackend):
+    """Recognition backend that returns known transcripts for known audio."""
+
+    name = "fake"
+    local = True
+
+    def __init__(self, fakes: "FakeIntegrations"):
+        self.fakes = fakes
+        self.transcripts: Dict[str, str] = {}
+    
+    @staticmethod
+    def key(audio: sr.AudioData) -> str:
+        return hashlib.sha1(audio.get_raw_data()).hexdigest()
+    
+    def expect(self, audio: sr.AudioData, transcript: str):
+        """Recognize audio as transcript from now on."""
+        self.transcripts[self.key(audio)] = transcript
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> str:
+        self.fakes.call("asr")
+        transcript = self.transcripts.get(self.key(audio))
+        if transcript is None:
+            raise sr.UnknownValueError()
+        return transcript
+
+class ScriptedStream(RecognitionStream):
+    """Recognition stream that reveals a known transcript word by word as audio arrives."""
+
+    def __init__(self, transcript: str, bytes_per_second: int, words_per_second: float = 2.5,
+                 finalize: Optional[Callable[[], None]] = None):
+        self.words = transcript.split()
+        self.bytes_per_second = bytes_per_second
+        self.words_per_second = words_per_second
+        self.finalize = finalize
+        self.received = 0
+    
+    def feed(self, chunk: bytes) -> Optional[str]:
+        self.received += len(chunk)
+        heard = int(self.received / self.bytes_per_second * self.words_per_second)
+        return " ".join(self.words[:heard]) or None
+    
+    def finish(self) -> str:
+        if self.finalize:
+            self.finalize()
+        if not self.words:
+            raise sr.UnknownValueError()
+        return " ".join(self.words)
+
+class FakeStreamingBackend:
+    """Local streaming recognition stand-in: each utterance streams the next queued transcript."""
+
+    name = "fake"
+
+    def __init__(self, fakes: Optional["FakeIntegrations"] = None, words_per_second: float = 2.5):
+        self.fakes = fakes
+        self.words_per_second = words_per_second
+        self.transcripts = deque()
+    
+    def open(self, sample_rate: int, sample_width: int) -> RecognitionStream:
+        transcript = self.transcripts.popleft() if self.transcripts else ""
+        finalize = (lambda: self.fakes.call("asr_final")) if self.fakes else None
+        return ScriptedStream(transcript, sample_rate * sample_width, self.words_per_second, finalize)
+
+class FakeScreen:
+    """In-memory screen source returning the same synthetic desktop image on every capture."""
+
+    def __init__(self, width: int = 1920, height: int = 1080):
+        from PIL import Image
+        pixels = np.zeros((height, width, 3), dtype=np.uint8)
+        pixels[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)
+        pixels[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+        pixels[height // 4:height // 2, width // 4:width // 2] = np.random.default_rng(0).integers(
+            0, 256, (height // 2 - height // 4, width // 2 - width // 4, 3), dtype=np.uint8)
+        self.image = Image.fromarray(pixels)
+        self.captures = 0
+    
+    def __call__(self):
+        self.captures += 1
+        return self.image
+
+def write_wake_word_fixtures(directory: str, sample_rate: int = 16000) -> str:
+    """Write synthetic wake-word fixtures in the layout the wakeword benchmark expects and return the directory.
+
+    The "wake word" is a sequence of three tones. Templates and positives
+    say it at slightly different pitches and speeds; negatives are other
+    tone sequences and noise.
+    """
+    def utterance(frequencies, seconds=0.2, pitch=1.0, amplitude=8000):
+        t = np.arange(int(seconds * sample_rate)) / sample_rate
+        silence = np.zeros(int(0.3 * sample_rate))
+        tones = [amplitude * np.sin(2 * np.pi * frequency * pitch * t) for frequency in frequencies]
+        return np.concatenate([silence, *tones, silence]).astype(np.int16)
+    
+    noise = np.random.default_rng(0).normal(0, 3000, int(0.6 * sample_rate)).astype(np.int16)
+    wake_word = (400, 1200, 700)
+    fixtures = {
+        "templates": [utterance(wake_word), utterance(wake_word, 0.22, 1.02), utterance(wake_word, 0.18, 0.98)],
+        "positive": [utterance(wake_word, seconds, pitch) for seconds, pitch in [(0.2, 1.0), (0.21, 0.97), (0.19, 1.03), (0.23, 1.01)]],
+        "negative": [utterance((2500, 300, 3000)), utterance((700, 1200, 400)), utterance((300, 600, 900), 0.3),
+                     np.concatenate([np.zeros(int(0.3 * sample_rate), dtype=np.int16), noise])],
+    }
+    for label, samples in fixtures.items():
+        os.makedirs(os.path.join(directory, label), exist_ok=True)
+        for index, data in enumerate(samples):
+            with open(os.path.join(directory, label, f"synthetic_{index}.wav"), 'wb') as f:
+                f.write(write_wav(data, sample_rate))
+    return directory
+
+class FakeIntegrations:
+    """Deterministic local stand-ins for the network and desktop integrations.
+
+    Each call sleeps for the configured latency of its integration and is
+    logged in ``calls``. ``install()`` swaps the fakes in for the lazily
+    imported modules and ``webbrowser.open``.
+    """
+
+    DEFAULT_LATENCY = {
+        "asr": 0.3, "tts": 0.2, "http": 0.15, "wikipedia": 0.4, "whatsapp": 0.5,
+        "youtube": 0.3, "search": 0.2, "browser": 0.05, "speedtest": 1.0, "screenshot": 0.05, "asr_final": 0.05,
+    }
+    CONFIG = {
+        "wiki_store": ":memory:",
+        "metrics_file": None,
+        "metrics_prometheus_file": None,
+        "screenshot_delay": 0,
+        "screenshot_dir": tempfile.gettempdir(),
+        "message_undo_seconds": 0,
+        "confirm_messages": False,
+        "tts_warmup": False,
+    }
+
+    class DisambiguationError(Exception):
+        def __init__(self, title: str, options: list):
+            super().__init__(f"{title} may refer to: {', '.join(options)}")
+            self.options = options
+    
+    class PageError(Exception):
+        pass
+
+    def __init__(self, latency: Optional[Dict[str, float]] = None):
+        self.latency = {**self.DEFAULT_LATENCY, **(latency or {})}
+        self.calls = []
+        self._lock = threading.Lock()
+        self._screen: Optional[FakeScreen] = None
+    
+    def call(self, name: str, *args):
+        """Log a call to an integration and wait for its latency."""
+        with self._lock:
+            self.calls.append((name, args))
+        time.sleep(self.latency.get(name, 0))
+    
+    def http_client(self) -> FakeHttpClient:
+        return FakeHttpClient(self)
+    
+    def recognition_backend(self) -> FakeBackend:
+        return FakeBackend(self)
+    
+    def streaming_backend(self) -> FakeStreamingBackend:
+        return FakeStreamingBackend(self)
+    
+    SAMPLE_RATE = 22050
+    
+    def screenshot(self):
+        self.call("screenshot")
+        if self._screen is None:
+            self._screen = FakeScreen(640, 360)
+        return self._screen()
+    
+    def decode(self, data: bytes):
+        """Decode fake speech to a quarter second of tone."""
+        return (np.sin(np.arange(self.SAMPLE_RATE // 4) / 10) * 8000).astype(np.int16)
+    
+    def summary(self, query: str, sentences: int = 3, auto_suggest: bool = True) -> str:
+        self.call("wikipedia", query)
+        return f"{query.title()} is the subject of a deterministic test article. It has exactly {sentences} sentences. This is the last one."
+    
+    def modules(self) -> Dict[LazyModule, Any]:
+        from types import SimpleNamespace
+        
+        class Speedtest:
+            def get_best_server(fake):
+                self.call("speedtest")
+            def download(fake):
+                return 95_000_000
+            def upload(fake):
+                return 20_000_000
+        
+        return {
+            wikipedia: SimpleNamespace(
+                summary=self.summary,
+                page=lambda query, auto_suggest=True: SimpleNamespace(title=query.title(), summary=self.summary(query)),
+                exceptions=SimpleNamespace(DisambiguationError=self.DisambiguationError, PageError=self.PageError)
+            ),
+            kit: SimpleNamespace(
+                sendwhatmsg_instantly=lambda phone, message, *args: self.call("whatsapp", phone, message),
+                playonyt=lambda query: self.call("youtube", query),
+                search=lambda query: self.call("search", query),
+            ),
+            pyautogui: SimpleNamespace(
+                press=lambda key: self.call("key", key),
+                screenshot=self.screenshot,
+            ),
+            pyjokes: SimpleNamespace(get_joke=lambda: "I told a joke about UDP, but you might not get it."),
+            psutil: SimpleNamespace(sensors_battery=lambda: SimpleNamespace(percent=80, power_plugged=True, secsleft=7200)),
+            speedtest: SimpleNamespace(Speedtest=Speedtest),
+        }
+    
+    @contextlib.contextmanager
+    def install(self):
+        """Use the fakes in place of the real integrations inside the block."""
+        with contextlib.ExitStack() as stack:
+            for module, fake in self.modules().items():
+                stack.enter_context(module.override(fake))
+            stack.callback(setattr, webbrowser, "open", webbrowser.open)
+            webbrowser.open = lambda url, *args, **kwargs: self.call("browser", url)
+            yield self
+
+FAKE_CONTACTS = [{"name": "mom", "phone": "+1234567890", "aliases": ["mother"]}]
+
+@contextlib.contextmanager
+def headless_assistant(fakes: FakeIntegrations, overrides: Optional[Dict[str, Any]] = None,
+                       sink: Optional[CaptureSink] = None):
+    """Yield a headless assistant with fake integrations and a throwaway contacts file."""
+    with tempfile.TemporaryDirectory() as directory, fakes.install():
+        contacts_file = os.path.join(directory, "contacts.json")
+        with open(contacts_file, 'w') as f:
+            json.dump(FAKE_CONTACTS, f)
+        assistant = VoiceAssistant(
+            os.path.join(directory, "config.json"), headless=True, fakes=fakes, sink=sink,
+            overrides={"contacts_file": contacts_file, "tts_cache_dir": os.path.join(directory, "tts_cache"),
+                       "screenshot_dir": directory,
+                       **(overrides or {})}
+        )
+        try:
+            yield assistant
+        finally:
+            assistant.close()
@@ -0,0 +1,195 @@
+import queue
+from types import SimpleNamespace
+
+import numpy as np
+
+from voiceAssistant import AudioCapture, CapturedUtterance, Endpointer, Metrics, NoiseFloorEstimator, RingBuffer, VoiceAssistant
+
+RATE = 16000
+SILENCE = b"\x00" * 3200
+
+
+def speech(seconds=0.1, amplitude=8000):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 500 * t)).astype(np.int16).tobytes()
+
+
+class ChunkSource:
+    sample_rate = RATE
+    sample_width = 2
+    
+    def __init__(self, chunks):
+        self.chunks = queue.Queue()
+        for chunk in chunks:
+            self.chunks.put(chunk)
+        self.closed = False
+    
+    def open(self):
+        pass
+    
+    def read(self):
+        try:
+            return self.chunks.get(timeout=0.01)
+        except queue.Empty:
+            return SILENCE
+    
+    def close(self):
+        self.closed = True
+
+
+def test_ring_buffer_reads_by_stream_offset():
+    ring = RingBuffer(8)
+    ring.write(b"abcd")
+    ring.write(b"ef")
+    assert ring.read(0, 6) == b"abcdef"
+    assert ring.read(2, 4) == b"cd"
+
+
+def test_ring_buffer_wraps_and_forgets_oldest_bytes():
+    ring = RingBuffer(8)
+    ring.write(b"abcdef")
+    ring.write(b"ghij")
+    assert ring.start == 2
+    assert ring.end == 10
+    assert ring.read(0, 10) == b"cdefghij"
+    assert ring.read(6, 9) == b"ghi"
+
+
+def test_ring_buffer_keeps_tail_of_oversized_write():
+    ring = RingBuffer(4)
+    ring.write(b"abcdefghij")
+    assert ring.read(0, 10) == b"ghij"
+
+
+def test_ring_buffer_returns_nothing_for_empty_range():
+    ring = RingBuffer(4)
+    ring.write(b"ab")
+    assert ring.read(2, 2) == b""
+    assert ring.read(5, 9) == b""
+
+
+def test_endpointer_returns_utterance_offsets_with_pre_roll():
+    endpointer = Endpointer(RATE, 2, threshold=300)
+    chunks = [SILENCE] * 3 + [speech()] * 4 + [SILENCE] * 4
+    spans = [span for span in (endpointer.feed(chunk) for chunk in chunks) if span]
+    assert spans == [(3 * 3200 - 6400, 10 * 3200)]
+    assert not endpointer.in_speech
+
+
+def test_endpointer_ignores_short_blips():
+    endpointer = Endpointer(RATE, 2, threshold=300)
+    chunks = [speech(0.05)] + [SILENCE] * 4
+    assert not any(endpointer.feed(chunk) for chunk in chunks)
+
+
+def test_capture_queues_utterances_cut_from_the_ring():
+    words = [speech()] * 4
+    capture = AudioCapture(ChunkSource([SILENCE] * 2 + words), Endpointer(RATE, 2, 300), buffer_seconds=5)
+    utterance = capture.next_utterance(timeout=2)
+    capture.stop()
+    assert utterance is not None
+    assert utterance.data == SILENCE * 2 + b"".join(words) + SILENCE * 3
+    assert utterance.audio().sample_rate == RATE
+    assert capture.source.closed
+
+
+def test_capture_times_out_without_speech():
+    capture = AudioCapture(ChunkSource([]), Endpointer(RATE, 2, 300))
+    assert capture.next_utterance(timeout=0.1) is None
+    capture.stop()
+
+
+def test_capture_drops_utterances_rejected_by_the_gate():
+    decisions = iter([False, True])
+    source = ChunkSource([speech()] * 4 + [SILENCE] * 3 + [speech()] * 4)
+    capture = AudioCapture(source, Endpointer(RATE, 2, 300),
+                           speech_gate=lambda energy, first: next(decisions) if first else None)
+    utterance = capture.next_utterance(timeout=2)
+    capture.stop()
+    assert utterance is not None
+    assert capture.utterances.empty()
+
+
+def test_clear_drops_pending_utterances():
+    capture = AudioCapture(ChunkSource([speech()] * 4), Endpointer(RATE, 2, 300))
+    assert capture.next_utterance(timeout=2) is not None
+    capture.utterances.put("stale")
+    capture.clear()
+    assert capture.next_utterance(timeout=0.1) is None
+    capture.stop()
+
+
+def utterance(data, ended_at):
+    return CapturedUtterance(data, RATE, 2, ended_at - 1, ended_at)
+
+
+def test_clear_before_keeps_later_utterances():
+    capture = AudioCapture(ChunkSource([]), Endpointer(RATE, 2, 300))
+    capture.utterances.put(utterance(b"old", 1.0))
+    capture.utterances.put(utterance(b"new", 3.0))
+    capture.clear(before=2.0)
+    assert capture.next_utterance(timeout=0.1).data == b"new"
+    capture.stop()
+
+
+def test_turn_drops_utterances_finished_before_playback_ended():
+    assistant = VoiceAssistant.__new__(VoiceAssistant)
+    assistant.config = {"pause_threshold": 0.8, "phrase_time_limit": 10, "timeout": 0.1, "language": "en"}
+    assistant.metrics = Metrics()
+    assistant.output = SimpleNamespace(wait_idle=lambda: True, busy=False, last_finished_at=2.0)
+    assistant.asr = SimpleNamespace(recognize=lambda audio, language: audio.frame_data.decode())
+    assistant.capture = AudioCapture(ChunkSource([]), Endpointer(RATE, 2, 300))
+    assistant.capture.utterances.put(utterance(b"cough", 1.0))
+    assistant.capture.utterances.put(utterance(b"stop", 2.5))
+    assert assistant._recognize_captured() == "stop"
+    assert assistant._recognize_captured() is None
+    assistant.capture.stop()
+
+
+def test_noise_floor_tracks_low_percentile():
+    noise = NoiseFloorEstimator(window=100, percentile=20, ratio=2.0, minimum=10)
+    for energy in [50] * 80 + [5000] * 20:
+        noise.add(energy)
+    assert noise.noise_floor == 50
+    assert noise.threshold(300) == 100
+
+
+def test_noise_floor_follows_sustained_rise():
+    noise = NoiseFloorEstimator(window=100, percentile=20, ratio=2.0, minimum=10)
+    for energy in [50] * 100 + [400] * 96:
+        noise.add(energy)
+    assert noise.noise_floor == 400
+
+
+def test_noise_floor_is_published_as_gauges():
+    metrics = Metrics()
+    noise = NoiseFloorEstimator(window=100, percentile=20, ratio=2.0, minimum=10, metrics=metrics)
+    for energy in [50] * 80 + [5000] * 20:
+        noise.add(energy)
+    gauges = {item["name"]: item["value"] for item in metrics.snapshot()["gauges"]}
+    assert gauges == {"noise_floor": 50, "energy_threshold": 100}
+
+
+def test_noise_threshold_defaults_and_minimum():
+    assert NoiseFloorEstimator().threshold(300) == 300
+    assert NoiseFloorEstimator(minimum=100, noise_floor=10).threshold(300) == 100
+
+
+def test_capture_adapts_threshold_outside_speech():
+    noise = NoiseFloorEstimator(window=10, ratio=2.0, minimum=10)
+    capture = AudioCapture(ChunkSource([]), Endpointer(RATE, 2, 5000), noise=noise)
+    for _ in range(10):
+        capture._process(speech(amplitude=200))
+    metrics = capture.metrics()
+    assert metrics["noise_floor"] == noise.noise_floor
+    assert metrics["energy_threshold"] == round(noise.noise_floor * 2, 1)
+    assert not metrics["in_speech"]
+
+
+def test_capture_leaves_playback_out_of_the_noise_floor():
+    noise = NoiseFloorEstimator(window=10, minimum=10)
+    capture = AudioCapture(ChunkSource([]), Endpointer(RATE, 2, 5000), noise=noise, playing=lambda: True)
+    for _ in range(10):
+        capture._process(speech(amplitude=200))
+    assert noise.noise_floor is None
+    assert capture.endpointer.threshold == 5000
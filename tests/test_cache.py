@@ -0,0 +1,104 @@
+import threading
+import time
+
+from voiceAssistant import TTLCache, VoiceAssistant, extract_element
+
+
+def test_hit_within_ttl():
+    cache = TTLCache()
+    calls = []
+    fetch = lambda: calls.append(1) or "value"
+    assert cache.get("key", fetch, ttl=60) == "value"
+    assert cache.get("key", fetch, ttl=60) == "value"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_none_is_not_cached():
+    cache = TTLCache()
+    calls = []
+    fetch = lambda: calls.append(1)
+    assert cache.get("key", fetch, ttl=60) is None
+    assert cache.get("key", fetch, ttl=60) is None
+    assert len(calls) == 2
+
+
+def test_stale_entry_is_served_while_refreshing():
+    cache = TTLCache()
+    cache.put("key", "old", ttl=0, stale_ttl=60)
+    refreshed = threading.Event()
+    
+    def fetch():
+        refreshed.set()
+        return "new"
+    
+    assert cache.get("key", fetch, ttl=60, stale_ttl=60) == "old"
+    assert refreshed.wait(5)
+    deadline = time.monotonic() + 5
+    while cache.get("key", fetch, ttl=60) != "new" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get("key", fetch, ttl=60) == "new"
+
+
+def test_expired_entry_is_fetched_again():
+    cache = TTLCache()
+    cache.put("key", "old", ttl=0)
+    assert cache.get("key", lambda: "new", ttl=60) == "new"
+
+
+def test_concurrent_misses_share_one_fetch():
+    cache = TTLCache()
+    calls = []
+    
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return "value"
+    
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("key", fetch, ttl=60))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+
+
+def test_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.put("a", 1, ttl=60)
+    cache.put("b", 2, ttl=60)
+    cache.get("a", lambda: None, ttl=60)
+    cache.put("c", 3, ttl=60)
+    assert cache.get("b", lambda: None, ttl=60) is None
+    assert cache.get("a", lambda: None, ttl=60) == 1
+
+
+def test_extract_element_finds_first_matching_class():
+    html = '<html><div class="other">no</div>' + "x" * 10000 + '<div class="a BNeawe b">31°C</div><div class="BNeawe">later</div>'
+    assert extract_element(html, "div", "BNeawe") == "31°C"
+
+
+def test_extract_element_missing():
+    assert extract_element("<div class='x'>y</div>", "div", "BNeawe") is None
+
+
+def test_weather_uses_its_own_stale_window():
+    windows = {}
+    
+    class Http:
+        def get_json(self, url, ttl, stale_ttl):
+            windows["geolocation"] = stale_ttl
+            return {"city": "Paris"}
+        
+        def cached(self, key, fetch, ttl, stale_ttl):
+            windows[key[0]] = stale_ttl
+            return "12°C"
+    
+    assistant = VoiceAssistant.__new__(VoiceAssistant)
+    assistant.http = Http()
+    assistant.config = {"geolocation_url": "", "geolocation_ttl": 3600, "cache_stale_ttl": 86400,
+                        "weather_url": "", "weather_ttl": 120, "weather_stale_ttl": 300}
+    assert assistant._weather_report() == ["The current temperature in Paris is 12°C"]
+    assert windows == {"geolocation": 86400, "weather": 120}
@@ -0,0 +1,59 @@
+from voiceAssistant import Contact, ContactIndex, edit_distance, normalize_name
+
+CONTACTS = [
+    Contact("Mummy", "+911", ["mom", "mother"]),
+    Contact("Rahul Sharma", "+912", []),
+    Contact("Anjali", "+913", ["anju"]),
+]
+
+
+def test_edit_distance():
+    assert edit_distance("rahul", "rahul", 2) == 0
+    assert edit_distance("rahul", "raul", 2) == 1
+    assert edit_distance("kitten", "sitting", 3) == 3
+
+
+def test_edit_distance_stops_past_limit():
+    assert edit_distance("kitten", "sitting", 1) == 2
+    assert edit_distance("a", "abcdef", 2) == 3
+
+
+def test_normalize_name_drops_fillers_and_possessives():
+    assert normalize_name("Mummy ji") == normalize_name("mummy")
+    assert normalize_name("mom's") == "mom"
+    assert normalize_name("Jitendra") == "jitendra"
+
+
+def test_resolve_exact_name_and_alias():
+    index = ContactIndex(CONTACTS)
+    assert index.resolve("rahul sharma").phone == "+912"
+    assert index.resolve("mother").phone == "+911"
+    assert index.resolve("my mom please").phone == "+911"
+
+
+def test_resolve_misspelled_and_sound_alike_names():
+    index = ContactIndex(CONTACTS)
+    assert index.resolve("rahul sharmaa").phone == "+912"
+    assert index.resolve("anjaly").phone == "+913"
+
+
+def test_resolve_unknown_name():
+    index = ContactIndex(CONTACTS)
+    assert index.resolve("bob") is None
+    assert index.resolve("please") is None
+
+
+def test_is_stale_tracks_file_mtime(tmp_path):
+    path = tmp_path / "contacts.json"
+    path.write_text("[]")
+    index = ContactIndex(CONTACTS, path.stat().st_mtime)
+    assert not index.is_stale(str(path))
+    path.unlink()
+    assert index.is_stale(str(path))
+
+
+def test_ji_inside_a_name_is_kept():
+    assert normalize_name("Sanji") == "sanji"
+    assert normalize_name("mummy-ji") == "mummy"
+    index = ContactIndex([Contact("Sanji", "+914", []), Contact("San", "+915", [])])
+    assert index.resolve("sanji").phone == "+914"
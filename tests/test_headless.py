@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from fakes import FakeIntegrations, headless_assistant
+
+
+@pytest.fixture
+def fakes():
+    return FakeIntegrations({name: 0 for name in FakeIntegrations.DEFAULT_LATENCY})
+
+
+def test_run_script_routes_and_replies(fakes):
+    with headless_assistant(fakes) as assistant:
+        results = assistant.run_script([{"text": "check battery"}, {"text": "tell me a joke"}])
+        replies = [record["text"] for record in assistant.sink.records]
+    assert [result.intent for result in results] == ["battery", "joke"]
+    assert "Battery is at 80 percent" in replies
+    assert "I told a joke about UDP, but you might not get it." in replies
+
+
+def test_run_script_answers_follow_up_prompts(fakes):
+    with headless_assistant(fakes, {"confirm_messages": True}) as assistant:
+        assistant.run_script([{"text": "send whatsapp message"}, {"text": "mom"}, {"text": "i'll be late"},
+                              {"text": "yes"}])
+        replies = [record["text"] for record in assistant.sink.records]
+    assert ("whatsapp", ("+1234567890", "i'll be late")) in fakes.calls
+    assert replies[-1] == "Message sent successfully."
+
+
+def test_run_script_uses_local_wikipedia_store(fakes):
+    with headless_assistant(fakes) as assistant:
+        assistant.run_script([{"text": "search wikipedia for alan turing"}] * 2)
+    assert sum(name == "wikipedia" for name, _ in fakes.calls) == 1
+
+
+def test_run_script_one_sentence_message(fakes):
+    with headless_assistant(fakes) as assistant:
+        results = assistant.run_script([{"text": "text mom saying what time is dinner"}])
+    assert results[0].intent == "whatsapp"
+    assert ("whatsapp", ("+1234567890", "what time is dinner")) in fakes.calls
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from voiceAssistant import JobScheduler, SpeechHandle, VoiceAssistant, current_job
+
+
+@pytest.fixture
+def jobs():
+    scheduler = JobScheduler(max_workers=1)
+    yield scheduler
+    scheduler.close(wait=True)
+
+
+def test_runs_job_with_current_job_set(jobs):
+    seen = []
+    job = jobs.submit("lookup", lambda value: seen.append((current_job(), value)) or value, 42)
+    assert job.future.result(2) == 42
+    assert seen == [(job, 42)]
+    assert job.done and jobs.active() == []
+    assert current_job() is None
+
+
+def test_status_lists_running_jobs(jobs):
+    release = threading.Event()
+    job = jobs.submit("speed test", release.wait, 5)
+    assert jobs.active() == [job]
+    release.set()
+    job.future.result(2)
+    assert jobs.active() == []
+
+
+def test_cancel_stops_running_job_cooperatively(jobs):
+    started = threading.Event()
+    finished = []
+    
+    def countdown():
+        started.set()
+        current_job().sleep(5)
+        finished.append(True)
+    
+    job = jobs.submit("screenshot", countdown)
+    assert started.wait(2)
+    assert jobs.cancel() is job
+    assert job.future.result(2) is None
+    assert job.cancelled and finished == []
+    assert jobs.active() == []
+
+
+def test_countdown_waits_for_prompt_and_can_be_cancelled(jobs):
+    assistant = VoiceAssistant.__new__(VoiceAssistant)
+    prompt = SpeechHandle("Taking screenshot in 3 seconds...")
+    job = jobs.submit("screenshot", assistant._countdown, prompt, 0)
+    assert not job.future.done()
+    prompt.done_event.set()
+    job.future.result(2)
+    assert not job.cancelled
+    
+    prompt = SpeechHandle("Taking screenshot in 3 seconds...")
+    job = jobs.submit("screenshot", assistant._countdown, prompt, 0)
+    while job.started_at is None:
+        time.sleep(0.01)
+    assert jobs.cancel() is job
+    assert job.future.result(2) is None
+    assert job.cancelled
+
+
+def test_cancel_drops_queued_job(jobs):
+    release = threading.Event()
+    ran = []
+    running = jobs.submit("weather", release.wait, 5)
+    queued = jobs.submit("wikipedia search", lambda: ran.append(True))
+    assert jobs.cancel() is queued
+    assert jobs.active() == [running]
+    release.set()
+    running.future.result(2)
+    assert ran == []
+
+
+def test_cancel_with_nothing_running(jobs):
+    assert jobs.cancel() is None
+
+
+def test_failing_job_is_logged_and_removed(jobs, caplog):
+    job = jobs.submit("broken", lambda: 1 / 0)
+    assert job.future.result(2) is None
+    assert "Background job 1 (broken) failed" in caplog.text
+    assert jobs.active() == []
@@ -0,0 +1,21 @@
+import sys
+
+from voiceAssistant import LazyModule, preload_integrations
+
+
+def test_imports_on_first_attribute_access():
+    sys.modules.pop("colorsys", None)
+    module = LazyModule("colorsys")
+    assert not module.loaded
+    assert "colorsys" not in sys.modules
+    assert module.rgb_to_hsv(1, 0, 0) == (0.0, 1.0, 1.0)
+    assert module.loaded and module.import_time is not None
+    assert module.load() is sys.modules["colorsys"]
+
+
+def test_preload_skips_modules_that_fail(caplog):
+    good = LazyModule("json")
+    bad = LazyModule("no_such_module_here")
+    preload_integrations([bad, good])
+    assert good.loaded and not bad.loaded
+    assert "Preloading no_such_module_here failed" in caplog.text
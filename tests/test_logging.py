@@ -0,0 +1,66 @@
+import atexit
+import gzip
+import json
+import logging
+import queue
+
+import pytest
+
+from voiceAssistant import ContextFilter, DeferredQueueHandler, JsonFormatter, Metrics, setup_logging
+
+
+def make_record(msg, *args, **extra):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_queue_handler_merges_arguments_on_the_caller():
+    log_queue = queue.Queue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.handle(make_record("turn %d took %.1fs", 3, 0.25))
+    record = log_queue.get_nowait()
+    assert (record.msg, record.args) == ("turn 3 took 0.2s", None)
+
+
+def test_json_formatter_includes_context_and_fields():
+    record = make_record("Intent: time", turn=7, job=None, fields={"intent": "time"})
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Intent: time"
+    assert entry["turn"] == 7 and "job" not in entry
+    assert entry["intent"] == "time"
+
+
+def test_context_filter_tags_current_turn():
+    record = make_record("hello")
+    with Metrics().turn() as trace:
+        ContextFilter().filter(record)
+    assert record.turn == trace.id
+    assert record.job is None
+
+
+def test_rotated_logs_are_gzipped(tmp_path, root_logger):
+    log_file = tmp_path / "assistant.log"
+    listener = setup_logging({"log_file": str(log_file), "log_max_mb": 0.001, "log_backups": 2})
+    for i in range(40):
+        logging.getLogger("test").info(f"message {i}")
+    listener.stop()
+    atexit.unregister(listener.stop)
+    
+    backups = sorted(tmp_path.glob("assistant.log.*.gz"))
+    assert [path.name for path in backups] == ["assistant.log.1.gz", "assistant.log.2.gz"]
+    lines = gzip.open(backups[0], 'rt').read().splitlines()
+    assert json.loads(lines[0])["message"].startswith("message")
+    assert json.loads(log_file.read_text().splitlines()[-1])["message"] == "message 39"
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+from voiceAssistant import Contact, ContactIndex, JobScheduler, Metrics, VoiceAssistant, kit
+
+
+@pytest.fixture
+def assistant():
+    assistant = VoiceAssistant.__new__(VoiceAssistant)
+    assistant.config = {"confirm_messages": False, "message_undo_seconds": 0, "contacts_file": "missing.json"}
+    assistant.contacts = ContactIndex([Contact("mom", "+1234567890", ["mother"]), Contact("Rahul", "+1987654321", [])])
+    assistant.jobs = JobScheduler()
+    assistant.metrics = Metrics()
+    assistant.spoken = []
+    assistant.replies = []
+    assistant.speak = assistant.spoken.append
+    assistant.listen = lambda: assistant.replies.pop(0) if assistant.replies else None
+    assistant.sent = []
+    fake = SimpleNamespace(sendwhatmsg_instantly=lambda phone, message, wait: assistant.sent.append((phone, message)))
+    with mock.patch.object(kit, "_module", fake):
+        yield assistant
+        assistant.jobs.join(timeout=5)
+    assistant.jobs.close()
+
+
+def test_one_utterance_message_needs_no_prompts(assistant):
+    assistant.send_whatsapp_message("send a whatsapp to mom saying i'll be late")
+    assistant.jobs.join(timeout=5)
+    assert assistant.sent == [("+1234567890", "i'll be late")]
+    assert assistant.spoken[-1] == "Message sent successfully."
+    assert not any(line.endswith("?") for line in assistant.spoken)
+
+
+def test_only_missing_slots_are_asked_for(assistant):
+    assistant.replies = ["dinner is ready"]
+    assistant.send_whatsapp_message("send message to mom")
+    assistant.jobs.join(timeout=5)
+    assert assistant.spoken[0] == "What's the message?"
+    assert assistant.sent == [("+1234567890", "dinner is ready")]
+
+
+def test_missed_confirmation_cancels(assistant):
+    assistant.config["confirm_messages"] = True
+    assistant.send_whatsapp_message("text mom saying hi")
+    assistant.jobs.join(timeout=5)
+    assert assistant.spoken[-1] == "Message cancelled."
+    assert assistant.sent == []
+
+
+def test_undo_window_can_be_cancelled(assistant):
+    assistant.config["message_undo_seconds"] = 5
+    assistant.send_whatsapp_message("text mom saying hi")
+    assert assistant.jobs.cancel().name == "whatsapp message"
+    assistant.jobs.join(timeout=5)
+    assert assistant.sent == []
+
+
+def test_confirmation_reads_back_full_name(assistant):
+    assistant.config["confirm_messages"] = True
+    assistant.replies = ["yes"]
+    assistant.send_whatsapp_message("text mother saying hi")
+    assistant.jobs.join(timeout=5)
+    assert assistant.spoken[0] == "Should I send hi to mom?"
+    assert assistant.sent == [("+1234567890", "hi")]
+
+
+def test_approximate_name_is_confirmed_even_when_confirmation_is_off(assistant):
+    assistant.send_whatsapp_message("text rahool saying hi")
+    assistant.jobs.join(timeout=5)
+    assert assistant.spoken[0] == "Should I send hi to Rahul?"
+    assert assistant.sent == []
@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+
+from voiceAssistant import Histogram, Metrics, current_trace
+
+
+def test_histogram_counts_into_buckets():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    data = histogram.to_dict()
+    assert data["buckets"] == {"0.1": 2, "1.0": 3, "+Inf": 4}
+    assert data["count"] == 4 and data["sum"] == 2.65
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.95) == 1.0
+    assert Histogram().quantile(0.5) is None
+
+
+def test_prometheus_text_exposes_counters_and_histograms():
+    metrics = Metrics()
+    metrics.count("turns", intent="time")
+    metrics.count("turns", intent="time")
+    metrics.observe("asr", 0.2, backend='go"ogle')
+    text = metrics.prometheus_text()
+    assert "# TYPE voice_assistant_turns_total counter" in text
+    assert 'voice_assistant_turns_total{intent="time"} 2' in text
+    assert "# TYPE voice_assistant_asr_seconds histogram" in text
+    assert "voice_assistant_asr_seconds_bucket{backend=\"go'ogle\",le=\"0.25\"} 1" in text
+    assert 'voice_assistant_asr_seconds_count{backend="go\'ogle"} 1' in text
+
+
+def test_prometheus_text_exposes_gauges():
+    metrics = Metrics()
+    metrics.gauge("noise_floor", 120.0)
+    metrics.gauge("noise_floor", 80.0)
+    text = metrics.prometheus_text()
+    assert "# TYPE voice_assistant_noise_floor gauge" in text
+    assert "voice_assistant_noise_floor 80.0" in text
+
+
+def test_turn_trace_waits_for_held_stages(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    metrics = Metrics(str(path), trace_turns=True)
+    with metrics.turn() as trace:
+        assert current_trace() is trace
+        with metrics.span("dispatch"):
+            pass
+        trace.hold()
+    assert current_trace() is None
+    assert not path.exists()
+    
+    done = threading.Thread(target=lambda: (metrics.observe("tts", 0.1, time.perf_counter(), trace=trace), trace.release()))
+    done.start()
+    done.join()
+    record = json.loads(path.read_text())
+    assert record["type"] == "trace"
+    assert [span["stage"] for span in record["spans"]] == ["dispatch", "turn", "tts"]
+
+
+def test_discarded_turn_is_not_recorded():
+    metrics = Metrics(trace_turns=True)
+    with metrics.turn() as trace:
+        trace.discard()
+    assert metrics.snapshot()["histograms"] == []
+
+
+def test_jsonl_rolls_over_at_max_bytes(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    metrics = Metrics(str(path), str(tmp_path / "metrics.prom"), max_bytes=200)
+    metrics.count("turns")
+    metrics.export()
+    metrics.export()
+    assert (tmp_path / "metrics.jsonl.1").exists()
+    assert len(path.read_text().splitlines()) == 1
+    assert "voice_assistant_turns_total 1" in (tmp_path / "metrics.prom").read_text()
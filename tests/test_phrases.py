@@ -0,0 +1,81 @@
+import io
+import threading
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from voiceAssistant import PhraseBank, crossfade_concat, trim_silence, write_wav
+
+
+@pytest.mark.parametrize("text, fragments", [
+    ("Battery is at 80 percent", ["Battery is at", "80", "percent"]),
+    ("The time is 07:05 AM", ["The time is", "7", "oh", "5", "a.m."]),
+    ("The time is 12:00 PM", ["The time is", "12", "o'clock", "p.m."]),
+    ("Today is Saturday, October 17, 2026", ["Today is", "Saturday", "October", "17", "20", "26"]),
+    ("Today is Monday, January 05, 2005", ["Today is", "Monday", "January", "5", "two thousand", "5"]),
+    ("Battery is at 180 percent", None),
+    ("Today is Funday, October 17, 2026", None),
+    ("Screenshot saved as desktop.png", None),
+])
+def test_fragments(text, fragments):
+    assert PhraseBank.fragments(text) == fragments
+
+
+def test_trim_silence_keeps_margin():
+    samples = np.zeros(1000, dtype=np.int16)
+    samples[400:500] = 1000
+    trimmed = trim_silence(samples, sample_rate=1000, margin=0.01)
+    assert len(trimmed) == 120
+    assert len(trim_silence(np.zeros(100, dtype=np.int16), 1000)) == 0
+
+
+def test_crossfade_concat_blends_boundaries():
+    a = np.full(100, 1000, dtype=np.int16)
+    b = np.full(100, -1000, dtype=np.int16)
+    joined = crossfade_concat([a, b], overlap=10)
+    assert len(joined) == 190
+    assert joined[89] == 1000 and joined[100] == -1000
+    assert -1000 < joined[95] < 1000
+    assert len(crossfade_concat([a, b], overlap=0)) == 200
+
+
+def test_render_fetches_each_fragment_once():
+    fetched = []
+    
+    def fetch(fragment):
+        fetched.append(fragment)
+        return fragment.encode()
+    
+    bank = PhraseBank(fetch, lambda data: np.full(50, 1000, dtype=np.int16), sample_rate=1000, crossfade=0.005)
+    bank.prerender()
+    assert len(bank.render("Battery is at 80 percent")) == 3 * 50 - 2 * 5
+    assert bank.render("Battery is at 80 percent") is not None
+    assert bank.render("Hello there") is None
+    assert sorted(fetched) == sorted(set(fetched))
+    assert bank.stats()["rendered"] == 2
+
+
+def test_render_with_cold_fragments_fills_them_in_the_background():
+    filled = threading.Event()
+    
+    def fetch(fragment):
+        if fragment == "percent":
+            filled.set()
+        return fragment.encode()
+    
+    bank = PhraseBank(fetch, lambda data: np.full(50, 1000, dtype=np.int16), sample_rate=1000, crossfade=0.005)
+    assert bank.render("Battery is at 80 percent") is None
+    assert filled.wait(2)
+    deadline = time.monotonic() + 2
+    while bank.render("Battery is at 80 percent") is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(bank.render("Battery is at 80 percent")) == 3 * 50 - 2 * 5
+
+
+def test_write_wav_round_trip():
+    samples = np.arange(-50, 50, dtype=np.int16)
+    with wave.open(io.BytesIO(write_wav(samples, 8000))) as f:
+        assert (f.getframerate(), f.getnchannels(), f.getsampwidth()) == (8000, 1, 2)
+        assert np.array_equal(np.frombuffer(f.readframes(100), dtype=np.int16), samples)
@@ -0,0 +1,108 @@
+import time
+
+import pytest
+import speech_recognition as sr
+
+from voiceAssistant import BackendStats, HedgedRecognizer, RecognitionBackend
+
+AUDIO = sr.AudioData(b"\x00\x00" * 160, 16000, 2)
+
+
+class DelayedBackend(RecognitionBackend):
+    def __init__(self, name, delay, result):
+        self.name = name
+        self.delay = delay
+        self.result = result
+        self.calls = 0
+    
+    def recognize(self, audio, language):
+        self.calls += 1
+        time.sleep(self.delay)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+@pytest.fixture
+def recognizers():
+    created = []
+    
+    def create(*backends, hedge_after=0.05, timeout=2):
+        recognizer = HedgedRecognizer(list(backends), hedge_after, timeout)
+        created.append(recognizer)
+        return recognizer
+    
+    yield create
+    for recognizer in created:
+        recognizer.close()
+
+
+def test_fast_primary_does_not_hedge(recognizers):
+    primary = DelayedBackend("primary", 0, "hello")
+    secondary = DelayedBackend("secondary", 0, "other")
+    assert recognizers(primary, secondary).recognize(AUDIO, "en") == "hello"
+    assert secondary.calls == 0
+
+
+def test_slow_primary_is_hedged(recognizers):
+    primary = DelayedBackend("primary", 0.5, "slow")
+    secondary = DelayedBackend("secondary", 0, "fast")
+    recognizer = recognizers(primary, secondary)
+    assert recognizer.recognize(AUDIO, "en") == "fast"
+    assert recognizer.stats["secondary"].wins == 1
+
+
+def test_failure_falls_through_to_next_backend(recognizers):
+    primary = DelayedBackend("primary", 0, sr.RequestError("offline"))
+    secondary = DelayedBackend("secondary", 0, "hello")
+    recognizer = recognizers(primary, secondary, hedge_after=1)
+    assert recognizer.recognize(AUDIO, "en") == "hello"
+    assert recognizer.stats["primary"].failures == 1
+
+
+def test_unknown_everywhere_raises_unknown(recognizers):
+    primary = DelayedBackend("primary", 0, sr.UnknownValueError())
+    with pytest.raises(sr.UnknownValueError):
+        recognizers(primary).recognize(AUDIO, "en")
+
+
+def test_unknown_waits_for_pending_hedge(recognizers):
+    primary = DelayedBackend("primary", 0.1, sr.UnknownValueError())
+    secondary = DelayedBackend("secondary", 0.2, "hello")
+    assert recognizers(primary, secondary).recognize(AUDIO, "en") == "hello"
+
+
+def test_all_failures_raise_request_error(recognizers):
+    primary = DelayedBackend("primary", 0, sr.RequestError("offline"))
+    secondary = DelayedBackend("secondary", 0, sr.RequestError("down"))
+    with pytest.raises(sr.RequestError):
+        recognizers(primary, secondary).recognize(AUDIO, "en")
+
+
+def test_failing_backend_is_tried_last(recognizers):
+    primary = DelayedBackend("primary", 0, sr.RequestError("offline"))
+    secondary = DelayedBackend("secondary", 0, "hello")
+    recognizer = recognizers(primary, secondary, hedge_after=1)
+    for _ in range(3):
+        recognizer.recognize(AUDIO, "en")
+    assert [backend.name for backend in recognizer.order()] == ["secondary", "primary"]
+
+
+def test_slow_backend_is_tried_after_fast_ones(recognizers):
+    primary = DelayedBackend("primary", 0, "hello")
+    secondary = DelayedBackend("secondary", 0, "hello")
+    recognizer = recognizers(primary, secondary, hedge_after=0.5)
+    for latency in (0.9, 1.0, 1.1):
+        recognizer.stats["primary"].record(latency, "success")
+    assert [backend.name for backend in recognizer.order()] == ["secondary", "primary"]
+
+
+def test_backend_stats_summary():
+    stats = BackendStats(window=4)
+    for latency, outcome in [(0.1, "success"), (0.2, "failure"), (0.3, "unknown"), (0.4, "success"), (0.5, "success")]:
+        stats.record(latency, outcome)
+    summary = stats.summary()
+    assert (summary["requests"], summary["failures"], summary["unknown"]) == (5, 1, 1)
+    assert summary["failure_rate"] == 0.25
+    assert summary["p50"] == 0.4
+    assert summary["p95"] == 0.5
@@ -0,0 +1,72 @@
+import pytest
+
+from voiceAssistant import IntentRouter, VoiceAssistant, extract_slots
+
+
+@pytest.fixture(scope="module")
+def router():
+    router = IntentRouter()
+    router.register_handlers(VoiceAssistant.__new__(VoiceAssistant))
+    return router
+
+
+@pytest.mark.parametrize("command, intent", [
+    ("what's the time", "time"),
+    ("hi there", "hello"),
+    ("this is sometimes fine", None),
+    ("search wikipedia for alan turing", "wikipedia"),
+    ("open youtube", "open_youtube"),
+    ("play on youtube", "play_youtube"),
+    ("play lofi beats on youtube", "play_youtube"),
+    ("send message to mom", "whatsapp"),
+    ("send a whatsapp to mom saying what time is dinner", "whatsapp"),
+    ("text mom saying hi", "whatsapp"),
+    ("search wikipedia for text to speech", "wikipedia"),
+    ("google search text to speech", "google_search"),
+    ("play text to speech on youtube", "play_youtube"),
+    ("search wikipedia for the message to garcia", "wikipedia"),
+    ("cancel the text to mom", "cancel"),
+    ("stop playing", "pause"),
+    ("stop", "rest"),
+    ("cancel that", "cancel"),
+    ("what are you doing", "status"),
+])
+def test_match_builtin_intents(router, command, intent):
+    match = router.match(command)
+    assert (match.intent.name if match else None) == intent
+
+
+def test_match_prefers_priority_then_longest_phrase():
+    router = IntentRouter()
+    router.register("lights", lambda command: None, ["lights"], priority=10)
+    router.register("lights_on", lambda command: None, ["turn on the lights"], priority=10)
+    router.register("urgent", lambda command: None, ["now"], priority=20)
+    assert router.match("turn on the lights").intent.name == "lights_on"
+    assert router.match("turn on the lights now").intent.name == "urgent"
+
+
+def test_match_checks_required_words():
+    router = IntentRouter()
+    router.register("volume_up", lambda command: None, ["up"], requires=["volume"])
+    assert router.match("volume up").intent.name == "volume_up"
+    assert router.match("look up") is None
+
+
+def test_register_needs_a_phrase():
+    with pytest.raises(ValueError):
+        IntentRouter().register("empty", lambda command: None, ["?"])
+
+
+@pytest.mark.parametrize("intent, command, slots", [
+    ("whatsapp", "send a whatsapp to mom saying i'll be late", {"recipient": "mom", "message": "i'll be late"}),
+    ("whatsapp", "text rahul saying hi please", {"recipient": "rahul", "message": "hi"}),
+    ("whatsapp", "send message to mom", {"recipient": "mom"}),
+    ("play_youtube", "play lofi beats on youtube", {"query": "lofi beats"}),
+    ("google_search", "search google for weather radar", {"query": "weather radar"}),
+    ("screenshot", "take a screenshot called desktop", {"name": "desktop"}),
+    ("screenshot", "take 5 screenshots every 2 seconds", {"count": "5", "interval": "2"}),
+    ("screenshot", "take three screenshots called demo", {"count": "three", "name": "demo"}),
+    ("whatsapp", "send whatsapp message", {}),
+])
+def test_extract_slots(intent, command, slots):
+    assert extract_slots(intent, command) == slots
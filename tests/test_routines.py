@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from voiceAssistant import IntentRouter, Metrics, VoiceAssistant
+
+
+@pytest.fixture
+def assistant():
+    assistant = VoiceAssistant.__new__(VoiceAssistant)
+    assistant.config = {"routine_timeout": 2, "routines": {
+        "good morning": ["greeting", "time", "weather: London"],
+        "broken": ["greeting", "horoscope"],
+    }}
+    assistant._fanout = ThreadPoolExecutor(max_workers=4)
+    assistant.metrics = Metrics()
+    assistant.spoken = []
+    assistant.speak = assistant.spoken.append
+    assistant._greeting_report = lambda: ["Good Morning Sir"]
+    assistant._time_report = lambda: ["The time is 07:00 AM"]
+    
+    def weather(location="current location"):
+        time.sleep(0.2)
+        return [f"The current temperature in {location} is 12°C"]
+    
+    assistant._weather_report = weather
+    yield assistant
+    assistant._fanout.shutdown(wait=True)
+
+
+def test_routine_speaks_combined_result_once(assistant):
+    lines = assistant.run_routine("good morning", ["greeting", "time", "weather: London"])
+    assert lines == ["Good Morning Sir", "The time is 07:00 AM", "The current temperature in London is 12°C"]
+    assert assistant.spoken == ["Good Morning Sir. The time is 07:00 AM. The current temperature in London is 12°C."]
+
+
+def test_routine_steps_run_concurrently(assistant):
+    started = time.perf_counter()
+    assistant.run_routine("weather twice", ["weather: London", "weather: Paris", "weather: Rome"])
+    assert time.perf_counter() - started < 0.5
+
+
+def test_failed_step_is_reported_in_place(assistant):
+    def fail():
+        raise RuntimeError("no battery")
+    
+    assistant._battery_report = fail
+    assert assistant.run_routine("check", ["battery", "time"]) == [
+        "Sorry, I couldn't get the battery information.", "The time is 07:00 AM"]
+
+
+def test_register_routines_skips_unknown_steps(assistant):
+    assistant.router = IntentRouter()
+    assistant._register_routines()
+    assert assistant.router.match("good morning assistant").intent.name == "routine_good_morning"
+    assert assistant.router.match("broken") is None
+
+
+def test_cancel_wins_over_routine_name(assistant):
+    assistant.router = IntentRouter()
+    assistant.router.register_handlers(assistant)
+    assistant._register_routines()
+    assert assistant.router.match("cancel the good morning routine").intent.name == "cancel"
@@ -0,0 +1,47 @@
+import time
+
+import pytest
+from PIL import Image
+
+from fakes import FakeScreen
+from voiceAssistant import SCREENSHOT_FORMATS, Metrics, ScreenCapture
+
+
+@pytest.fixture(scope="module")
+def screen():
+    return FakeScreen(64, 36)
+
+
+@pytest.mark.parametrize("fmt", sorted(SCREENSHOT_FORMATS))
+def test_capture_encodes_each_format(tmp_path, screen, fmt):
+    capture = ScreenCapture(screen, str(tmp_path), fmt)
+    timing = capture.capture(capture.path("frame"))
+    assert timing.filename.endswith(f".{SCREENSHOT_FORMATS[fmt][1]}")
+    with Image.open(timing.filename) as image:
+        assert image.size == (64, 36)
+    assert timing.size > 0 and timing.capture >= 0 and timing.encode >= 0
+
+
+def test_unknown_format_is_rejected(screen):
+    with pytest.raises(ValueError):
+        ScreenCapture(screen, fmt="gif")
+
+
+def test_burst_writes_every_frame_and_records_metrics(tmp_path, screen):
+    metrics = Metrics()
+    capture = ScreenCapture(screen, str(tmp_path), "png", metrics=metrics)
+    timings, dropped = capture.burst("burst", 3, 0.01)
+    assert dropped == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["burst_001.png", "burst_002.png", "burst_003.png"]
+    assert [timing.filename for timing in timings] == [str(tmp_path / f"burst_00{i}.png") for i in (1, 2, 3)]
+    histograms = {item["name"]: item["count"] for item in metrics.snapshot()["histograms"]}
+    assert histograms == {"screenshot_capture": 3, "screenshot_encode": 3}
+
+
+def test_burst_drops_frames_when_the_writer_falls_behind(tmp_path, screen):
+    capture = ScreenCapture(screen, str(tmp_path), "png", queue_size=1)
+    encode = capture.encode
+    capture.encode = lambda image, filename: time.sleep(0.1) or encode(image, filename)
+    timings, dropped = capture.burst("burst", 5, 0)
+    assert dropped > 0
+    assert len(timings) + dropped == 5
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from fakes import FakeIntegrations, headless_assistant
+from voiceAssistant import AssistantServer, is_loopback, run_server
+
+
+@pytest.fixture
+def server():
+    fakes = FakeIntegrations({name: 0 for name in FakeIntegrations.DEFAULT_LATENCY})
+    with headless_assistant(fakes) as assistant:
+        server = AssistantServer(assistant, "127.0.0.1", 0, processes=1)
+        yield server
+        server.close()
+
+
+def converse(server, lines, turns):
+    """Connect to the server, send raw lines and collect messages until ``turns`` turns are done."""
+    async def run():
+        listener = await asyncio.start_server(server._handle_client, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for line in lines:
+            writer.write(line.encode() + b"\n")
+        await writer.drain()
+        
+        messages = []
+        while sum(message["type"] == "turn_done" for message in messages) < turns:
+            line = await asyncio.wait_for(reader.readline(), 5)
+            if not line:
+                break
+            messages.append(json.loads(line))
+        writer.write(b'{"type": "bye"}\n')
+        await writer.drain()
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        return messages
+    
+    return asyncio.run(run())
+
+
+def test_text_turn_gets_replies(server):
+    messages = converse(server, ['{"type": "hello", "audio": false}', '{"type": "text", "text": "check battery"}'], 1)
+    replies = [message["text"] for message in messages if message["type"] == "reply"]
+    assert "Battery is at 80 percent" in replies
+    assert messages[-1]["type"] == "turn_done" and messages[-1]["intent"] == "battery"
+
+
+def test_invalid_json_keeps_the_connection(server):
+    messages = converse(server, ['not json', '{"type": "text", "text": "tell me a joke"}'], 1)
+    assert messages[0] == {"type": "error", "error": "invalid JSON"}
+    assert messages[-1]["intent"] == "joke"
+
+
+@pytest.mark.parametrize("line, error", [
+    ('[1]', "invalid message: expected an object"),
+    ('"hello"', "invalid message: expected an object"),
+    ('{"type": "text", "text": 5}', "invalid message: text must be a string"),
+    ('{"type": "hello", "name": ["x"]}', "invalid message: name must be a string"),
+    ('{"type": "audio"}', "invalid message: audio without data"),
+])
+def test_malformed_message_keeps_the_connection(server, line, error):
+    messages = converse(server, [line, '{"type": "text", "text": "tell me a joke"}'], 1)
+    assert messages[0] == {"type": "error", "error": error}
+    assert messages[-1]["intent"] == "joke"
+
+
+def test_intents_outside_the_allow_list_are_refused(server):
+    messages = converse(server, ['{"type": "text", "text": "send a whatsapp to mom saying hi"}'], 1)
+    replies = [message["text"] for message in messages if message["type"] == "reply"]
+    assert replies == ["Sorry, that command isn't available to remote clients."]
+    assert not any(call[0] == "whatsapp" for call in server.assistant.fakes.calls)
+
+
+def test_client_without_token_is_rejected(server):
+    server.token = "secret"
+    messages = converse(server, ['{"type": "hello", "audio": false}', '{"type": "text", "text": "check battery"}'], 1)
+    assert messages == [{"type": "error", "error": "unauthorized"}]
+
+
+def test_client_with_token_is_served(server):
+    server.token = "secret"
+    messages = converse(server, ['{"type": "hello", "audio": false, "token": "secret"}',
+                                 '{"type": "text", "text": "check battery"}'], 1)
+    assert messages[-1]["type"] == "turn_done" and messages[-1]["intent"] == "battery"
+
+
+@pytest.mark.parametrize("host, loopback", [
+    ("127.0.0.1", True), ("::1", True), ("localhost", True), ("0.0.0.0", False), ("192.168.1.5", False), ("example.com", False),
+])
+def test_is_loopback(host, loopback):
+    assert is_loopback(host) == loopback
+
+
+def test_server_refuses_public_address_without_token(caplog):
+    run_server({"server_host": "0.0.0.0", "server_token": None})
+    assert "Refusing to serve on 0.0.0.0 without a server_token" in caplog.text
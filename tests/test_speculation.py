@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import speech_recognition as sr
+
+from fakes import ScriptedStream
+from voiceAssistant import IntentRouter, Metrics, Speculator
+
+
+@pytest.fixture
+def fetched():
+    return []
+
+
+@pytest.fixture
+def speculator(fetched):
+    router = IntentRouter()
+    router.register("weather", lambda command: None, ["weather"])
+    router.register("joke", lambda command: None, ["joke"])
+    
+    def weather(text):
+        city = text.split()[-1]
+        return ("weather", city), lambda: fetched.append(city)
+    
+    executor = ThreadPoolExecutor(max_workers=2)
+    speculator = Speculator(router, executor, {"weather": weather}, stable=0, metrics=Metrics())
+    yield speculator
+    executor.shutdown(wait=True)
+
+
+def counts(speculator):
+    return {item["labels"]["outcome"]: item["value"] for item in speculator.metrics.snapshot()["counters"]}
+
+
+def test_matching_final_commits_prefetch(speculator, fetched):
+    speculator.partial("weather in London")
+    head_start = speculator.settle("weather in london")
+    assert head_start is not None and head_start >= 0
+    assert fetched == ["london"]
+    assert speculator.head_start["weather"] == [head_start]
+    assert counts(speculator) == {"started": 1, "hit": 1}
+
+
+def test_changed_final_discards_prefetch(speculator, fetched):
+    speculator.partial("weather in paris")
+    assert speculator.settle("weather in parma") is None
+    assert counts(speculator) == {"started": 1, "miss": 1}
+
+
+def test_unstable_partials_do_not_prefetch(speculator, fetched):
+    speculator.stable = 10
+    speculator.partial("weather in paris")
+    speculator.partial("weather in paris")
+    assert speculator.settle("weather in paris") is None
+    assert fetched == [] and counts(speculator) == {}
+
+
+def test_intents_without_prefetcher_are_ignored(speculator, fetched):
+    speculator.partial("tell me a joke")
+    assert speculator.settle("tell me a joke") is None
+    assert fetched == []
+
+
+def test_scripted_stream_reveals_words_over_time():
+    stream = ScriptedStream("weather in london", bytes_per_second=100, words_per_second=2)
+    assert stream.feed(b"\x00" * 10) is None
+    assert stream.feed(b"\x00" * 40) == "weather"
+    assert stream.feed(b"\x00" * 100) == "weather in london"
+    assert stream.finish() == "weather in london"
+    with pytest.raises(sr.UnknownValueError):
+        ScriptedStream("", 100).finish()
@@ -0,0 +1,113 @@
+import threading
+from types import SimpleNamespace
+
+from fakes import FakeIntegrations, headless_assistant
+from voiceAssistant import STATIC_PHRASES, SpeechHandle, SpeechOutput, VoiceAssistant, split_sentences
+
+
+def blocking_render(started, played):
+    def render(handle):
+        started.set()
+        handle.first_audio_at = handle.started_at
+        handle.stop_event.wait(5)
+        if not handle.stop_event.is_set():
+            played.append(handle.text)
+    return render
+
+
+
+def test_splits_on_sentence_ends():
+    assert split_sentences("Hello there. How are you? Fine!") == ["Hello there.", "How are you?", "Fine!"]
+
+
+def test_breaks_long_sentences_at_clauses():
+    text = "first clause here, second clause here; third clause here"
+    segments = split_sentences(text, max_length=30)
+    assert segments == ["first clause here,", "second clause here;", "third clause here"]
+    assert all(len(segment) <= 30 for segment in segments)
+
+
+def test_drops_empty_segments():
+    assert split_sentences("   ") == []
+
+
+def test_plays_in_order_and_records_timings():
+    played = []
+    output = SpeechOutput(lambda handle: played.append(handle.text))
+    first = output.say("one")
+    second = output.say("two")
+    assert second.wait(2)
+    assert played == ["one", "two"]
+    assert first.done and not first.interrupted
+    assert second.timings()["total"] is not None
+    output.close(2)
+
+
+def test_stop_interrupts_current_and_drops_queue():
+    started = threading.Event()
+    played = []
+    output = SpeechOutput(blocking_render(started, played))
+    current = output.say("long prompt")
+    queued = output.say("next prompt")
+    assert started.wait(2)
+    output.stop()
+    assert current.wait(2) and queued.wait(2)
+    assert current.interrupted and queued.interrupted
+    assert played == []
+    assert output.wait_idle(2)
+    output.close(2)
+
+
+
+def gated_assistant(output, barge_in=True):
+    assistant = VoiceAssistant.__new__(VoiceAssistant)
+    assistant.config = {"barge_in": barge_in, "barge_in_energy_ratio": 2.5, "barge_in_chunks": 3}
+    assistant.output = output
+    assistant.capture = SimpleNamespace(endpointer=SimpleNamespace(threshold=100))
+    return assistant
+
+
+def test_speech_gate_keeps_speech_while_silent():
+    output = SpeechOutput(lambda handle: None)
+    output.wait_idle(2)
+    assert gated_assistant(output)._speech_gate(50, True) is True
+    output.close(2)
+
+
+def test_speech_gate_barges_in_on_sustained_speech():
+    started = threading.Event()
+    output = SpeechOutput(blocking_render(started, []))
+    handle = output.say("talking")
+    assert started.wait(2)
+    assistant = gated_assistant(output)
+    assert assistant._speech_gate(1000, True) is None
+    assert assistant._speech_gate(100, False) is None
+    assert assistant._speech_gate(1000, False) is None
+    assert assistant._speech_gate(1000, False) is None
+    assert assistant._speech_gate(1000, False) is True
+    assert handle.wait(2) and handle.interrupted
+    output.close(2)
+
+
+def test_speech_gate_discards_echo_without_barge_in():
+    started = threading.Event()
+    output = SpeechOutput(blocking_render(started, []))
+    handle = output.say("talking")
+    assert started.wait(2)
+    assert gated_assistant(output, barge_in=False)._speech_gate(1000, True) is False
+    handle.cancel()
+    output.close(2)
+
+
+def test_warmed_up_phrases_stream_without_synthesis():
+    fakes = FakeIntegrations({name: 0 for name in FakeIntegrations.DEFAULT_LATENCY})
+    with headless_assistant(fakes, {"tts_templates": False}) as assistant:
+        assistant._warm_up_tts()
+        warmed = len(fakes.calls)
+        assistant.player = SimpleNamespace(play_bytes=lambda audio, stop_event: None)
+        for phrase in STATIC_PHRASES:
+            handle = SpeechHandle(phrase)
+            handle.started_at = handle.queued_at
+            assistant._speak_streaming(handle)
+    assert warmed > len(STATIC_PHRASES)
+    assert [call for call in fakes.calls if call[0] == "tts"][warmed:] == []
@@ -0,0 +1,74 @@
+from voiceAssistant import TTSCache
+
+
+def synthesizer(calls, size=100):
+    def synthesize(path):
+        calls.append(path)
+        with open(path, 'wb') as f:
+            f.write(b"\xff" * size)
+    return synthesize
+
+
+def test_miss_then_hit(tmp_path):
+    cache = TTSCache(str(tmp_path), 10_000)
+    calls = []
+    first = cache.fetch("hello", "en", False, synthesizer(calls))
+    second = cache.fetch("hello", "en", False, synthesizer(calls))
+    assert first == second
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_key_depends_on_language_and_speed():
+    assert TTSCache.key("hello", "en", False) != TTSCache.key("hello", "hi", False)
+    assert TTSCache.key("hello", "en", False) != TTSCache.key("hello", "en", True)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = TTSCache(str(tmp_path), 250)
+    calls = []
+    cache.fetch("a", "en", False, synthesizer(calls))
+    cache.fetch("b", "en", False, synthesizer(calls))
+    cache.fetch("a", "en", False, synthesizer(calls))
+    cache.fetch("c", "en", False, synthesizer(calls))
+    assert cache.lookup("a", "en", False)
+    assert cache.lookup("b", "en", False) is None
+    assert cache.lookup("c", "en", False)
+    assert len(list(tmp_path.glob("*.mp3"))) == 2
+
+
+def test_index_survives_restart(tmp_path):
+    calls = []
+    TTSCache(str(tmp_path), 10_000).fetch("hello", "en", False, synthesizer(calls))
+    cache = TTSCache(str(tmp_path), 10_000)
+    assert cache.lookup("hello", "en", False)
+    cache.fetch("hello", "en", False, synthesizer(calls))
+    assert len(calls) == 1
+
+
+def test_warm_up_skips_cached_phrases(tmp_path):
+    cache = TTSCache(str(tmp_path), 10_000)
+    calls = []
+    
+    def synthesize(text, path):
+        calls.append(text)
+        synthesizer([])(path)
+    
+    cache.warm_up(["one", "two"], "en", False, synthesize)
+    cache.warm_up(["one", "two", "three"], "en", False, synthesize)
+    assert calls == ["one", "two", "three"]
+
+
+def test_fetch_bytes_shares_entries_with_files(tmp_path):
+    cache = TTSCache(str(tmp_path), 10_000)
+    calls = []
+    
+    def synthesize():
+        calls.append(1)
+        return b"mp3"
+    
+    assert cache.fetch_bytes("hello", "en", False, synthesize) == b"mp3"
+    assert cache.fetch_bytes("hello", "en", False, synthesize) == b"mp3"
+    assert open(cache.lookup("hello", "en", False), 'rb').read() == b"mp3"
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
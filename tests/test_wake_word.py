@@ -0,0 +1,51 @@
+import numpy as np
+import speech_recognition as sr
+
+from benchmarks import benchmark_wake_word
+from fakes import write_wake_word_fixtures
+from voiceAssistant import WakeWordDetector, read_wav
+
+RATE = 16000
+
+
+def tones(*frequencies, seconds=0.2, amplitude=8000, rate=RATE):
+    t = np.arange(int(seconds * rate)) / rate
+    samples = np.concatenate([amplitude * np.sin(2 * np.pi * f * t) for f in frequencies])
+    return samples.astype(np.int16).tobytes()
+
+
+def audio(data):
+    return sr.AudioData(data, RATE, 2)
+
+
+def test_detects_template_and_rejects_other_sounds():
+    detector = WakeWordDetector([audio(tones(400, 1200, 700))], threshold=0.6)
+    assert detector.detect(audio(tones(410, 1180, 690, seconds=0.22)))[0]
+    detected, distance = detector.detect(audio(tones(2500, 300, 3000)))
+    assert not detected
+    assert distance > detector.score(audio(tones(400, 1200, 700)))
+
+
+def test_dtw_rejects_very_different_lengths():
+    features = np.zeros((10, 4))
+    assert WakeWordDetector.dtw_distance(features, np.zeros((30, 4))) == float('inf')
+    assert WakeWordDetector.dtw_distance(features, np.zeros((12, 4))) == 0.0
+
+
+def test_from_directory_without_templates(tmp_path):
+    assert WakeWordDetector.from_directory(str(tmp_path), 0.6) is None
+    assert WakeWordDetector.from_directory(str(tmp_path / "missing"), 0.6) is None
+
+
+def test_synthetic_fixtures_separate_positives_from_negatives(tmp_path):
+    write_wake_word_fixtures(str(tmp_path))
+    detector = WakeWordDetector.from_directory(str(tmp_path / "templates"), threshold=0.6)
+    assert all(detector.detect(read_wav(path))[0] for path in (tmp_path / "positive").glob("*.wav"))
+    assert not any(detector.detect(read_wav(path))[0] for path in (tmp_path / "negative").glob("*.wav"))
+
+
+def test_benchmark_generates_fixtures_when_missing(tmp_path, capsys):
+    benchmark_wake_word(str(tmp_path / "missing"))
+    output = capsys.readouterr().out
+    assert "using synthetic tone fixtures" in output
+    assert "False reject rate: 0.0%" in output and "False accept rate: 0.0%" in output
@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+
+import pytest
+
+from voiceAssistant import WikiStore, normalize_query
+
+
+@pytest.fixture
+def store():
+    store = WikiStore(":memory:", ttl=3600)
+    yield store
+    store.close()
+
+
+def test_normalize_query_drops_leading_filler():
+    assert normalize_query("search for Alan Turing") == "alan turing"
+    assert normalize_query("Python (programming language)") == "python programming language"
+    assert normalize_query("what is") == "what is"
+
+
+def test_lookup_by_title_and_query(store):
+    store.store("Alan Turing", "Alan Turing was a mathematician.", ["who was alan turing", "turing"])
+    assert store.lookup("Alan Turing") == ("Alan Turing", "Alan Turing was a mathematician.")
+    assert store.lookup("tell me about turing")[0] == "Alan Turing"
+    assert store.lookup("grace hopper") is None
+
+
+def test_expired_entries_are_only_an_offline_fallback():
+    store = WikiStore(":memory:", ttl=-1)
+    store.store("Alan Turing", "summary")
+    assert store.lookup("alan turing") is None
+    assert store.lookup("alan turing", include_expired=True) == ("Alan Turing", "summary")
+    store.close()
+
+
+def test_search_ranks_title_matches(store):
+    if not store.full_text:
+        pytest.skip("SQLite without FTS5")
+    store.store("Enigma machine", "A cipher device broken by Alan Turing and others.")
+    store.store("Alan Turing", "British mathematician who worked on the Enigma.")
+    assert store.search("turing")[0] == "Alan Turing"
+    assert store.search("enigma cipher")[0] == "Enigma machine"
+    assert store.search("grace hopper") is None
+    assert store.search("turing hopper") is None
+
+
+def test_import_jsonl_never_expires(tmp_path):
+    path = tmp_path / "pages.jsonl"
+    path.write_text(json.dumps({"title": "Ada Lovelace", "summary": "Mathematician.", "queries": ["ada"]}) + "\n\n")
+    store = WikiStore(":memory:", ttl=-1)
+    assert store.import_jsonl(str(path)) == 1
+    assert store.lookup("ada") == ("Ada Lovelace", "Mathematician.")
+    store.close()
+
+
+def test_fetch_once_joins_a_fetch_in_flight(store):
+    calls = []
+    
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return "Alan Turing", "summary"
+    
+    results = []
+    threads = [threading.Thread(target=lambda query=query: results.append(store.fetch_once(query, fetch)))
+               for query in ("alan turing", "search for Alan Turing")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [("Alan Turing", "summary")] * 2
+    assert len(calls) == 1
@@ -1,59 +1,3090 @@
 import os
+import io
+import re
 import time
+import queue
 import json
+import argparse
+import asyncio
+import base64
 import logging
+import logging.handlers
+import atexit
+import copy
+import gzip
+import shutil
+import itertools
 import tempfile
 import uuid
+import wave
+import hashlib
+import hmac
+import ipaddress
+import fnmatch
+import bisect
+import contextlib
+import sqlite3
+import importlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from collections import Counter, OrderedDict, deque
 from datetime import datetime
-from typing import Optional, Dict, Any
-from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Dict, Any, Callable, Iterable
+from dataclasses import dataclass, field
 from pathlib import Path
 import speech_recognition as sr
+from speech_recognition import audioop
 from gtts import gTTS
-from playsound import playsound
-import wikipedia
 import webbrowser
-import pywhatkit as kit
-import pyjokes
-import pyautogui
 import requests
-from bs4 import BeautifulSoup
-from pywikihow import search_wikihow
-import psutil
-import speedtest
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('assistant.log'),
-        logging.StreamHandler()
-    ]
-)
+from requests.adapters import HTTPAdapter
+
+if TYPE_CHECKING:
+    from fakes import FakeIntegrations
+
 logger = logging.getLogger(__name__)
 
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+class ContextFilter(logging.Filter):
+    """Tag records with the turn and background job they were logged from."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace()
+        job = current_job()
+        record.turn = trace.id if trace is not None else None
+        record.job = job.name if job is not None else None
+        return True
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread.
+
+    Only the message arguments are merged on the calling thread, so a log
+    call on the critical path costs a record copy and a queue put.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including structured ``fields``."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key in ("turn", "job"):
+            if getattr(record, key, None) is not None:
+                entry[key] = getattr(record, key)
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def _gzip_rotator(source: str, destination: str):
+    with open(source, 'rb') as f_in, gzip.open(destination, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+def setup_logging(config: Dict[str, Any]) -> logging.handlers.QueueListener:
+    """Route all logging through a queue to a background writer with a rotating, compressed log file."""
+    log_file = config.get('log_file', 'assistant.log')
+    if config.get('log_rotation', 'size') == 'size':
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=int(config.get('log_max_mb', 10) * 1024 * 1024),
+            backupCount=config.get('log_backups', 5),
+            encoding='utf-8'
+        )
+    else:
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=config['log_rotation'], backupCount=config.get('log_backups', 5), encoding='utf-8'
+        )
+    file_handler.namer = lambda name: f"{name}.gz"
+    file_handler.rotator = _gzip_rotator
+    file_handler.setFormatter(JsonFormatter() if config.get('log_json', True) else logging.Formatter(LOG_FORMAT))
+    
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    
+    log_queue = queue.Queue(-1)
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(config.get('log_level', 'INFO'))
+    
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+class LazyModule:
+    """Stand-in for a module that is imported the first time one of its attributes is used."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.import_time: Optional[float] = None
+        self._module = None
+        self._lock = threading.Lock()
+    
+    def load(self):
+        """Import the module if needed and return it."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.name)
+                    self.import_time = time.perf_counter() - start
+                    logger.info(f"Imported {self.name} in {self.import_time:.3f}s")
+                    self._module = module
+        return self._module
+    
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+    
+    @contextlib.contextmanager
+    def override(self, module: Any):
+        """Temporarily replace the module, e.g. with a fake in headless runs."""
+        with self._lock:
+            previous, self._module = self._module, module
+        try:
+            yield module
+        finally:
+            with self._lock:
+                self._module = previous
+    
+    def __getattr__(self, attr: str):
+        return getattr(self.load(), attr)
+
+playsound = LazyModule("playsound")
+wikipedia = LazyModule("wikipedia")
+kit = LazyModule("pywhatkit")
+pyjokes = LazyModule("pyjokes")
+pyautogui = LazyModule("pyautogui")
+bs4 = LazyModule("bs4")
+pywikihow = LazyModule("pywikihow")
+psutil = LazyModule("psutil")
+speedtest = LazyModule("speedtest")
+np = LazyModule("numpy")
+vosk = LazyModule("vosk")
+
+INTEGRATIONS = (wikipedia, kit, pyjokes, pyautogui, bs4, pywikihow, psutil, speedtest, playsound)
+
+def preload_integrations(modules: Iterable[LazyModule] = INTEGRATIONS):
+    """Import integrations ahead of first use, logging any that fail."""
+    for module in modules:
+        try:
+            module.load()
+        except Exception as e:
+            logger.warning(f"Preloading {module.name} failed: {e}")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Latency histogram with fixed bucket bounds in seconds."""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile as the upper bound of the bucket that contains it."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound != float('inf') else self.buckets[-1]
+        return self.buckets[-1]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float('inf') else str(bound)] = cumulative
+        return {"count": self.count, "sum": round(self.sum, 6), "p50": self.quantile(0.5),
+                "p95": self.quantile(0.95), "buckets": buckets}
+
+class Trace:
+    """Stage timings for one turn, dumped once the turn and any speech it queued have finished."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, on_complete: Optional[Callable[["Trace"], None]] = None):
+        self.id = next(self._ids)
+        self.started = time.perf_counter()
+        self.discarded = False
+        self.wall_time = time.time()
+        self.spans = []
+        self._on_complete = on_complete
+        self._pending = 0
+        self._closed = False
+        self._lock = threading.Lock()
+    
+    def add(self, stage: str, started: float, seconds: float, **labels):
+        with self._lock:
+            self.spans.append({"stage": stage, "at": round(started - self.started, 4),
+                               "seconds": round(seconds, 4), **labels})
+    
+    def hold(self):
+        """Keep the trace open until a matching release(), e.g. for queued speech."""
+        with self._lock:
+            self._pending += 1
+    
+    def release(self):
+        with self._lock:
+            self._pending -= 1
+        self._maybe_complete()
+    
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._maybe_complete()
+    
+    def discard(self):
+        """Drop this trace, e.g. when the turn turned out to have no command."""
+        with self._lock:
+            self.discarded = True
+            self._on_complete = None
+    
+    def _maybe_complete(self):
+        with self._lock:
+            if not self._closed or self._pending > 0 or self._on_complete is None:
+                return
+            on_complete, self._on_complete = self._on_complete, None
+        on_complete(self)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"type": "trace", "turn": self.id, "time": self.wall_time,
+                    "spans": sorted(self.spans, key=lambda span: span["at"])}
+
+_trace_context = threading.local()
+
+def current_trace() -> Optional[Trace]:
+    """Return the turn trace being recorded on this thread, if any."""
+    return getattr(_trace_context, 'trace', None)
+
+class Metrics:
+    """Counters, gauges and latency histograms exported to a rolling JSONL file and Prometheus text.
+
+    Recording is a lock and a few arithmetic operations, cheap enough to
+    leave on. With ``trace_turns`` enabled, every stage of a turn is also
+    collected and written out as one trace record.
+    """
+
+    PREFIX = "voice_assistant"
+
+    def __init__(self, jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+                 max_bytes: int = 5 * 1024 * 1024, trace_turns: bool = False):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.max_bytes = max_bytes
+        self.trace_turns = trace_turns
+        self.started_at = time.time()
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._counters: Dict[tuple, float] = {}
+        self._gauges: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._exporter: Optional[threading.Thread] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+    
+    def count(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def gauge(self, name: str, value: float, **labels):
+        """Set a value that can go up and down, such as the current noise floor."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+    
+    def observe(self, name: str, seconds: float, started: Optional[float] = None,
+                trace: Optional[Trace] = None, **labels):
+        """Record a stage duration, and add it to the given or current turn trace if one is active."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+        
+        trace = trace or current_trace()
+        if trace is not None:
+            trace.add(name, started if started is not None else time.perf_counter() - seconds, seconds, **labels)
+    
+    @contextlib.contextmanager
+    def span(self, name: str, **labels):
+        """Time the enclosed block as a stage; the yielded dict receives its ``seconds``."""
+        timing = {}
+        started = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            timing["seconds"] = time.perf_counter() - started
+            self.observe(name, timing["seconds"], started, **labels)
+    
+    @contextlib.contextmanager
+    def turn(self):
+        """Time one listen-and-respond turn and collect its trace.
+
+        The trace is written out once the turn and the speech it queued have
+        finished, if ``trace_turns`` is enabled. Call ``discard()`` on the
+        yielded trace to leave a turn out of the metrics.
+        """
+        trace = Trace(self._write_trace if self.trace_turns else None)
+        previous = current_trace()
+        _trace_context.trace = trace
+        try:
+            yield trace
+        finally:
+            _trace_context.trace = previous
+            if not trace.discarded:
+                self.observe("turn", time.perf_counter() - trace.started, trace.started, trace=trace)
+            trace.close()
+    
+    def _write_trace(self, trace: Trace):
+        record = trace.to_dict()
+        logger.info(f"Turn {trace.id} trace: {len(record['spans'])} stages",
+                    extra={"fields": {"turn": trace.id, "spans": record['spans']}})
+        self._append_jsonl(record)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "type": "metrics",
+                "time": time.time(),
+                "uptime": round(time.time() - self.started_at, 3),
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in self._counters.items()],
+                "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                           for (name, labels), value in self._gauges.items()],
+                "histograms": [{"name": name, "labels": dict(labels), **histogram.to_dict()}
+                               for (name, labels), histogram in self._histograms.items()],
+            }
+    
+    def prometheus_text(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        def render_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in pairs) + "}"
+        
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, histogram.to_dict()) for key, histogram in self._histograms.items())
+        
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{self.PREFIX}_{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{render_labels(labels)} {value}")
+        
+        for (name, labels), value in gauges:
+            metric = f"{self.PREFIX}_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} gauge")
+                declared.add(metric)
+            lines.append(f"{metric}{render_labels(labels)} {value}")
+        
+        for (name, labels), data in histograms:
+            metric = f"{self.PREFIX}_{name}_seconds"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} histogram")
+                declared.add(metric)
+            for bound, count in data["buckets"].items():
+                lines.append(f"{metric}_bucket{render_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{metric}_sum{render_labels(labels)} {data['sum']}")
+            lines.append(f"{metric}_count{render_labels(labels)} {data['count']}")
+        
+        return "\n".join(lines) + "\n"
+    
+    def export(self):
+        """Append a snapshot to the JSONL file and rewrite the Prometheus text file."""
+        if self.jsonl_path:
+            self._append_jsonl(self.snapshot())
+        if self.prometheus_path:
+            temp_path = f"{self.prometheus_path}.tmp"
+            with open(temp_path, 'w') as f:
+                f.write(self.prometheus_text())
+            os.replace(temp_path, self.prometheus_path)
+    
+    def _append_jsonl(self, record: Dict[str, Any]):
+        if not self.jsonl_path:
+            return
+        line = json.dumps(record) + "\n"
+        with self._file_lock:
+            try:
+                if os.path.getsize(self.jsonl_path) + len(line) > self.max_bytes:
+                    os.replace(self.jsonl_path, f"{self.jsonl_path}.1")
+            except OSError:
+                pass
+            with open(self.jsonl_path, 'a') as f:
+                f.write(line)
+    
+    def start(self, interval: float = 60, port: Optional[int] = None):
+        """Export periodically in the background and optionally serve /metrics over HTTP."""
+        def export_loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.export()
+                except Exception as e:
+                    logger.warning(f"Metrics export failed: {e}")
+        
+        self._exporter = threading.Thread(target=export_loop, name="metrics-export", daemon=True)
+        self._exporter.start()
+        
+        if port:
+            metrics = self
+            
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = metrics.prometheus_text().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                
+                def log_message(self, format, *args):
+                    pass
+            
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"Serving metrics on http://127.0.0.1:{port}/metrics")
+    
+    def close(self):
+        """Stop background export and write a final snapshot."""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        try:
+            self.export()
+        except Exception as e:
+            logger.warning(f"Metrics export failed: {e}")
+
+@dataclass
+class Contact:
+    name: str
+    phone: str
+    aliases: list
+
+STATIC_PHRASES = (
+    "Good Morning Sir",
+    "Good Afternoon Sir",
+    "Good Evening Sir",
+    "How can I help you today?",
+    "I'm awake and ready to help!",
+    "What can I do for you?",
+    "Say 'wake up' to activate me.",
+    "Hello! How can I help you?",
+    "I'm doing well, thank you for asking! How can I assist you today?",
+    "I didn't understand that command. Please try again or say 'what can you do' to see available commands.",
+    "Going to rest mode. Say 'wake up' to activate me again.",
+    "Goodbye! Have a great day!",
+    "Goodbye!",
+    "Whom do you want to send the message to?",
+    "What's the message?",
+    "Message cancelled.",
+    "Message sent successfully.",
+    "Contact not found. Please check the name and try again.",
+    "What would you like to watch?",
+    "Cancelled YouTube search.",
+    "What would you like to listen to?",
+    "Opening Spotify",
+    "Opening YouTube",
+    "What should I search on Google?",
+    "Searching on Google",
+    "Searching Wikipedia...",
+    "According to Wikipedia:",
+    "Please specify what to search for.",
+    "Multiple results found. Please be more specific.",
+    "No Wikipedia page found for that query.",
+    "Checking weather information...",
+    "What should I name the screenshot?",
+    "Screenshot cancelled.",
+    "Taking screenshot in 3 seconds...",
+    "Testing internet speed. I'll let you know when it's done.",
+    "Nothing is running in the background.",
+    "There's nothing running to cancel.",
+    "Volume increased",
+    "Volume decreased",
+    "Volume muted",
+    "Paused",
+    "Battery level is excellent.",
+    "Battery level is good.",
+    "Battery level is moderate. Consider charging soon.",
+    "Battery is getting low. Please charge.",
+    "Battery is very low. Please charge immediately.",
+)
+
+class TTSCache:
+    """On-disk cache of synthesized speech keyed by text, language and speed."""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.synthesis_time = 0.0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for path in sorted(self.cache_dir.glob("*.mp3"), key=lambda p: p.stat().st_mtime):
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._size += size
+    
+    @staticmethod
+    def key(text: str, lang: str, slow: bool) -> str:
+        """Return the content address for an utterance."""
+        payload = json.dumps([text, lang, bool(slow)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.mp3"
+    
+    def lookup(self, text: str, lang: str, slow: bool) -> Optional[str]:
+        """Return the cached audio file for an utterance, or None on a miss."""
+        key = self.key(text, lang, slow)
+        path = self._path(key)
+        
+        with self._lock:
+            if key not in self._entries:
+                return None
+            if not path.exists():
+                self._size -= self._entries.pop(key)
+                return None
+            self._entries.move_to_end(key)
+        
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return str(path)
+    
+    def fetch(self, text: str, lang: str, slow: bool, synthesize: Callable[[str], None]) -> str:
+        """Return a cached audio file, synthesizing and storing it on a miss."""
+        path = self.lookup(text, lang, slow)
+        if path:
+            with self._lock:
+                self.hits += 1
+            return path
+        
+        with self._lock:
+            self.misses += 1
+        return self._store(text, lang, slow, synthesize)
+    
+    def fetch_bytes(self, text: str, lang: str, slow: bool, synthesize: Callable[[], bytes]) -> bytes:
+        """Return cached audio as bytes, synthesizing it in memory on a miss."""
+        path = self.lookup(text, lang, slow)
+        if path:
+            try:
+                data = Path(path).read_bytes()
+                with self._lock:
+                    self.hits += 1
+                return data
+            except OSError:
+                pass
+        
+        with self._lock:
+            self.misses += 1
+        
+        audio = {}
+        def write(partial: str):
+            audio['data'] = synthesize()
+            Path(partial).write_bytes(audio['data'])
+        
+        self._store(text, lang, slow, write)
+        return audio['data']
+    
+    def warm_up(self, phrases: Iterable[str], lang: str, slow: bool, synthesize: Callable[[str, str], None]):
+        """Synthesize any phrases that are not cached yet."""
+        for text in phrases:
+            if self.lookup(text, lang, slow):
+                continue
+            try:
+                self._store(text, lang, slow, lambda path, text=text: synthesize(text, path))
+            except Exception as e:
+                logger.warning(f"TTS warm-up failed for '{text}': {e}")
+                return
+    
+    def _store(self, text: str, lang: str, slow: bool, synthesize: Callable[[str], None]) -> str:
+        key = self.key(text, lang, slow)
+        path = self._path(key)
+        partial = path.with_suffix(f".{uuid.uuid4().hex}.part")
+        
+        start = time.perf_counter()
+        try:
+            synthesize(str(partial))
+            os.replace(partial, path)
+        finally:
+            if partial.exists():
+                partial.unlink()
+        elapsed = time.perf_counter() - start
+        
+        with self._lock:
+            self.synthesis_time += elapsed
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = path.stat().st_size
+            self._size += self._entries[key]
+            self._evict()
+        return str(path)
+    
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                self._path(key).unlink()
+            except OSError as e:
+                logger.warning(f"Failed to evict cached audio {key}: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the estimated synthesis time saved."""
+        with self._lock:
+            average = self.synthesis_time / self.misses if self.misses else 0.0
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "synthesis_seconds": round(self.synthesis_time, 3),
+                "saved_seconds": round(self.hits * average, 3),
+            }
+
+class AudioPlayer:
+    """Plays mp3 audio from files or in-memory buffers."""
+
+    def __init__(self):
+        self._mixer = None
+        try:
+            import pygame
+            pygame.mixer.init()
+            self._mixer = pygame.mixer
+        except Exception as e:
+            logger.info(f"In-memory playback unavailable, using playsound: {e}")
+    
+    def play_file(self, filename: str, stop: Optional[threading.Event] = None):
+        """Play an audio file and block until it finishes or is stopped."""
+        if self._mixer:
+            self._mixer.music.load(filename)
+            self._wait(stop)
+        else:
+            playsound.playsound(filename)
+    
+    def play_bytes(self, data: bytes, stop: Optional[threading.Event] = None):
+        """Play mp3 data held in memory and block until it finishes or is stopped."""
+        if self._mixer:
+            self._mixer.music.load(io.BytesIO(data), "mp3")
+            self._wait(stop)
+            return
+        
+        handle, filename = tempfile.mkstemp(prefix="voice_", suffix=".mp3")
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                f.write(data)
+            playsound.playsound(filename)
+        finally:
+            try:
+                os.remove(filename)
+            except Exception as cleanup_error:
+                logger.warning(f"Failed to cleanup audio file {filename}: {cleanup_error}")
+    
+    @property
+    def can_decode(self) -> bool:
+        return self._mixer is not None
+    
+    @property
+    def sample_rate(self) -> int:
+        return self._mixer.get_init()[0]
+    
+    def decode(self, data: bytes):
+        """Decode mp3 data to PCM samples in the mixer's format."""
+        import pygame
+        return pygame.sndarray.array(self._mixer.Sound(file=io.BytesIO(data)))
+    
+    def play_pcm(self, samples, stop: Optional[threading.Event] = None):
+        """Play PCM samples in the mixer's format and block until they finish or are stopped."""
+        import pygame
+        channel = pygame.sndarray.make_sound(np.ascontiguousarray(samples)).play()
+        while channel is not None and channel.get_busy():
+            if stop and stop.is_set():
+                channel.stop()
+                break
+            time.sleep(0.02)
+    
+    def _wait(self, stop: Optional[threading.Event]):
+        self._mixer.music.play()
+        while self._mixer.music.get_busy():
+            if stop and stop.is_set():
+                self._mixer.music.stop()
+                break
+            time.sleep(0.02)
+
+@dataclass
+class SpeechHandle:
+    """A queued utterance with its playback timing."""
+    text: str
+    queued_at: float = field(default_factory=time.perf_counter)
+    started_at: Optional[float] = None
+    first_audio_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    interrupted: bool = False
+    trace: Optional[Trace] = field(default=None, repr=False)
+    stop_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    done_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the utterance has finished playing or was stopped."""
+        return self.done_event.wait(timeout)
+    
+    def cancel(self):
+        """Stop this utterance, or drop it if it has not started yet."""
+        self.interrupted = True
+        self.stop_event.set()
+    
+    @property
+    def done(self) -> bool:
+        return self.done_event.is_set()
+    
+    def timings(self) -> Dict[str, Optional[float]]:
+        """Return queue wait, time to first audio and playback duration in seconds."""
+        def span(start, end):
+            return round(end - start, 3) if start is not None and end is not None else None
+        
+        return {
+            "queue_wait": span(self.queued_at, self.started_at),
+            "time_to_first_audio": span(self.started_at, self.first_audio_at),
+            "playback": span(self.first_audio_at, self.finished_at),
+            "total": span(self.queued_at, self.finished_at),
+        }
+
+class SpeechOutput:
+    """Plays queued utterances in order on a dedicated thread."""
+
+    def __init__(self, render: Callable[[SpeechHandle], None], history_size: int = 50,
+                 on_finished: Optional[Callable[[SpeechHandle], None]] = None):
+        self.render = render
+        self.on_finished = on_finished
+        self.history = deque(maxlen=history_size)
+        self.last_finished_at = 0.0
+        self._queue = queue.Queue()
+        self._current: Optional[SpeechHandle] = None
+        self._idle = threading.Event()
+        self._idle.set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="speech-output", daemon=True)
+        self._thread.start()
+    
+    def say(self, text: str, trace: Optional[Trace] = None) -> SpeechHandle:
+        """Queue text for playback and return its handle immediately."""
+        handle = SpeechHandle(text, trace=trace)
+        with self._lock:
+            self._idle.clear()
+            self._queue.put(handle)
+        return handle
+    
+    @property
+    def busy(self) -> bool:
+        return not self._idle.is_set()
+    
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued utterance has been played."""
+        return self._idle.wait(timeout)
+    
+    def stop(self):
+        """Interrupt the current utterance and drop everything queued after it."""
+        dropped = []
+        with self._lock:
+            current = self._current
+            while True:
+                try:
+                    handle = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if handle is None:
+                    self._queue.put(None)
+                    break
+                handle.cancel()
+                handle.done_event.set()
+                dropped.append(handle)
+            if current is None:
+                self._idle.set()
+        if current:
+            current.cancel()
+        if self.on_finished:
+            for handle in dropped:
+                self.on_finished(handle)
+    
+    def close(self, timeout: Optional[float] = None):
+        """Finish playing queued speech and stop the output thread."""
+        self.wait_idle(timeout)
+        self._queue.put(None)
+        self._thread.join(timeout)
+    
+    def _run(self):
+        while True:
+            handle = self._queue.get()
+            if handle is None:
+                return
+            
+            with self._lock:
+                self._current = handle
+            if not handle.stop_event.is_set():
+                handle.started_at = time.perf_counter()
+                try:
+                    self.render(handle)
+                except Exception as e:
+                    logger.error(f"Speech output error: {e}")
+            handle.finished_at = time.perf_counter()
+            self.last_finished_at = handle.finished_at
+            self.history.append(handle)
+            handle.done_event.set()
+            logger.debug(f"Speech timings for '{handle.text[:40]}'", extra={"fields": handle.timings()})
+            if self.on_finished:
+                try:
+                    self.on_finished(handle)
+                except Exception as e:
+                    logger.error(f"Speech output callback error: {e}")
+            
+            with self._lock:
+                self._current = None
+                if self._queue.empty():
+                    self._idle.set()
+
+def split_sentences(text: str, max_length: int = 120) -> list:
+    """Split text into sentences, breaking long sentences at clause boundaries."""
+    segments = []
+    for sentence in re.split(r'(?<=[.!?])\s+', text.strip()):
+        if len(sentence) <= max_length:
+            segments.append(sentence)
+            continue
+        
+        current = ""
+        for clause in re.split(r'(?<=[,;:])\s+', sentence):
+            if current and len(current) + len(clause) + 1 > max_length:
+                segments.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}" if current else clause
+        if current:
+            segments.append(current)
+    
+    return [segment for segment in segments if segment]
+
+def _spell_number(value: str) -> Optional[list]:
+    number = int(value)
+    return [str(number)] if 0 <= number <= 100 else None
+
+def _spell_minute(value: str) -> Optional[list]:
+    minute = int(value)
+    if minute == 0:
+        return ["o'clock"]
+    return ["oh", str(minute)] if minute < 10 else _spell_number(value)
+
+def _spell_year(value: str) -> Optional[list]:
+    century, rest = divmod(int(value), 100)
+    if century == 20 and rest < 10:
+        return ["two thousand"] + ([str(rest)] if rest else [])
+    if rest == 0:
+        return [str(century), "hundred"]
+    return [str(century)] + (["oh", str(rest)] if rest < 10 else [str(rest)])
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+MONTHS = ("January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December")
+
+# Responses assembled from pre-rendered fragments: a pattern over the spoken
+# text, and its parts, where "{slot}" is spelled by PHRASE_SLOTS.
+PHRASE_TEMPLATES = (
+    (re.compile(r"Battery is at (?P<percent>\d{1,3}) percent\.?"), ("Battery is at", "{percent}", "percent")),
+    (re.compile(r"The time is (?P<hour>\d{1,2}):(?P<minute>\d{2}) (?P<period>AM|PM)\.?"),
+     ("The time is", "{hour}", "{minute}", "{period}")),
+    (re.compile(r"Today is (?P<weekday>\w+), (?P<month>\w+) (?P<day>\d{1,2}), (?P<year>\d{4})\.?"),
+     ("Today is", "{weekday}", "{month}", "{day}", "{year}")),
+)
+PHRASE_SLOTS = {
+    "percent": _spell_number,
+    "hour": _spell_number,
+    "day": _spell_number,
+    "minute": _spell_minute,
+    "year": _spell_year,
+    "period": lambda value: ["a.m." if value == "AM" else "p.m."],
+    "weekday": lambda value: [value] if value in WEEKDAYS else None,
+    "month": lambda value: [value] if value in MONTHS else None,
+}
+PHRASE_VOCABULARY = frozenset(
+    [part for _, parts in PHRASE_TEMPLATES for part in parts if not part.startswith("{")]
+    + [str(number) for number in range(101)]
+    + ["oh", "o'clock", "hundred", "two thousand", "a.m.", "p.m."]
+    + list(WEEKDAYS) + list(MONTHS)
+)
+
+def trim_silence(samples, sample_rate: int, threshold: int = 300, margin: float = 0.03):
+    """Cut leading and trailing silence from PCM samples, keeping a short margin."""
+    level = np.abs(samples.reshape(len(samples), -1).astype(np.int32)).max(axis=1)
+    loud = np.flatnonzero(level > threshold)
+    if not len(loud):
+        return samples[:0]
+    pad = int(sample_rate * margin)
+    return samples[max(0, loud[0] - pad):loud[-1] + pad + 1]
+
+def crossfade_concat(buffers: list, overlap: int):
+    """Join PCM buffers, blending each boundary linearly over ``overlap`` samples."""
+    result = buffers[0].astype(np.float32)
+    for buffer in buffers[1:]:
+        buffer = buffer.astype(np.float32)
+        n = min(overlap, len(result), len(buffer))
+        if n:
+            fade = np.linspace(0.0, 1.0, n, dtype=np.float32).reshape((n,) + (1,) * (buffer.ndim - 1))
+            blended = result[-n:] * (1 - fade) + buffer[:n] * fade
+            result = np.concatenate([result[:-n], blended, buffer[n:]])
+        else:
+            result = np.concatenate([result, buffer])
+    return np.clip(result, -32768, 32767).astype(np.int16)
+
+class PhraseBank:
+    """Decoded audio for template fragments, stitched into responses without a synthesis call.
+
+    Each fragment in PHRASE_VOCABULARY is synthesized once through ``fetch``
+    (normally the TTS cache) and kept as trimmed PCM from ``decode``. A
+    response is only stitched once all its fragments are decoded, so a
+    cold fragment never delays speech.
+    """
+
+    def __init__(self, fetch: Callable[[str], bytes], decode: Callable[[bytes], Any],
+                 sample_rate: int, crossfade: float = 0.015):
+        self.sample_rate = sample_rate
+        self.overlap = int(sample_rate * crossfade)
+        self._fetch = fetch
+        self._decode = decode
+        self._pcm: Dict[str, Any] = {}
+        self._filling = set()
+        self._lock = threading.Lock()
+        self.rendered = 0
+    
+    @staticmethod
+    def fragments(text: str) -> Optional[list]:
+        """Return the fragments that spell out text, or None if it is not a template response."""
+        for pattern, parts in PHRASE_TEMPLATES:
+            match = pattern.fullmatch(text.strip())
+            if not match:
+                continue
+            fragments = []
+            for part in parts:
+                if part.startswith("{"):
+                    spelled = PHRASE_SLOTS[part.strip("{}")](match.group(part.strip("{}")))
+                    if spelled is None:
+                        return None
+                    fragments.extend(spelled)
+                else:
+                    fragments.append(part)
+            return fragments if all(fragment in PHRASE_VOCABULARY for fragment in fragments) else None
+        return None
+    
+    def _load(self, fragment: str):
+        with self._lock:
+            samples = self._pcm.get(fragment)
+        if samples is None:
+            samples = trim_silence(self._decode(self._fetch(fragment)), self.sample_rate)
+            with self._lock:
+                self._pcm[fragment] = samples
+        return samples
+    
+    def _fill(self, fragments: list):
+        """Decode fragments on a background thread, skipping any that are already being decoded."""
+        with self._lock:
+            fragments = [fragment for fragment in fragments if fragment not in self._filling]
+            self._filling.update(fragments)
+        if not fragments:
+            return
+        
+        def run():
+            for fragment in fragments:
+                try:
+                    self._load(fragment)
+                except Exception as e:
+                    logger.warning(f"Failed to pre-render phrase fragment '{fragment}': {e}")
+                finally:
+                    with self._lock:
+                        self._filling.discard(fragment)
+        
+        threading.Thread(target=run, name="phrase-fill", daemon=True).start()
+    
+    def prerender(self):
+        """Synthesize and decode every fragment of the vocabulary."""
+        started = time.perf_counter()
+        for fragment in sorted(PHRASE_VOCABULARY):
+            try:
+                self._load(fragment)
+            except Exception as e:
+                logger.warning(f"Failed to pre-render phrase fragment '{fragment}': {e}")
+        logger.info(f"Pre-rendered {len(self._pcm)} phrase fragments in {time.perf_counter() - started:.2f}s")
+    
+    def render(self, text: str):
+        """Return stitched PCM samples for a template response, or None if it has to be synthesized.
+
+        Fragments that are not decoded yet are filled in the background for
+        the next time.
+        """
+        fragments = self.fragments(text)
+        if fragments is None:
+            return None
+        with self._lock:
+            parts = [self._pcm.get(fragment) for fragment in fragments]
+        missing = [fragment for fragment, part in zip(fragments, parts) if part is None]
+        if missing:
+            self._fill(list(dict.fromkeys(missing)))
+            return None
+        samples = crossfade_concat(parts, self.overlap)
+        self.rendered += 1
+        return samples
+    
+    def stats(self) -> Dict[str, int]:
+        return {"fragments": len(self._pcm), "rendered": self.rendered}
+
+def write_wav(samples, sample_rate: int) -> bytes:
+    """Encode 16-bit PCM samples as WAV data."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1 if samples.ndim == 1 else samples.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+def tokenize(text: str) -> list:
+    """Split text into lowercase word tokens, dropping possessive suffixes."""
+    return [re.sub(r"'s$", "", token) for token in re.findall(r"[a-z0-9']+", text.lower())]
+
+@dataclass
+class Intent:
+    name: str
+    handler: Callable[[str], Optional[bool]]
+    phrases: tuple
+    requires: frozenset
+    priority: int
+    order: int
+    patterns: tuple = ()
+
+@dataclass
+class IntentMatch:
+    intent: Intent
+    phrase: tuple
+    position: int
+
+def intent(*phrases: str, keywords: Iterable[str] = (), requires: Iterable[str] = (), priority: int = 0,
+           patterns: Iterable[re.Pattern] = ()):
+    """Mark a VoiceAssistant method as the handler for an intent.
+
+    The handler is called with the full command when any of the phrases
+    (multi-word, matched as consecutive words) or keywords (single words)
+    occurs in the command and every word in ``requires`` is present too.
+    When several intents match, the highest priority wins, then the
+    longest phrase, then the intent registered first. A command matching
+    one of the ``patterns`` goes to that intent before any phrase is
+    considered, so slot values such as a message text cannot trigger
+    other intents. Patterns should be anchored to the start of the
+    command so that they do not claim commands that merely mention them.
+    """
+    def decorator(func):
+        func.__dict__.setdefault('_intent_specs', []).append({
+            "phrases": tuple(phrases) + tuple(keywords),
+            "requires": tuple(requires),
+            "priority": priority,
+            "patterns": tuple(patterns),
+        })
+        return func
+    return decorator
+
+class IntentRouter:
+    """Dispatches commands to intents through a word index built at registration time."""
+
+    def __init__(self):
+        self.intents = []
+        self._index: Dict[str, list] = {}
+        self._patterned = []
+    
+    def register(self, name: str, handler: Callable[[str], Optional[bool]], phrases: Iterable[str] = (),
+                 requires: Iterable[str] = (), priority: int = 0, patterns: Iterable[re.Pattern] = ()) -> Intent:
+        """Register a handler for commands containing any of the given phrases or matching any pattern."""
+        token_phrases = tuple(tuple(tokenize(phrase)) for phrase in phrases if tokenize(phrase))
+        if not token_phrases:
+            raise ValueError(f"Intent '{name}' needs at least one phrase or keyword")
+        
+        entry = Intent(
+            name=name,
+            handler=handler,
+            phrases=token_phrases,
+            requires=frozenset(token for word in requires for token in tokenize(word)),
+            priority=priority,
+            order=len(self.intents),
+            patterns=tuple(patterns)
+        )
+        self.intents.append(entry)
+        for tokens in token_phrases:
+            self._index.setdefault(tokens[0], []).append((tokens, entry))
+        if entry.patterns:
+            self._patterned.append(entry)
+            self._patterned.sort(key=lambda item: (-item.priority, item.order))
+        return entry
+    
+    def register_handlers(self, owner: Any):
+        """Register every method of owner decorated with @intent."""
+        seen = set()
+        for cls in type(owner).__mro__:
+            for attr, func in vars(cls).items():
+                if attr in seen or not hasattr(func, '_intent_specs'):
+                    continue
+                seen.add(attr)
+                for spec in func._intent_specs:
+                    self.register(attr.lstrip('_').replace('handle_', '', 1), getattr(owner, attr), **spec)
+    
+    def match(self, command: str) -> Optional[IntentMatch]:
+        """Return the best matching intent for a command in a single pass over its words."""
+        text = command.lower().strip()
+        for entry in self._patterned:
+            for pattern in entry.patterns:
+                found = pattern.search(text)
+                if found:
+                    return IntentMatch(entry, tuple(tokenize(found.group(0))), len(tokenize(text[:found.start()])))
+        
+        tokens = tokenize(command)
+        present = None
+        best = None
+        best_score = None
+        
+        for position, token in enumerate(tokens):
+            for phrase, entry in self._index.get(token, ()):
+                if len(phrase) > 1 and tuple(tokens[position:position + len(phrase)]) != phrase:
+                    continue
+                if entry.requires:
+                    if present is None:
+                        present = set(tokens)
+                    if not entry.requires <= present:
+                        continue
+                score = (entry.priority, len(phrase), -entry.order)
+                if best_score is None or score > best_score:
+                    best = IntentMatch(entry, phrase, position)
+                    best_score = score
+        
+        return best
+
+SLOT_PATTERNS = {
+    "whatsapp": [
+        re.compile(r"\b(?:whatsapp|message|text)(?: message)? to (?P<recipient>.+?) (?:saying|that says|telling them|that) (?P<message>.+)$"),
+        re.compile(r"\b(?:whatsapp|text) (?!to\b|message\b)(?P<recipient>.+?) (?:saying|that says|telling them) (?P<message>.+)$"),
+        re.compile(r"\b(?:whatsapp|message|text)(?: message)? to (?P<recipient>.+)$"),
+    ],
+    "play_youtube": [
+        re.compile(r"\bplay (?P<query>.+?) on youtube\b"),
+        re.compile(r"\byoutube play (?P<query>.+)$"),
+    ],
+    "spotify": [
+        re.compile(r"\bplay (?P<query>.+?) on spotify\b"),
+        re.compile(r"\bspotify (?:and )?(?:play |search (?:for )?)?(?P<query>.+)$"),
+    ],
+    "google_search": [
+        re.compile(r"\bsearch (?:for )?(?P<query>.+?) on google$"),
+        re.compile(r"\bgoogle(?: search)?(?: for)? (?P<query>.+)$"),
+    ],
+    "screenshot": [
+        re.compile(r"\b(?P<count>\d+|two|three|four|five|six|seven|eight|nine|ten) screenshots"
+                   r"(?: every (?P<interval>\d+(?:\.\d+)?) seconds?)?(?: (?:called|named|as) (?P<name>.+))?$"),
+        re.compile(r"\bscreenshot (?:called|named|as|and (?:call|name|save) it(?: as)?) (?P<name>.+)$"),
+    ],
+}
+
+# Commands that are routed by their shape rather than by phrases. Unlike the
+# slot patterns they are anchored to the start of the command, so a request
+# that only mentions a message ("search wikipedia for text to speech") keeps
+# its own intent.
+ROUTE_PATTERNS = {
+    "whatsapp": [
+        re.compile(r"^(?:please )?(?:send (?:a |an )?)?(?:whatsapp|message|text)(?: message)? to .+? "
+                   r"(?:saying|that says|telling them|that) .+$"),
+        re.compile(r"^(?:please )?(?:whatsapp|text) (?!to\b|message\b).+? (?:saying|that says|telling them) .+$"),
+    ],
+}
+
+SMALL_NUMBERS = {"two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10}
+
+def extract_slots(intent_name: str, command: str) -> Dict[str, str]:
+    """Return the slots of an intent that are already present in a command."""
+    for pattern in SLOT_PATTERNS.get(intent_name, ()):
+        match = pattern.search(command.lower().strip())
+        if match:
+            return {slot: re.sub(r"\s+please$", "", value.strip())
+                    for slot, value in match.groupdict().items() if value and value.strip()}
+    return {}
+
+NAME_FILLER_WORDS = {"ji", "my", "to", "the", "dear", "sir", "madam", "please", "contact", "number"}
+
+def normalize_name(name: str) -> str:
+    """Normalize a spoken or stored contact name for lookup."""
+    words = [token for token in tokenize(name) if token not in NAME_FILLER_WORDS]
+    return " ".join(words)
+
+def soundex(text: str) -> str:
+    """Return the Soundex code of text, ignoring spaces."""
+    letters = [c for c in text.lower() if c.isalpha()]
+    if not letters:
+        return ""
+    
+    codes = {c: str(digit) for digit, group in enumerate(
+        ["aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"]) for c in group}
+    result = letters[0].upper()
+    previous = codes[letters[0]]
+    for c in letters[1:]:
+        code = codes[c]
+        if code != "0" and code != previous:
+            result += code
+        if c not in "hw":
+            previous = code
+    return (result + "000")[:4]
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Return the Levenshtein distance between a and b, or limit + 1 if it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        for j in range(low, high + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]), over)
+        if min(current[low - 1:high + 1]) > limit:
+            return over
+        previous = current
+    return previous[-1]
+
+class ContactIndex:
+    """Normalized, phonetic and trigram index over contact names and aliases."""
+
+    def __init__(self, contacts: Iterable[Contact], mtime: Optional[float] = None, candidates: int = 8):
+        self.contacts: Dict[str, Contact] = {}
+        self.mtime = mtime
+        self.candidates = candidates
+        self._exact: Dict[str, Contact] = {}
+        self._codes: Dict[str, str] = {}
+        self._phonetic: Dict[str, set] = {}
+        self._grams: Dict[str, set] = {}
+        
+        for contact in contacts:
+            self.contacts[contact.name] = contact
+            for name in [contact.name, *contact.aliases]:
+                key = normalize_name(name)
+                if not key or key in self._exact:
+                    continue
+                self._exact[key] = contact
+                self._codes[key] = soundex(key)
+                self._phonetic.setdefault(self._codes[key], set()).add(key)
+                for gram in self._trigrams(key):
+                    self._grams.setdefault(gram, set()).add(key)
+        
+        self.max_posting = max(100, len(self._exact) // 50)
+    
+    def __len__(self) -> int:
+        return len(self.contacts)
+    
+    @staticmethod
+    def _trigrams(key: str) -> set:
+        padded = f"  {key} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+    
+    def resolve(self, name: str) -> Optional[Contact]:
+        """Return the contact whose name or alias best matches name."""
+        key = normalize_name(name)
+        if not key:
+            return None
+        if key in self._exact:
+            return self._exact[key]
+        
+        postings = sorted((self._grams.get(gram, ()) for gram in self._trigrams(key)), key=len)
+        selective = [posting for posting in postings if posting and len(posting) <= self.max_posting]
+        counts = Counter()
+        for posting in selective or [posting for posting in postings if posting][:2]:
+            counts.update(posting)
+        candidates = {candidate for candidate, _ in counts.most_common(self.candidates)}
+        phonetic = self._phonetic.get(soundex(key), ())
+        if len(phonetic) <= self.candidates:
+            candidates.update(phonetic)
+        
+        limit = max(1, len(key) // 4)
+        code = soundex(key)
+        best = None
+        best_score = None
+        for candidate in candidates:
+            phonetic = self._codes[candidate] == code
+            distance = edit_distance(key, candidate, 2 * limit if phonetic else limit)
+            if distance > (2 * limit if phonetic else limit):
+                continue
+            score = (distance - phonetic, candidate)
+            if best_score is None or score < best_score:
+                best, best_score = candidate, score
+        
+        return self._exact[best] if best else None
+    
+    def is_stale(self, path: str) -> bool:
+        """Return True if the contacts file changed since this index was built."""
+        try:
+            return os.stat(path).st_mtime != self.mtime
+        except OSError:
+            return self.mtime is not None
+
+def read_wav(path) -> sr.AudioData:
+    """Read a WAV file, or WAV bytes, into mono AudioData."""
+    with wave.open(io.BytesIO(path) if isinstance(path, bytes) else str(path), 'rb') as f:
+        frames = f.readframes(f.getnframes())
+        if f.getnchannels() == 2:
+            frames = audioop.tomono(frames, f.getsampwidth(), 0.5, 0.5)
+        return sr.AudioData(frames, f.getframerate(), f.getsampwidth())
+
+class RingBuffer:
+    """Fixed-size byte buffer addressed by absolute stream offsets."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.end = 0
+        self._data = bytearray(size)
+        self._lock = threading.Lock()
+    
+    @property
+    def start(self) -> int:
+        """Offset of the oldest byte still held in the buffer."""
+        return max(0, self.end - self.size)
+    
+    def write(self, data: bytes):
+        """Append data, overwriting the oldest bytes once the buffer is full."""
+        with self._lock:
+            total = len(data)
+            if total > self.size:
+                data = data[-self.size:]
+            position = (self.end + total - len(data)) % self.size
+            first = min(len(data), self.size - position)
+            self._data[position:position + first] = data[:first]
+            self._data[:len(data) - first] = data[first:]
+            self.end += total
+    
+    def read(self, start: int, end: int) -> bytes:
+        """Return the bytes between two stream offsets that are still buffered."""
+        with self._lock:
+            start = max(start, self.start)
+            end = min(end, self.end)
+            if end <= start:
+                return b""
+            first, last = start % self.size, end % self.size
+            if first < last:
+                return bytes(self._data[first:last])
+            return bytes(self._data[first:]) + bytes(self._data[:last])
+
+class Endpointer:
+    """Energy-based voice activity detector that finds utterance boundaries in a chunk stream.
+
+    Positions are byte offsets from the start of the stream, so utterances
+    can be cut out of a RingBuffer fed with the same chunks.
+    """
+
+    def __init__(self, sample_rate: int, sample_width: int, threshold: float, pause: float = 0.3,
+                 max_phrase: float = 2.0, min_phrase: float = 0.15, pre_roll: float = 0.2):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.threshold = threshold
+        self.pause = pause
+        self.max_phrase = max_phrase
+        self.min_phrase = min_phrase
+        self.pre_roll = pre_roll
+        self.position = 0
+        self.last_energy = 0.0
+        self.in_speech = False
+        self._start = 0
+        self._duration = 0.0
+        self._silence = 0.0
+    
+    @property
+    def start(self) -> int:
+        """Stream offset where the current utterance started, including pre-roll."""
+        return self._start
+    
+    def feed(self, chunk: bytes) -> Optional[tuple]:
+        """Consume one chunk and return the (start, end) offsets of a finished utterance, if any."""
+        duration = len(chunk) / (self.sample_rate * self.sample_width)
+        chunk_start = self.position
+        self.position += len(chunk)
+        self.last_energy = audioop.rms(chunk, self.sample_width)
+        loud = self.last_energy > self.threshold
+        
+        if not self.in_speech:
+            if loud:
+                pre_roll = int(self.pre_roll * self.sample_rate) * self.sample_width
+                self.in_speech = True
+                self._start = max(0, chunk_start - pre_roll)
+                self._duration = duration
+                self._silence = 0.0
+            return None
+        
+        self._duration += duration
+        self._silence = 0.0 if loud else self._silence + duration
+        
+        if self._silence >= self.pause or self._duration >= self.max_phrase:
+            self.in_speech = False
+            if self._duration - self._silence >= self.min_phrase:
+                return self._start, self.position
+        return None
+
+class NoiseFloorEstimator:
+    """Rolling low-percentile estimate of the background noise level from chunk energies.
+
+    Pauses between words keep the low percentile near the noise floor even
+    while people are talking, while a rise in background noise that lasts
+    for most of the window moves it up. Each new estimate and the energy
+    threshold it implies are published as gauges to ``metrics``.
+    """
+
+    def __init__(self, window: int = 500, percentile: float = 20, ratio: float = 2.0,
+                 minimum: float = 100, noise_floor: Optional[float] = None, metrics: Optional[Metrics] = None):
+        self.percentile = percentile
+        self.ratio = ratio
+        self.minimum = minimum
+        self.noise_floor = noise_floor
+        self.metrics = metrics
+        self._energies = deque(maxlen=window)
+        self._updates = 0
+    
+    def add(self, energy: float):
+        """Record the energy of one captured chunk."""
+        self._energies.append(energy)
+        self._updates += 1
+        if self._updates % 8 == 0 or self.noise_floor is None:
+            ordered = sorted(self._energies)
+            self.noise_floor = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+            if self.metrics:
+                self.metrics.gauge("noise_floor", self.noise_floor)
+                self.metrics.gauge("energy_threshold", self.threshold(self.minimum))
+    
+    def threshold(self, default: float) -> float:
+        """Return the energy threshold for speech detection given the current noise floor."""
+        if self.noise_floor is None:
+            return default
+        return max(self.minimum, self.noise_floor * self.ratio)
+
+class MicrophoneSource:
+    """Audio source reading from the default (or given) microphone."""
+
+    def __init__(self, microphone: sr.Microphone):
+        self.microphone = microphone
+        self.sample_rate = microphone.SAMPLE_RATE
+        self.sample_width = microphone.SAMPLE_WIDTH
+        self.chunk_size = microphone.CHUNK
+    
+    def open(self):
+        self.microphone.__enter__()
+    
+    def read(self) -> bytes:
+        return self.microphone.stream.read(self.chunk_size)
+    
+    def close(self):
+        self.microphone.__exit__(None, None, None)
+
+class WavFileSource:
+    """Audio source that plays WAV files as if they were a microphone, then stays silent.
+
+    Used to exercise capture, endpointing and wake-word gating without
+    audio hardware. With ``realtime`` enabled, reads are paced to the
+    audio duration.
+    """
+
+    def __init__(self, paths: Iterable[str], realtime: bool = True, gap: float = 1.0, chunk_size: int = 1024):
+        self.paths = [str(path) for path in paths]
+        self.realtime = realtime
+        self.gap = gap
+        self.chunk_size = chunk_size
+        clips = [read_wav(path) for path in self.paths]
+        self.sample_rate = clips[0].sample_rate if clips else 16000
+        self.sample_width = clips[0].sample_width if clips else 2
+        silence = b"\x00" * (int(gap * self.sample_rate) * self.sample_width)
+        self._data = b"".join(
+            clip.get_raw_data(convert_rate=self.sample_rate, convert_width=self.sample_width) + silence
+            for clip in clips
+        )
+        self._offset = 0
+        self._next_read = 0.0
+    
+    @property
+    def exhausted(self) -> bool:
+        return self._offset >= len(self._data)
+    
+    def open(self):
+        self._next_read = time.perf_counter()
+    
+    def read(self) -> bytes:
+        size = self.chunk_size * self.sample_width
+        chunk = self._data[self._offset:self._offset + size]
+        self._offset += size
+        chunk += b"\x00" * (size - len(chunk))
+        
+        if self.realtime or self.exhausted:
+            self._next_read += self.chunk_size / self.sample_rate
+            delay = self._next_read - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self._next_read = time.perf_counter()
+        return chunk
+    
+    def close(self):
+        pass
+
+@dataclass
+class CapturedUtterance:
+    data: bytes
+    sample_rate: int
+    sample_width: int
+    started_at: float
+    ended_at: float
+    stream: Optional["RecognitionStream"] = None
+    
+    def audio(self) -> sr.AudioData:
+        return sr.AudioData(self.data, self.sample_rate, self.sample_width)
+
+class AudioCapture:
+    """Keeps one input stream open for the session and turns it into a queue of utterances.
+
+    A background thread writes every chunk into a ring buffer and runs the
+    endpointer over it. Finished utterances, including a short pre-roll,
+    are queued for listen(). ``speech_gate`` is called for every chunk of
+    an utterance until it returns True (keep) or False (discard); it is
+    used to drop echo of the assistant's own voice and to detect barge-in.
+    Chunks captured while ``playing()`` is true, or belonging to an
+    utterance the gate discarded, are left out of the noise estimate.
+    With ``streaming``, each utterance is also fed to a recognition stream
+    while it is spoken, and its partial transcripts go to ``on_partial``.
+    """
+
+    def __init__(self, source, endpointer: Endpointer, buffer_seconds: float = 30.0,
+                 speech_gate: Optional[Callable[[float, bool], Optional[bool]]] = None,
+                 noise: Optional[NoiseFloorEstimator] = None,
+                 streaming: Optional[Callable[[int, int], "RecognitionStream"]] = None,
+                 on_partial: Optional[Callable[[str], None]] = None,
+                 playing: Optional[Callable[[], bool]] = None):
+        self.source = source
+        self.endpointer = endpointer
+        self.noise = noise
+        self.ring = RingBuffer(int(buffer_seconds * source.sample_rate) * source.sample_width)
+        self.speech_gate = speech_gate
+        self.streaming = streaming
+        self.on_partial = on_partial
+        self.playing = playing
+        self._stream: Optional[RecognitionStream] = None
+        self.utterances = queue.Queue()
+        self._decision: Optional[bool] = None
+        self._speech_started_at = 0.0
+        self._running = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._running.is_set()
+    
+    @property
+    def in_speech(self) -> bool:
+        return self.endpointer.in_speech
+    
+    def start(self):
+        """Open the source and start the capture thread if it is not running yet."""
+        if self.running:
+            return
+        self.source.open()
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop capturing and close the source."""
+        if not self.running:
+            return
+        self._running.clear()
+        self._thread.join(timeout=2)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Return the current energy threshold, noise floor and speech state."""
+        return {
+            "energy_threshold": round(self.endpointer.threshold, 1),
+            "noise_floor": round(self.noise.noise_floor, 1) if self.noise and self.noise.noise_floor is not None else None,
+            "in_speech": self.in_speech,
+            "queued_utterances": self.utterances.qsize(),
+        }
+    
+    def configure(self, pause: float, max_phrase: float):
+        """Change the endpointing pause and phrase length limit."""
+        self.endpointer.pause = pause
+        self.endpointer.max_phrase = max_phrase
+    
+    def next_utterance(self, timeout: Optional[float],
+                       hold: Optional[Callable[[], bool]] = None) -> Optional[CapturedUtterance]:
+        """Return the next utterance, waiting up to timeout for speech to start.
+
+        The timeout does not start counting while ``hold()`` is true (for
+        example while a prompt is still playing), and an utterance that has
+        started but not finished when it expires is waited for.
+        """
+        self.start()
+        deadline = None
+        while True:
+            try:
+                return self.utterances.get(timeout=0.05)
+            except queue.Empty:
+                pass
+            if timeout is None or (hold and hold()):
+                continue
+            if deadline is None:
+                deadline = time.perf_counter() + timeout
+            if time.perf_counter() >= deadline and not self.in_speech:
+                return None
+    
+    def clear(self, before: Optional[float] = None):
+        """Drop utterances that have been captured but not consumed, or only those that ended before ``before``."""
+        with self.utterances.mutex:
+            pending = self.utterances.queue
+            while pending and (before is None or pending[0].ended_at < before):
+                pending.popleft()
+    
+    def _run(self):
+        try:
+            while self._running.is_set():
+                try:
+                    chunk = self.source.read()
+                except Exception as e:
+                    logger.error(f"Audio capture error: {e}")
+                    time.sleep(0.5)
+                    continue
+                self._process(chunk)
+        finally:
+            self.source.close()
+    
+    def _process(self, chunk: bytes):
+        was_in_speech = self.endpointer.in_speech
+        self.ring.write(chunk)
+        span = self.endpointer.feed(chunk)
+        
+        discarding = was_in_speech and self._decision is False
+        if self.noise and not discarding and not (self.playing and self.playing()):
+            self.noise.add(self.endpointer.last_energy)
+            if not self.endpointer.in_speech:
+                self.endpointer.threshold = self.noise.threshold(self.endpointer.threshold)
+        
+        if self.endpointer.in_speech and not was_in_speech:
+            self._decision = None
+            self._speech_started_at = time.perf_counter()
+        if (self.endpointer.in_speech or span) and self._decision is None and self.speech_gate:
+            self._decision = self.speech_gate(self.endpointer.last_energy, not was_in_speech)
+        if self.streaming and (self.endpointer.in_speech or span) and self._decision is not False:
+            self._stream_chunk(chunk, not was_in_speech)
+        
+        if span is None:
+            if was_in_speech and not self.endpointer.in_speech:
+                self._stream = None
+            return
+        if self._decision is False or (self._decision is None and self.speech_gate):
+            logger.debug("Discarded utterance captured during playback")
+            return
+        
+        start, end = span
+        self.utterances.put(CapturedUtterance(
+            self.ring.read(start, end),
+            self.source.sample_rate,
+            self.source.sample_width,
+            self._speech_started_at,
+            time.perf_counter(),
+            self._stream
+        ))
+        self._stream = None
+    
+    def _stream_chunk(self, chunk: bytes, first: bool):
+        try:
+            if first:
+                self._stream = self.streaming(self.source.sample_rate, self.source.sample_width)
+                chunk = self.ring.read(self.endpointer.start, self.endpointer.position)
+            if self._stream is None:
+                return
+            partial = self._stream.feed(chunk)
+            if partial and self.on_partial:
+                self.on_partial(partial)
+        except Exception as e:
+            logger.warning(f"Streaming recognition error: {e}")
+            self._stream = None
+
+class WakeWordDetector:
+    """Keyword spotter that matches log-mel features against recorded templates with DTW."""
+
+    SAMPLE_RATE = 16000
+    FRAME = 400
+    HOP = 160
+    N_FFT = 512
+    BANDS = 20
+
+    def __init__(self, templates: list, threshold: float):
+        self.threshold = threshold
+        self._filters = self._mel_filters()
+        self.templates = [self.features(audio) for audio in templates]
+    
+    @classmethod
+    def from_directory(cls, directory: str, threshold: float) -> Optional["WakeWordDetector"]:
+        """Build a detector from the WAV templates in directory, or None if there are none."""
+        paths = sorted(Path(directory).glob("*.wav")) if Path(directory).is_dir() else []
+        if not paths:
+            return None
+        return cls([read_wav(path) for path in paths], threshold)
+    
+    def _mel_filters(self):
+        def to_mel(hz):
+            return 2595 * np.log10(1 + hz / 700)
+        
+        edges = 700 * (10 ** (np.linspace(to_mel(80), to_mel(self.SAMPLE_RATE / 2), self.BANDS + 2) / 2595) - 1)
+        bins = np.floor((self.N_FFT + 1) * edges / self.SAMPLE_RATE).astype(int)
+        filters = np.zeros((self.BANDS, self.N_FFT // 2 + 1))
+        for band in range(self.BANDS):
+            left, center, right = bins[band], bins[band + 1], bins[band + 2]
+            if center > left:
+                filters[band, left:center] = (np.arange(left, center) - left) / (center - left)
+            if right > center:
+                filters[band, center:right] = (right - np.arange(center, right)) / (right - center)
+        return filters
+    
+    def features(self, audio: sr.AudioData):
+        """Return mean-normalized log-mel frames for an utterance, trimmed to its voiced part."""
+        raw = audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        if len(samples) < self.FRAME:
+            samples = np.pad(samples, (0, self.FRAME - len(samples)))
+        count = 1 + (len(samples) - self.FRAME) // self.HOP
+        index = np.arange(self.FRAME)[None, :] + self.HOP * np.arange(count)[:, None]
+        energy = (samples[index] ** 2).sum(axis=1)
+        voiced = np.flatnonzero(energy > energy.max() * 1e-3)
+        if len(voiced):
+            index = index[voiced[0]:voiced[-1] + 1]
+        
+        emphasized = np.append(samples[0], samples[1:] - 0.97 * samples[:-1])
+        frames = emphasized[index] * np.hamming(self.FRAME)
+        power = np.abs(np.fft.rfft(frames, self.N_FFT)) ** 2 / self.N_FFT
+        features = np.log(power @ self._filters.T + 1e-10)
+        return features - features.mean(axis=0)
+    
+    @staticmethod
+    def dtw_distance(a, b) -> float:
+        """Return the length-normalized dynamic time warping distance between two feature sequences."""
+        n, m = len(a), len(b)
+        if n > 2 * m or m > 2 * n:
+            return float('inf')
+        
+        cost = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).mean(axis=2))
+        previous = np.full(m + 1, np.inf)
+        previous[0] = 0.0
+        for i in range(n):
+            vertical = np.minimum(previous[1:], previous[:-1]) + cost[i]
+            current = np.empty(m + 1)
+            current[0] = np.inf
+            for j in range(m):
+                current[j + 1] = min(vertical[j], current[j] + cost[i, j])
+            previous = current
+        return float(previous[m] / (n + m))
+    
+    def score(self, audio: sr.AudioData) -> float:
+        """Return the distance to the closest template."""
+        features = self.features(audio)
+        return min(self.dtw_distance(features, template) for template in self.templates)
+    
+    def detect(self, audio: sr.AudioData):
+        """Return whether audio contains the wake word and its template distance."""
+        distance = self.score(audio)
+        return distance <= self.threshold, distance
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+    stale_until: float
+
+class SingleFlight:
+    """Runs at most one fetch per key at a time; concurrent callers for the key share its result."""
+
+    def __init__(self):
+        self._calls: Dict[Any, Future] = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key: Any, fetch: Callable[[], Any]) -> Any:
+        """Return fetch(), or wait for the call already in flight for key and return its result."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+        
+        try:
+            value = fetch()
+            call.set_result(value)
+            return value
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+class TTLCache:
+    """Thread-safe cache with per-entry expiry and stale-while-revalidate refresh.
+
+    A fresh entry is returned as is. An expired entry that is still within
+    its stale window is returned immediately while a background thread
+    fetches a new value. Anything older is fetched synchronously, once:
+    callers that miss while a fetch for the same key is in flight wait for
+    it instead of fetching again. None results are returned but not cached.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, CacheEntry]" = OrderedDict()
+        self._refreshing = set()
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Any, fetch: Callable[[], Any], ttl: float, stale_ttl: float = 0.0) -> Any:
+        """Return the cached value for key, fetching it when missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now < entry.expires_at:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if entry and now < entry.stale_until:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refresh, args=(key, fetch, ttl, stale_ttl),
+                                     name="cache-refresh", daemon=True).start()
+                return entry.value
+            self.misses += 1
+        
+        return self._flight.do(key, lambda: self._fetch(key, fetch, ttl, stale_ttl))
+    
+    def _fetch(self, key: Any, fetch: Callable[[], Any], ttl: float, stale_ttl: float) -> Any:
+        value = fetch()
+        if value is not None:
+            self.put(key, value, ttl, stale_ttl)
+        return value
+    
+    def put(self, key: Any, value: Any, ttl: float, stale_ttl: float = 0.0):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = CacheEntry(value, now + ttl, now + ttl + stale_ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _refresh(self, key: Any, fetch: Callable[[], Any], ttl: float, stale_ttl: float):
+        try:
+            self._fetch(key, fetch, ttl, stale_ttl)
+        except Exception as e:
+            logger.warning(f"Background refresh of {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses,
+                    "entries": len(self._entries)}
+
+class HttpClient:
+    """Shared HTTP session with connection pooling, keep-alive and a TTL response cache."""
+
+    USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+    def __init__(self, session: Optional[requests.Session] = None, timeout: float = 5, pool_size: int = 10):
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.setdefault('User-Agent', self.USER_AGENT)
+        self.cache = TTLCache()
+    
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Issue a GET on the pooled session and raise for HTTP errors."""
+        kwargs.setdefault('timeout', self.timeout)
+        response = self.session.get(url, **kwargs)
+        response.raise_for_status()
+        return response
+    
+    def get_json(self, url: str, ttl: float = 0, stale_ttl: float = 0, **kwargs) -> Any:
+        """Return a decoded JSON response, cached for ttl seconds."""
+        return self.cached(("json", url, json.dumps(kwargs.get('params'), sort_keys=True)),
+                           lambda: self.get(url, **kwargs).json(), ttl, stale_ttl)
+    
+    def cached(self, key: Any, fetch: Callable[[], Any], ttl: float, stale_ttl: float = 0) -> Any:
+        """Return fetch() through the response cache; a ttl of 0 disables caching."""
+        if ttl <= 0:
+            return fetch()
+        return self.cache.get(key, fetch, ttl, stale_ttl)
+    
+    def close(self):
+        self.session.close()
+
+def extract_element(html: str, tag: str, css_class: str, window: int = 4096) -> Optional[str]:
+    """Return the text of the first tag with css_class, parsing only the markup around it."""
+    match = re.search(rf'<{tag}\b[^>]*\bclass="(?:[^"]*\s)?{re.escape(css_class)}(?:\s[^"]*)?"', html)
+    if match:
+        html = html[match.start():match.start() + window]
+    
+    soup = bs4.BeautifulSoup(html, "html.parser", parse_only=bs4.SoupStrainer(tag))
+    element = soup.find(tag, class_=css_class)
+    return element.get_text() if element else None
+
+QUERY_FILLER_WORDS = {"search", "for", "about", "on", "what", "who", "is", "are", "was", "were",
+                      "tell", "me", "the", "a", "an", "of", "according", "to", "please"}
+
+def normalize_query(text: str) -> str:
+    """Normalize a search query or page title so that both map to the same key."""
+    tokens = tokenize(re.sub(r"[()]", " ", text))
+    start = 0
+    while start < len(tokens) and tokens[start] in QUERY_FILLER_WORDS:
+        start += 1
+    return " ".join(tokens[start:] or tokens)
+
+class WikiStore:
+    """Local SQLite store of Wikipedia summaries with a full-text index.
+
+    Summaries are stored by page title and looked up by normalized query
+    or title. Entries expire after ``ttl`` seconds, except bulk-imported
+    ones, which never expire. Expired entries are still used as an
+    offline fallback.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                title TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                expires_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS pages_key ON pages (key);
+            CREATE TABLE IF NOT EXISTS queries (
+                query TEXT PRIMARY KEY,
+                title TEXT NOT NULL
+            );
+        """)
+        try:
+            self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(title, summary)")
+            self.full_text = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite FTS5 unavailable, offline Wikipedia search disabled: {e}")
+            self.full_text = False
+        self._conn.commit()
+    
+    def lookup(self, query: str, include_expired: bool = False) -> Optional[tuple]:
+        """Return (title, summary) cached for a query or title, or None."""
+        key = normalize_query(query)
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT p.title, p.summary, p.expires_at FROM pages p
+                WHERE p.title = (SELECT title FROM queries WHERE query = ?) OR p.key = ?
+                LIMIT 1
+            """, (key, key)).fetchone()
+        
+        if row is None:
+            return None
+        title, summary, expires_at = row
+        if expires_at is not None and expires_at < time.time() and not include_expired:
+            return None
+        return title, summary
+    
+    def search(self, query: str) -> Optional[tuple]:
+        """Return the best full-text match containing every word of a query, ignoring expiry."""
+        if not self.full_text:
+            return None
+        tokens = normalize_query(query).split()
+        if not tokens:
+            return None
+        
+        with self._lock:
+            return self._conn.execute(
+                "SELECT title, summary FROM pages_fts WHERE pages_fts MATCH ? ORDER BY bm25(pages_fts, 10.0, 1.0) LIMIT 1",
+                (" ".join(f'"{token}"' for token in tokens),)
+            ).fetchone()
+    
+    def fetch_once(self, query: str, fetch: Callable[[], Any]) -> Any:
+        """Return fetch() for a query, sharing one call among concurrent callers with the same normalized query."""
+        return self._flight.do(normalize_query(query), fetch)
+    
+    def store(self, title: str, summary: str, queries: Iterable[str] = (), expires: bool = True):
+        """Save a summary under its title and any queries that led to it."""
+        expires_at = time.time() + self.ttl if expires else None
+        with self._lock:
+            self._store(title, summary, queries, expires_at)
+            self._conn.commit()
+    
+    def _store(self, title: str, summary: str, queries: Iterable[str], expires_at: Optional[float]):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO pages (title, key, summary, expires_at) VALUES (?, ?, ?, ?)",
+            (title, normalize_query(title), summary, expires_at)
+        )
+        if self.full_text:
+            self._conn.execute("DELETE FROM pages_fts WHERE title = ?", (title,))
+            self._conn.execute("INSERT INTO pages_fts (title, summary) VALUES (?, ?)", (title, summary))
+        for query in queries:
+            self._conn.execute("INSERT OR REPLACE INTO queries (query, title) VALUES (?, ?)",
+                               (normalize_query(query), title))
+    
+    def import_jsonl(self, path: str) -> int:
+        """Bulk-load {"title", "summary", "queries"} records that never expire; returns the count."""
+        count = 0
+        with open(path, 'r', encoding='utf-8') as f, self._lock:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                self._store(record['title'], record['summary'], record.get('queries', []), None)
+                count += 1
+            self._conn.commit()
+        return count
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class RecognitionBackend:
+    """A speech recognition engine that turns an utterance into text.
+
+    ``recognize`` raises sr.UnknownValueError when the audio was heard but
+    not understood and any other exception when the engine failed.
+    """
+
+    name = "backend"
+    local = False
+
+    def recognize(self, audio: sr.AudioData, language: str) -> str:
+        raise NotImplementedError
+
+class GoogleBackend(RecognitionBackend):
+    name = "google"
+
+    def __init__(self, timeout: float):
+        self.recognizer = sr.Recognizer()
+        self.recognizer.operation_timeout = timeout
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> str:
+        return self.recognizer.recognize_google(audio, language=language)
+
+class SphinxBackend(RecognitionBackend):
+    name = "sphinx"
+    local = True
+
+    def __init__(self, language: str = "en-US"):
+        self.language = language
+        self.recognizer = sr.Recognizer()
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> str:
+        return self.recognizer.recognize_sphinx(audio, language=self.language)
+
+class VoskBackend(RecognitionBackend):
+    name = "vosk"
+    local = True
+
+    def __init__(self):
+        self.recognizer = sr.Recognizer()
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> str:
+        result = self.recognizer.recognize_vosk(audio)
+        text = json.loads(result).get('text', '') if isinstance(result, str) and result.startswith('{') else result
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+class WhisperBackend(RecognitionBackend):
+    name = "whisper"
+    local = True
+
+    def __init__(self, model: str = "base"):
+        self.model = model
+        self.recognizer = sr.Recognizer()
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> str:
+        text = self.recognizer.recognize_whisper(audio, model=self.model, language=language.split('-')[0]).strip()
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+class HttpBackend(RecognitionBackend):
+    """Posts WAV audio to a recognition server that answers with {"text": ...}."""
+
+    name = "http"
+
+    def __init__(self, url: str, timeout: float, session: Optional[requests.Session] = None):
+        self.url = url
+        self.timeout = timeout
+        self.session = session or requests.Session()
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> str:
+        response = self.session.post(
+            self.url,
+            data=audio.get_wav_data(),
+            params={"language": language},
+            headers={"Content-Type": "audio/wav"},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        text = response.json().get('text', '')
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+class BackendStats:
+    """Latency and outcome counters for one recognition backend.
+
+    Hedged requests record from several threads while another thread
+    ranks the backends, so every access goes through a lock.
+    """
+
+    def __init__(self, window: int = 50):
+        self.requests = 0
+        self.failures = 0
+        self.unknown = 0
+        self.wins = 0
+        self.latencies = deque(maxlen=window)
+        self.recent = deque(maxlen=window)
+        self.last_failure_at = 0.0
+        self.last_request_at = 0.0
+        self._lock = threading.Lock()
+    
+    def record(self, latency: float, outcome: str):
+        with self._lock:
+            self.requests += 1
+            self.last_request_at = time.monotonic()
+            self.latencies.append(latency)
+            self.recent.append(outcome == "failure")
+            if outcome == "failure":
+                self.failures += 1
+                self.last_failure_at = time.monotonic()
+            elif outcome == "unknown":
+                self.unknown += 1
+    
+    def win(self):
+        with self._lock:
+            self.wins += 1
+    
+    @property
+    def failure_rate(self) -> float:
+        with self._lock:
+            recent = list(self.recent)
+        return sum(recent) / len(recent) if recent else 0.0
+    
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            ordered = sorted(self.latencies)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    
+    def summary(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self._lock:
+            counts = {"requests": self.requests, "failures": self.failures, "unknown": self.unknown, "wins": self.wins}
+        return {
+            **counts,
+            "failure_rate": round(self.failure_rate, 3),
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+        }
+
+class HedgedRecognizer:
+    """Runs recognition on a preferred backend and hedges to the next one when it is slow.
+
+    The first backend gets ``hedge_after`` seconds to answer; after that (or
+    as soon as it fails) the next backend is started as well and the first
+    answer wins. Backends whose recent failure rate is above
+    ``max_failure_rate`` are moved to the back of the order until
+    ``retry_after`` seconds have passed since their last failure. Backends
+    whose recent median latency is above ``hedge_after`` go behind the fast
+    ones, slowest last, until their statistics are ``retry_after`` seconds old.
+    """
+
+    def __init__(self, backends: list, hedge_after: float, timeout: float, max_failure_rate: float = 0.5,
+                 retry_after: float = 30.0):
+        if not backends:
+            raise ValueError("At least one recognition backend is required")
+        self.backends = backends
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self.max_failure_rate = max_failure_rate
+        self.retry_after = retry_after
+        self.stats = {backend.name: BackendStats() for backend in backends}
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(backends), thread_name_prefix="asr")
+    
+    def order(self) -> list:
+        """Return the backends in the order they will be tried."""
+        now = time.monotonic()
+        
+        def rank(backend):
+            stats = self.stats[backend.name]
+            unhealthy = (len(stats.recent) >= 3 and stats.failure_rate > self.max_failure_rate
+                         and now - stats.last_failure_at < self.retry_after)
+            p50 = stats.percentile(0.5) if len(stats.latencies) >= 3 else None
+            slow = p50 is not None and p50 > self.hedge_after and now - stats.last_request_at < self.retry_after
+            return unhealthy, p50 if slow else 0.0
+        return sorted(self.backends, key=rank)
+    
+    def _run(self, backend: RecognitionBackend, audio: sr.AudioData, language: str) -> str:
+        start = time.perf_counter()
+        try:
+            text = backend.recognize(audio, language)
+        except sr.UnknownValueError:
+            self.stats[backend.name].record(time.perf_counter() - start, "unknown")
+            raise
+        except Exception:
+            self.stats[backend.name].record(time.perf_counter() - start, "failure")
+            raise
+        self.stats[backend.name].record(time.perf_counter() - start, "success")
+        return text
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> str:
+        """Return the first answer from the hedged backends.
+
+        A backend that heard nothing it could understand only ends
+        recognition once no other started backend is still running.
+        """
+        pending = {}
+        remaining = self.order()
+        deadline = time.perf_counter() + self.timeout
+        errors = []
+        unknown = None
+        
+        def launch():
+            backend = remaining.pop(0)
+            pending[self._executor.submit(self._run, backend, audio, language)] = backend
+        
+        launch()
+        while pending:
+            budget = deadline - time.perf_counter()
+            if budget <= 0:
+                break
+            done, _ = wait(pending, timeout=min(self.hedge_after, budget) if remaining else budget,
+                           return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    text = future.result()
+                except sr.UnknownValueError:
+                    unknown = backend
+                    continue
+                except Exception as e:
+                    logger.warning(f"Recognition backend {backend.name} failed: {e}")
+                    errors.append(f"{backend.name}: {e}")
+                    continue
+                self.stats[backend.name].win()
+                logger.debug(f"Recognized by {backend.name}")
+                return text
+            
+            if unknown is not None and not pending:
+                break
+            if remaining and (not done or not pending):
+                logger.info(f"Hedging recognition to {remaining[0].name}")
+                launch()
+        
+        if unknown is not None:
+            self.stats[unknown.name].win()
+            raise sr.UnknownValueError()
+        raise sr.RequestError("; ".join(errors) or f"recognition timed out after {self.timeout}s")
+    
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Return per-backend latency and failure statistics."""
+        return {name: stats.summary() for name, stats in self.stats.items()}
+    
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+def create_recognizer(config: Dict[str, Any], session: Optional[requests.Session] = None) -> HedgedRecognizer:
+    """Create the recognition backends listed in config, skipping ones that are unknown."""
+    factories = {
+        "google": lambda: GoogleBackend(config['asr_timeout']),
+        "sphinx": lambda: SphinxBackend(config['sphinx_language']),
+        "vosk": VoskBackend,
+        "whisper": lambda: WhisperBackend(config['whisper_model']),
+        "http": lambda: HttpBackend(config['asr_server_url'], config['asr_timeout'], session),
+    }
+    backends = []
+    for name in config['asr_backends']:
+        if name not in factories:
+            logger.warning(f"Unknown recognition backend: {name}")
+            continue
+        backends.append(factories[name]())
+    if not backends:
+        backends.append(factories["google"]())
+    
+    return HedgedRecognizer(backends, config['asr_hedge_after'], config['asr_timeout'])
+
+_worker_recognizer: Optional[HedgedRecognizer] = None
+
+def _init_recognition_worker():
+    """Give pool processes plain stderr logging instead of the parent's queue."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging.basicConfig(level=logging.WARNING, format=LOG_FORMAT)
+
+def recognize_wav(config: Dict[str, Any], wav: bytes, language: str) -> str:
+    """Decode and recognize a WAV utterance; runs in a server pool process."""
+    global _worker_recognizer
+    if _worker_recognizer is None:
+        _worker_recognizer = create_recognizer(config, requests.Session())
+    return _worker_recognizer.recognize(read_wav(wav), language)
+
+class RecognitionStream:
+    """One utterance fed to a streaming recognizer while it is being spoken."""
+
+    def feed(self, chunk: bytes) -> Optional[str]:
+        """Add audio and return the current partial transcript, if there is one."""
+        raise NotImplementedError
+    
+    def finish(self) -> str:
+        """Return the final transcript, raising sr.UnknownValueError if nothing was understood."""
+        raise NotImplementedError
+
+class VoskStream(RecognitionStream):
+    def __init__(self, model, sample_rate: int):
+        self.recognizer = vosk.KaldiRecognizer(model, sample_rate)
+        self.segments = []
+    
+    def feed(self, chunk: bytes) -> Optional[str]:
+        if self.recognizer.AcceptWaveform(chunk):
+            text = json.loads(self.recognizer.Result()).get('text', '')
+            if text:
+                self.segments.append(text)
+            partial = ""
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get('partial', '')
+        return " ".join(self.segments + ([partial] if partial else [])) or None
+    
+    def finish(self) -> str:
+        text = json.loads(self.recognizer.FinalResult()).get('text', '')
+        transcript = " ".join(self.segments + ([text] if text else []))
+        if not transcript:
+            raise sr.UnknownValueError()
+        return transcript
+
+class VoskStreamingBackend:
+    """Streaming recognition with a local Vosk model, producing partial transcripts as audio arrives."""
+
+    name = "vosk"
+
+    def __init__(self, model_path: str):
+        self.model = vosk.Model(model_path)
+    
+    def open(self, sample_rate: int, sample_width: int) -> RecognitionStream:
+        return VoskStream(self.model, sample_rate)
+
+class Speculator:
+    """Starts prefetch work for confident partial transcripts and settles it against the final one.
+
+    ``prefetchers`` maps an intent name to a function that returns
+    ``(key, fetch)`` for a command, or None if there is nothing to prefetch.
+    A prefetch starts once partials have matched the same key for
+    ``stable`` seconds. If the final transcript has the same key, the
+    prefetch is committed without waiting for it: prefetchers fetch through
+    the single-flight caches, so the handler either reads the result or
+    joins the fetch still in flight. Otherwise it is discarded and its
+    result goes unused.
+    """
+
+    def __init__(self, router: IntentRouter, executor: ThreadPoolExecutor,
+                 prefetchers: Dict[str, Callable[[str], Optional[tuple]]], stable: float = 0.5,
+                 metrics: Optional[Metrics] = None):
+        self.router = router
+        self.executor = executor
+        self.prefetchers = prefetchers
+        self.stable = stable
+        self.metrics = metrics
+        self.head_start: Dict[str, list] = {}
+        self._candidate: Optional[tuple] = None
+        self._candidate_since = 0.0
+        self._pending: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+    
+    def _prefetch_for(self, text: str) -> Optional[tuple]:
+        match = self.router.match(text)
+        if match is None or match.intent.name not in self.prefetchers:
+            return None
+        prefetch = self.prefetchers[match.intent.name](text)
+        return (match.intent.name, *prefetch) if prefetch else None
+    
+    def partial(self, text: str):
+        """Consider a partial transcript, starting a prefetch once it has been stable long enough."""
+        prefetch = self._prefetch_for(text.lower())
+        now = time.perf_counter()
+        with self._lock:
+            if prefetch is None:
+                self._candidate = None
+                return
+            name, key, fetch = prefetch
+            if key != self._candidate:
+                self._candidate, self._candidate_since = key, now
+            if now - self._candidate_since < self.stable or key in self._pending:
+                return
+            finished = []
+            future = self.executor.submit(self._run, name, fetch, finished)
+            self._pending[key] = (name, now, future, finished)
+        logger.info(f"Speculative {name} prefetch started on partial: {text}")
+        if self.metrics:
+            self.metrics.count("speculation", intent=name, outcome="started")
+    
+    def _run(self, name: str, fetch: Callable[[], Any], finished: list):
+        try:
+            fetch()
+        except Exception as e:
+            logger.debug(f"Speculative {name} prefetch failed: {e}")
+        finally:
+            finished.append(time.perf_counter())
+    
+    def settle(self, text: Optional[str]) -> Optional[float]:
+        """Commit the prefetch that matches the final transcript, discard the others and return its head start.
+
+        The head start is how long the prefetch had been running, or took,
+        before the final transcript arrived.
+        """
+        final = self._prefetch_for(text) if text else None
+        now = time.perf_counter()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._candidate = None
+        
+        head_start = None
+        for key, (name, started, future, finished) in pending.items():
+            if final is not None and key == final[1]:
+                head_start = min(finished[0] if finished else now, now) - started
+                self.head_start.setdefault(name, []).append(head_start)
+                logger.info(f"Committed speculative {name} prefetch, started {head_start:.3f}s before the final transcript",
+                            extra={"fields": {"intent": name, "speculation_head_start": round(head_start, 4)}})
+                if self.metrics:
+                    self.metrics.count("speculation", intent=name, outcome="hit")
+                    self.metrics.observe("speculation_head_start", head_start, started, intent=name)
+            else:
+                future.cancel()
+                logger.info(f"Discarded speculative {name} prefetch")
+                if self.metrics:
+                    self.metrics.count("speculation", intent=name, outcome="miss")
+        return head_start
+
+class JobCancelled(Exception):
+    """Raised inside a background job once it has been cancelled."""
+
 @dataclass
-class Contact:
+class Job:
+    id: int
     name: str
-    phone: str
-    aliases: list
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    future: Any = None
+    trace: Optional[Trace] = None
+    session: Any = None
+    
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+    
+    @property
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+    
+    def check(self):
+        """Raise JobCancelled if the job has been cancelled."""
+        if self.cancelled:
+            raise JobCancelled(self.name)
+    
+    def sleep(self, seconds: float):
+        """Wait for the given time, returning early with JobCancelled on cancellation."""
+        if self.cancel_event.wait(seconds):
+            raise JobCancelled(self.name)
+    
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - (self.started_at or self.submitted_at)
+
+_job_context = threading.local()
+
+def current_job() -> Optional[Job]:
+    """Return the background job running on this thread, if any."""
+    return getattr(_job_context, 'job', None)
+
+_session_context = threading.local()
+
+def current_session() -> Optional["ClientSession"]:
+    """Return the server client session whose dialog runs on this thread, if any."""
+    return getattr(_session_context, 'session', None)
+
+class JobScheduler:
+    """Runs long commands on a thread pool so the listen loop stays responsive.
+
+    Cancellation is cooperative: a cancelled job that has not started is
+    dropped, and a running one sees ``current_job().cancelled`` and raises
+    JobCancelled from ``check()`` or ``sleep()``.
+    """
+
+    def __init__(self, max_workers: int = 4, metrics: Optional[Metrics] = None):
+        self.metrics = metrics
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[int, Job]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+    
+    def submit(self, name: str, func: Callable, *args, **kwargs) -> Job:
+        """Run func(*args, **kwargs) in the background and return its job."""
+        with self._lock:
+            job = Job(self._next_id, name)
+            self._next_id += 1
+            self._jobs[job.id] = job
+        job.trace = current_trace()
+        job.session = current_session()
+        if job.trace is not None:
+            job.trace.hold()
+        job.future = self._executor.submit(self._run, job, func, args, kwargs)
+        logger.info(f"Started background job {job.id}: {name}")
+        return job
+    
+    def _run(self, job: Job, func: Callable, args: tuple, kwargs: dict):
+        _job_context.job = job
+        _trace_context.trace = job.trace
+        _session_context.session = job.session
+        job.started_at = time.monotonic()
+        try:
+            job.check()
+            return func(*args, **kwargs)
+        except JobCancelled:
+            logger.info(f"Background job {job.id} cancelled: {job.name}")
+        except Exception as e:
+            logger.error(f"Background job {job.id} ({job.name}) failed: {e}")
+        finally:
+            job.finished_at = time.monotonic()
+            logger.info(f"Background job {job.id} finished: {job.name}", extra={"fields": {
+                "job_id": job.id, "seconds": round(job.finished_at - job.started_at, 4), "cancelled": job.cancelled}})
+            if self.metrics is not None:
+                self.metrics.observe("job", job.finished_at - job.started_at, job=job.name,
+                                     cancelled=str(job.cancelled).lower())
+            _job_context.job = None
+            _trace_context.trace = None
+            _session_context.session = None
+            if job.trace is not None:
+                job.trace.release()
+            with self._lock:
+                self._jobs.pop(job.id, None)
+        return None
+    
+    def active(self) -> list:
+        """Return unfinished jobs, oldest first."""
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.cancelled]
+    
+    def cancel(self, job: Optional[Job] = None) -> Optional[Job]:
+        """Cancel the given job, or the most recently started one."""
+        with self._lock:
+            if job is None:
+                running = [job for job in self._jobs.values() if not job.cancelled]
+                job = running[-1] if running else None
+            if job is None:
+                return None
+            job.cancel_event.set()
+            dropped = job.future.cancel()
+            if dropped:
+                self._jobs.pop(job.id, None)
+        if dropped and job.trace is not None:
+            job.trace.release()
+        logger.info(f"Cancelled background job {job.id}: {job.name}")
+        return job
+    
+    def join(self, timeout: Optional[float] = None, session: Any = False) -> bool:
+        """Wait for current jobs, or only those of one client session, to finish; returns False on timeout."""
+        with self._lock:
+            futures = [job.future for job in self._jobs.values() if session is False or job.session is session]
+        return not wait(futures, timeout=timeout).not_done
+    
+    def close(self, wait: bool = False):
+        for job in self.active():
+            job.cancel_event.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+SCREENSHOT_FORMATS = {
+    # name: (Pillow format, file extension)
+    "png": ("PNG", "png"),
+    "jpeg": ("JPEG", "jpg"),
+    "webp": ("WEBP", "webp"),
+    "raw": ("PPM", "ppm"),
+}
+
+@dataclass
+class FrameTiming:
+    """Capture and encode time of one saved screenshot."""
+    filename: str
+    capture: float
+    encode: float
+    size: int
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"filename": self.filename, "capture": round(self.capture, 4),
+                "encode": round(self.encode, 4), "size": self.size}
+
+class ScreenCapture:
+    """Captures screen frames and encodes them to files in the configured format.
+
+    ``source`` returns a Pillow image, normally ``pyautogui.screenshot``.
+    Captures run on background jobs, so encoding never blocks the main loop.
+    """
+
+    def __init__(self, source: Callable[[], Any], directory: str = "", fmt: str = "png", quality: int = 85,
+                 compress_level: int = 1, queue_size: int = 4, metrics: Optional["Metrics"] = None):
+        if fmt not in SCREENSHOT_FORMATS:
+            raise ValueError(f"Unknown screenshot format '{fmt}', expected one of {', '.join(SCREENSHOT_FORMATS)}")
+        self.source = source
+        self.directory = directory
+        self.format = fmt
+        self.quality = quality
+        self.compress_level = compress_level
+        self.queue_size = queue_size
+        self.metrics = metrics
+    
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.{SCREENSHOT_FORMATS[self.format][1]}")
+    
+    def encode(self, image, filename: str) -> int:
+        """Write an image to a file and return its size in bytes."""
+        options = {
+            "png": {"compress_level": self.compress_level},
+            "jpeg": {"quality": self.quality},
+            "webp": {"quality": self.quality, "method": 0},
+            "raw": {},
+        }[self.format]
+        if self.format in ("jpeg", "raw") and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(filename, SCREENSHOT_FORMATS[self.format][0], **options)
+        return os.path.getsize(filename)
+    
+    def capture(self, filename: str) -> FrameTiming:
+        """Capture one frame and encode it to filename."""
+        started = time.perf_counter()
+        image = self.source()
+        captured = time.perf_counter()
+        size = self.encode(image, filename)
+        return self._record(FrameTiming(filename, captured - started, time.perf_counter() - captured, size))
+    
+    def burst(self, name: str, count: int, interval: float, job: Optional["Job"] = None) -> tuple:
+        """Capture count frames interval seconds apart while a writer thread encodes them.
+
+        Frames are handed over through a bounded queue. When the writer falls
+        behind, new frames are dropped rather than delaying the capture
+        schedule. Returns the frame timings and the number of dropped frames.
+        """
+        frames = queue.Queue(maxsize=self.queue_size)
+        timings = []
+        dropped = 0
+        
+        def write():
+            while True:
+                item = frames.get()
+                if item is None:
+                    return
+                filename, image, capture_seconds = item
+                started = time.perf_counter()
+                try:
+                    size = self.encode(image, filename)
+                except Exception as e:
+                    logger.error(f"Failed to write screenshot {filename}: {e}")
+                    continue
+                timings.append(self._record(FrameTiming(filename, capture_seconds, time.perf_counter() - started, size)))
+        
+        writer = threading.Thread(target=write, name="screenshot-writer", daemon=True)
+        writer.start()
+        try:
+            first = time.perf_counter()
+            for index in range(count):
+                delay = first + index * interval - time.perf_counter()
+                if delay > 0:
+                    job.sleep(delay) if job else time.sleep(delay)
+                started = time.perf_counter()
+                image = self.source()
+                try:
+                    frames.put_nowait((self.path(f"{name}_{index + 1:03d}"), image, time.perf_counter() - started))
+                except queue.Full:
+                    dropped += 1
+                    logger.warning(f"Screenshot writer is behind, dropped frame {index + 1} of {count}")
+        finally:
+            frames.put(None)
+            writer.join()
+        return timings, dropped
+    
+    def _record(self, timing: FrameTiming) -> FrameTiming:
+        if self.metrics:
+            self.metrics.observe("screenshot_capture", timing.capture)
+            self.metrics.observe("screenshot_encode", timing.encode, format=self.format)
+        logger.info(f"Saved {timing.filename}: capture {timing.capture * 1000:.1f}ms, encode {timing.encode * 1000:.1f}ms",
+                    extra={"fields": {"screenshot": timing.to_dict()}})
+        return timing
+
+class CaptureSink:
+    """Collects the assistant's replies in headless runs instead of playing them."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.records = []
+        self.turn = 0
+        self._lock = threading.Lock()
+    
+    def write(self, text: str, **fields):
+        record = {"turn": self.turn, "text": text, **fields}
+        with self._lock:
+            self.records.append(record)
+            if self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + "\n")
+
+@dataclass
+class TurnResult:
+    command: str
+    intent: str
+    seconds: float
+
+def load_script(path: str) -> list:
+    """Read headless input: one command per line (.txt), JSON objects with "text" and/or "wav" (.jsonl), or a WAV file."""
+    if path.endswith('.wav'):
+        return [{"wav": path}]
+    
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            entries.append(json.loads(line) if path.endswith('.jsonl') else {"text": line})
+    return entries
+
+class ClientSession:
+    """Dialog state of one server client: its pending input and the connection its replies go to."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, server: "AssistantServer", loop: asyncio.AbstractEventLoop, writer: asyncio.StreamWriter):
+        self.id = next(self._ids)
+        self.name = f"client-{self.id}"
+        self.audio = True
+        self.server = server
+        self.closed = False
+        self.inbox = queue.Queue()
+        self._loop = loop
+        self._writer = writer
+    
+    def send(self, message: Dict[str, Any]):
+        """Send a message to the client; safe to call from any thread."""
+        data = (json.dumps(message) + "\n").encode()
+        self._loop.call_soon_threadsafe(self._write, data)
+    
+    def _write(self, data: bytes):
+        if not self._writer.is_closing():
+            self._writer.write(data)
+    
+    def receive(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Return the client's next message, or None on timeout or disconnect."""
+        if self.closed and self.inbox.empty():
+            return None
+        try:
+            return self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class AssistantServer:
+    """Serves many thin clients from one assistant over newline-delimited JSON on a TCP socket.
+
+    Clients send ``{"type": "text", "text": ...}`` or ``{"type": "audio",
+    "data": <base64 WAV>}`` utterances and receive ``transcript``, ``reply``
+    (with base64 mp3 ``audio`` unless the client said ``{"type": "hello",
+    "audio": false}``) and ``turn_done`` messages. Each client gets its own
+    dialog thread, while the router, contacts, caches and job pool are shared.
+    Speech recognition runs on a process pool. With a ``token``, a client's
+    first message must be a hello carrying it, or the connection is closed.
+    """
+
+    def __init__(self, assistant: "VoiceAssistant", host: str, port: int,
+                 processes: Optional[int] = None, max_sessions: int = 64, token: Optional[str] = None):
+        self.assistant = assistant
+        self.host = host
+        self.port = port
+        self.token = token
+        self.sessions: Dict[int, ClientSession] = {}
+        self.process_pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_recognition_worker)
+        self.dialogs = ThreadPoolExecutor(max_workers=max_sessions, thread_name_prefix="session")
+    
+    async def serve(self):
+        server = await asyncio.start_server(self._handle_client, self.host, self.port, limit=16 * 1024 * 1024)
+        logger.info(f"Assistant server listening on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+    
+    async def _authenticate(self, reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+        """Return the client's hello message if it carries the server token, otherwise None."""
+        try:
+            message = json.loads(await asyncio.wait_for(reader.readline(), timeout=10))
+        except (asyncio.TimeoutError, ConnectionError, asyncio.LimitOverrunError, ValueError):
+            return None
+        if not isinstance(message, dict) or message.get("type") != "hello":
+            return None
+        if not hmac.compare_digest(str(message.get("token", "")).encode(), self.token.encode()):
+            return None
+        return message
+    
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        hello = None
+        if self.token:
+            hello = await self._authenticate(reader)
+            if hello is None:
+                logger.warning(f"Rejected unauthenticated client from {writer.get_extra_info('peername')}")
+                self.assistant.metrics.count("errors", stage="server_auth")
+                writer.write(b'{"type": "error", "error": "unauthorized"}\n')
+                with contextlib.suppress(ConnectionError):
+                    await writer.drain()
+                writer.close()
+                return
+        
+        session = ClientSession(self, loop, writer)
+        if hello:
+            session.name = hello.get("name", session.name)
+            session.audio = hello.get("audio", True)
+        self.sessions[session.id] = session
+        self.assistant.metrics.count("sessions")
+        logger.info(f"Client {session.name} connected from {writer.get_extra_info('peername')}")
+        
+        dialog = loop.run_in_executor(self.dialogs, self.assistant.serve_session, session)
+        dialog.add_done_callback(lambda future: writer.close())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    session.send({"type": "error", "error": "invalid JSON"})
+                    continue
+                problem = self._validate(message)
+                if problem:
+                    session.send({"type": "error", "error": f"invalid message: {problem}"})
+                    continue
+                if message.get("type") == "hello":
+                    session.name = message.get("name", session.name)
+                    session.audio = message.get("audio", True)
+                elif message.get("type") == "bye":
+                    break
+                else:
+                    session.inbox.put(message)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            logger.warning(f"Client {session.name} connection error: {e}")
+        finally:
+            session.closed = True
+            session.inbox.put(None)
+            try:
+                await dialog
+            except Exception as e:
+                logger.error(f"Client {session.name} dialog error: {e}")
+            self.sessions.pop(session.id, None)
+            writer.close()
+            logger.info(f"Client {session.name} disconnected")
+    
+    @staticmethod
+    def _validate(message: Any) -> Optional[str]:
+        """Return what is wrong with a client message, or None if it can be handled."""
+        if not isinstance(message, dict):
+            return "expected an object"
+        for key in ("type", "name", "text", "data"):
+            if key in message and not isinstance(message[key], str):
+                return f"{key} must be a string"
+        if message.get("type") == "audio" and "data" not in message:
+            return "audio without data"
+        return None
+    
+    def recognize(self, message: Dict[str, Any]) -> str:
+        """Recognize a client's WAV utterance on the process pool."""
+        wav = base64.b64decode(message['data'])
+        config = self.assistant.config
+        if self.assistant.fakes:
+            audio = read_wav(wav)
+            if 'text' in message:
+                self.assistant.fake_asr.expect(audio, message['text'])
+            return self.assistant.asr.recognize(audio, config['language'])
+        return self.process_pool.submit(recognize_wav, config, wav, config['language']).result()
+    
+    def close(self):
+        self.dialogs.shutdown(wait=False, cancel_futures=True)
+        self.process_pool.shutdown(wait=False, cancel_futures=True)
 
 class VoiceAssistant:
-    def __init__(self, config_file: str = "config.json"):
-        """Initialize the voice assistant with configuration."""
+    def __init__(self, config_file: str = "config.json", http: Optional[HttpClient] = None,
+                 headless: bool = False, fakes: Optional["FakeIntegrations"] = None,
+                 overrides: Optional[Dict[str, Any]] = None, sink: Optional[CaptureSink] = None):
+        """Initialize the voice assistant with configuration.
+
+        ``http`` replaces the shared HTTP client, e.g. to point the web
+        integrations at a local test server. A ``headless`` assistant takes
+        input from ``run_script`` and writes replies to ``sink`` instead of
+        using audio devices. With ``fakes``, network integrations are
+        answered locally; install them with ``fakes.install()``.
+        """
+        self.startup_timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        
+        self.headless = headless
+        self.fakes = fakes
+        self.sink = sink or CaptureSink()
+        self.script: Optional[deque] = None
         self.config = self._load_config(config_file)
+        if fakes:
+            self.config.update(fakes.CONFIG)
+        self.config.update(overrides or {})
+        self.metrics = Metrics(
+            self.config['metrics_file'],
+            self.config['metrics_prometheus_file'],
+            int(self.config['metrics_max_mb'] * 1024 * 1024),
+            self.config['trace_turns']
+        )
+        started = self._startup_step("config", started)
+        self.http = http or (fakes.http_client() if fakes else HttpClient(timeout=self.config['http_timeout']))
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        if fakes:
+            self.fake_asr = fakes.recognition_backend()
+            self.asr = HedgedRecognizer([self.fake_asr], self.config['asr_hedge_after'], self.config['asr_timeout'])
+        else:
+            self.asr = self._create_recognizer()
+        self.microphone = sr.Microphone() if self.config['audio_source'] == "microphone" and not headless else None
+        started = self._startup_step("microphone", started)
         self.contacts = self._load_contacts()
+        started = self._startup_step("contacts", started)
+        self.wiki_store = WikiStore(self.config['wiki_store'], self.config['wiki_ttl_days'] * 86400)
+        started = self._startup_step("wiki_store", started)
+        self.router = IntentRouter()
+        self.router.register_handlers(self)
+        self.jobs = JobScheduler(self.config['background_workers'], self.metrics)
+        self._speed_result: Optional[tuple] = None
+        self._fanout = ThreadPoolExecutor(max_workers=8, thread_name_prefix="routine")
+        self._register_routines()
+        self.streaming = self._create_streaming_backend() if self.config['asr_streaming'] else None
+        self.speculator = None
+        if self.streaming and self.config['speculative_prefetch']:
+            self.speculator = Speculator(
+                self.router,
+                self._fanout,
+                {name: getattr(self, method) for name, method in self.SPECULATIVE_PREFETCH.items()},
+                self.config['speculation_stable_ms'] / 1000,
+                metrics=self.metrics
+            )
+        started = self._startup_step("router", started)
         self.temp_dir = tempfile.gettempdir()
+        self.player = AudioPlayer()
+        self.output = SpeechOutput(self._render_to_sink if headless else self._render_speech,
+                                   on_finished=self._record_speech)
+        started = self._startup_step("audio_output", started)
+        self.tts_cache = TTSCache(
+            self.config['tts_cache_dir'],
+            int(self.config['tts_cache_max_mb'] * 1024 * 1024)
+        )
+        self.phrases = self._create_phrase_bank()
+        self.screen = ScreenCapture(
+            lambda: pyautogui.screenshot(),
+            self.config['screenshot_dir'],
+            self.config['screenshot_format'],
+            self.config['screenshot_quality'],
+            self.config['screenshot_compress_level'],
+            self.config['screenshot_queue_size'],
+            self.metrics
+        )
+        started = self._startup_step("tts_cache", started)
+        self.wake_detector = self._load_wake_word()
+        started = self._startup_step("wake_word", started)
         
-        try:
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
-        except Exception as e:
-            logger.error(f"Failed to adjust for ambient noise: {e}")
+        if not headless:
+            self.warm_up()
+        
+        calibration = self._load_calibration()
+        started = self._startup_step("noise_calibration", started)
+        
+        self.capture = None if headless else self._create_capture(calibration)
+        self._barge_in_run = 0
+        self._startup_step("capture", started)
+        
+        logger.info(f"Startup took {sum(self.startup_timings.values()):.3f}s", extra={"fields": {
+            "startup": {step: round(t, 4) for step, t in self.startup_timings.items()}}})
     
-    def _load_config(self, config_file: str) -> Dict[str, Any]:
+    def _startup_step(self, step: str, started: float) -> float:
+        """Record how long an initialization step took and return the current time."""
+        now = time.perf_counter()
+        self.startup_timings[step] = now - started
+        self.metrics.observe("startup", now - started, started, step=step)
+        return now
+    
+    @staticmethod
+    def _load_config(config_file: str) -> Dict[str, Any]:
         """Load configuration from JSON file."""
         default_config = {
             "timeout": 5,
@@ -62,7 +3093,85 @@ class VoiceAssistant:
             "language": "en-in",
             "tts_language": "en",
             "tts_slow": False,
-            "speech_delay": 0.5  
+            "speech_delay": 0.5,
+            "contacts_file": "contacts.json",
+            "tts_cache_dir": "tts_cache",
+            "tts_cache_max_mb": 50,
+            "tts_warmup": True,
+            "tts_streaming": True,
+            "tts_templates": True,
+            "tts_crossfade_ms": 15,
+            "preload_integrations": True,
+            "wiki_store": "wikipedia.sqlite3",
+            "wiki_ttl_days": 30,
+            "wiki_prefetch": 3,
+            "background_workers": 4,
+            "speed_test_max_age": 600,
+            "routines": {
+                "good morning": ["greeting", "time", "weather", "battery"]
+            },
+            "routine_timeout": 10,
+            "confirm_messages": True,
+            "message_undo_seconds": 5,
+            "screenshot_delay": 3,
+            "screenshot_dir": "",
+            "screenshot_format": "png",
+            "screenshot_quality": 85,
+            "screenshot_compress_level": 1,
+            "screenshot_burst_interval": 1,
+            "screenshot_burst_max": 30,
+            "screenshot_queue_size": 4,
+            "metrics_file": "metrics.jsonl",
+            "metrics_prometheus_file": "metrics.prom",
+            "metrics_max_mb": 5,
+            "metrics_interval": 60,
+            "metrics_port": None,
+            "trace_turns": False,
+            "log_file": "assistant.log",
+            "log_level": "INFO",
+            "log_json": True,
+            "log_rotation": "size",
+            "log_max_mb": 10,
+            "log_backups": 5,
+            "server_host": "127.0.0.1",
+            "server_port": 8770,
+            "server_processes": None,
+            "server_max_sessions": 64,
+            "server_reply_timeout": 30,
+            "server_token": None,
+            "server_intents": ["time", "weather", "wikipedia", "joke", "battery", "hello", "how_are_you",
+                               "capabilities", "status", "cancel", "exit", "routine_*"],
+            "http_timeout": 5,
+            "geolocation_url": "https://ipinfo.io/json",
+            "geolocation_ttl": 3600,
+            "weather_url": "https://www.google.com/search",
+            "weather_ttl": 600,
+            "weather_stale_ttl": 300,
+            "cache_stale_ttl": 86400,
+            "asr_backends": ["google"],
+            "asr_hedge_after": 1.5,
+            "asr_timeout": 8,
+            "asr_server_url": "http://127.0.0.1:8765/recognize",
+            "asr_streaming": False,
+            "vosk_model": "model",
+            "speculative_prefetch": True,
+            "speculation_stable_ms": 500,
+            "sphinx_language": "en-US",
+            "whisper_model": "base",
+            "audio_source": "microphone",
+            "pre_roll": 0.3,
+            "capture_buffer_seconds": 30,
+            "calibration_file": "calibration.json",
+            "noise_window_seconds": 30,
+            "noise_percentile": 20,
+            "noise_threshold_ratio": 2.0,
+            "min_energy_threshold": 100,
+            "wake_word_dir": "wake_word",
+            "wake_word_threshold": 0.6,
+            "async_speech": True,
+            "barge_in": True,
+            "barge_in_energy_ratio": 2.5,
+            "barge_in_chunks": 3
         }
         
         try:
@@ -79,167 +3188,723 @@ class VoiceAssistant:
         
         return default_config
     
-    def _load_contacts(self) -> Dict[str, Contact]:
-        """Load contacts from external file for security."""
-        contacts_file = "contacts.json"
+    def _load_contacts(self) -> ContactIndex:
+        """Load contacts from external file for security and index their names."""
+        contacts_file = self.config.get('contacts_file', 'contacts.json')
         contacts = {}
+        mtime = None
+        
+        try:
+            if Path(contacts_file).exists():
+                mtime = os.stat(contacts_file).st_mtime
+                with open(contacts_file, 'r') as f:
+                    contacts_data = json.load(f)
+                    for contact_data in contacts_data:
+                        contact = Contact(**contact_data)
+                        contacts[contact.name] = contact
+            else:
+                logger.warning(f"Contacts file not found: {contacts_file}")
+        except Exception as e:
+            logger.error(f"Error loading contacts: {e}")
+            mtime = None
+        
+        return ContactIndex(contacts.values(), mtime)
+    
+    def _create_recognizer(self) -> HedgedRecognizer:
+        """Create the configured recognition backends, skipping ones that are unknown."""
+        return create_recognizer(self.config, self.http.session)
+    
+    def _load_calibration(self) -> Dict[str, float]:
+        """Load the noise calibration persisted by the previous session."""
+        calibration_file = self.config['calibration_file']
+        try:
+            if Path(calibration_file).exists():
+                with open(calibration_file, 'r') as f:
+                    calibration = json.load(f)
+                logger.info(f"Loaded noise calibration: {calibration}")
+                return calibration
+        except Exception as e:
+            logger.error(f"Error loading calibration: {e}")
+        return {}
+    
+    def save_calibration(self):
+        """Persist the current noise floor and energy threshold for the next startup."""
+        metrics = self.capture.metrics()
+        if metrics['noise_floor'] is None:
+            return
+        try:
+            with open(self.config['calibration_file'], 'w') as f:
+                json.dump({
+                    "noise_floor": metrics['noise_floor'],
+                    "energy_threshold": metrics['energy_threshold'],
+                    "updated": datetime.now().isoformat(timespec='seconds')
+                }, f, indent=2)
+        except Exception as e:
+            logger.error(f"Error saving calibration: {e}")
+    
+    def _create_capture(self, calibration: Dict[str, float]) -> AudioCapture:
+        """Create the persistent capture pipeline for the configured audio source."""
+        audio_source = self.config['audio_source']
+        if audio_source == "microphone":
+            source = MicrophoneSource(self.microphone)
+        else:
+            paths = [audio_source] if isinstance(audio_source, str) else audio_source
+            source = WavFileSource(paths)
+        
+        endpointer = Endpointer(
+            source.sample_rate,
+            source.sample_width,
+            calibration.get('energy_threshold', self.recognizer.energy_threshold),
+            pause=self.config['pause_threshold'],
+            max_phrase=self.config['phrase_time_limit'],
+            pre_roll=self.config['pre_roll']
+        )
+        window = int(self.config['noise_window_seconds'] * source.sample_rate / source.chunk_size)
+        noise = NoiseFloorEstimator(
+            window=max(window, 1),
+            percentile=self.config['noise_percentile'],
+            ratio=self.config['noise_threshold_ratio'],
+            minimum=self.config['min_energy_threshold'],
+            noise_floor=calibration.get('noise_floor'),
+            metrics=self.metrics
+        )
+        return AudioCapture(source, endpointer, self.config['capture_buffer_seconds'], self._speech_gate, noise,
+                            self.streaming.open if self.streaming else None, self._on_partial,
+                            lambda: self.output.busy)
+    
+    def _create_streaming_backend(self):
+        """Create the streaming recognizer, or return None if it is unavailable."""
+        if self.fakes:
+            return self.fakes.streaming_backend()
+        try:
+            return VoskStreamingBackend(self.config['vosk_model'])
+        except Exception as e:
+            logger.warning(f"Streaming recognition unavailable, recognizing whole utterances: {e}")
+            return None
+    
+    def _on_partial(self, text: str):
+        """Handle a partial transcript from the streaming recognizer."""
+        logger.debug(f"Partial transcript: {text}")
+        if self.speculator:
+            self.speculator.partial(text)
+    
+    def _speech_gate(self, energy: float, first_chunk: bool) -> Optional[bool]:
+        """Decide on the capture thread whether an utterance is user speech.
+
+        Speech that starts while the assistant is silent is kept. Speech
+        during playback is treated as echo and discarded, unless barge-in
+        is enabled and the input stays well above the energy threshold for
+        several chunks, in which case playback is stopped.
+        """
+        if first_chunk:
+            self._barge_in_run = 0
+        if not self.output.busy:
+            return True
+        if not self.config.get('barge_in', True):
+            return False
+        
+        if energy > self.capture.endpointer.threshold * self.config['barge_in_energy_ratio']:
+            self._barge_in_run += 1
+        else:
+            self._barge_in_run = 0
         
+        if self._barge_in_run >= self.config['barge_in_chunks']:
+            logger.info("Barge-in detected, stopping playback")
+            self.output.stop()
+            return True
+        return None
+    
+    def _load_wake_word(self) -> Optional[WakeWordDetector]:
+        """Load the local wake-word templates, if any have been enrolled."""
+        directory = self.config['wake_word_dir']
         try:
-            if Path(contacts_file).exists():
-                with open(contacts_file, 'r') as f:
-                    contacts_data = json.load(f)
-                    for contact_data in contacts_data:
-                        contact = Contact(**contact_data)
-                        contacts[contact.name] = contact
-            else:
-                logger.warning(f"Contacts file not found: {contacts_file}")
+            detector = WakeWordDetector.from_directory(directory, self.config['wake_word_threshold'])
         except Exception as e:
-            logger.error(f"Error loading contacts: {e}")
+            logger.error(f"Failed to load wake word templates: {e}")
+            return None
         
-        return contacts
+        if detector is None:
+            logger.info(f"No wake word templates in {directory}, wake words will be checked with cloud recognition")
+        else:
+            logger.info(f"Loaded {len(detector.templates)} wake word templates")
+        return detector
     
-    def speak(self, text: str):
-        """Convert text to speech using gtts and playsound."""
-        if not text:
+    def _synthesize(self, text: str, filename: str):
+        """Synthesize text to an mp3 file with gTTS."""
+        if self.fakes:
+            Path(filename).write_bytes(self._synthesize_bytes(text))
             return
-            
-        print(f"[Assistant]: {text}")
-        logger.info(f"Speaking: {text}")
+        tts = gTTS(
+            text=text, 
+            lang=self.config.get('tts_language', 'en'), 
+            slow=self.config.get('tts_slow', False)
+        )
+        tts.save(filename)
+    
+    def _synthesize_bytes(self, text: str) -> bytes:
+        """Synthesize text to mp3 data in memory with gTTS."""
+        if self.fakes:
+            self.fakes.call("tts", text)
+            return b""
+        tts = gTTS(
+            text=text, 
+            lang=self.config.get('tts_language', 'en'), 
+            slow=self.config.get('tts_slow', False)
+        )
+        buffer = io.BytesIO()
+        tts.write_to_fp(buffer)
+        return buffer.getvalue()
+    
+    def _speak_streaming(self, handle: SpeechHandle):
+        """Synthesize the next sentence on a worker thread while the current one plays."""
+        lang = self.config.get('tts_language', 'en')
+        slow = self.config.get('tts_slow', False)
+        segments = split_sentences(handle.text)
+        pending = queue.Queue(maxsize=2)
+        
+        def put(item) -> bool:
+            while not handle.stop_event.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            try:
+                for segment in segments:
+                    audio = self.tts_cache.fetch_bytes(
+                        segment, lang, slow,
+                        lambda segment=segment: self._synthesize_bytes(segment)
+                    )
+                    if not put(audio):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
         
+        threading.Thread(target=produce, name="tts-stream", daemon=True).start()
+        
+        while not handle.stop_event.is_set():
+            try:
+                audio = pending.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if audio is None:
+                break
+            if isinstance(audio, Exception):
+                raise audio
+            if handle.first_audio_at is None:
+                handle.first_audio_at = time.perf_counter()
+                logger.info(f"Time to first audio: {handle.first_audio_at - handle.started_at:.3f}s ({len(segments)} segments)")
+            self.player.play_bytes(audio, handle.stop_event)
+    
+    def _render_speech(self, handle: SpeechHandle):
+        """Synthesize and play one utterance on the speech output thread."""
         try:
-            filename = os.path.join(self.temp_dir, f"voice_{uuid.uuid4()}.mp3")
-            
-            tts = gTTS(
-                text=text, 
-                lang=self.config.get('tts_language', 'en'), 
-                slow=self.config.get('tts_slow', False)
-            )
+            samples = self._render_template(handle.text)
+            if samples is not None:
+                handle.first_audio_at = time.perf_counter()
+                self.player.play_pcm(samples, handle.stop_event)
+                return
             
-            tts.save(filename)
+            if self.config.get('tts_streaming', True):
+                self._speak_streaming(handle)
+                return
             
-            playsound(filename)
+            filename = self.tts_cache.fetch(
+                handle.text,
+                self.config.get('tts_language', 'en'),
+                self.config.get('tts_slow', False),
+                lambda path: self._synthesize(handle.text, path)
+            )
             
-            try:
-                os.remove(filename)
-            except Exception as cleanup_error:
-                logger.warning(f"Failed to cleanup audio file {filename}: {cleanup_error}")
+            handle.first_audio_at = time.perf_counter()
+            self.player.play_file(filename, handle.stop_event)
             
-            time.sleep(self.config.get('speech_delay', 0.5))
+            handle.stop_event.wait(self.config.get('speech_delay', 0.5))
             
         except Exception as e:
             logger.error(f"Speech failed: {e}")
             print(f"[Speech Error]: {e}")
-            print(f"[TTS FAILED]: {text}")
+            print(f"[TTS FAILED]: {handle.text}")
     
-    def listen(self) -> Optional[str]:
-        """Listen for voice input and return recognized text."""
-        try:
-            with self.microphone as source:
-                print("Listening...")
-                self.recognizer.pause_threshold = self.config['pause_threshold']
-                audio = self.recognizer.listen(
-                    source, 
-                    timeout=self.config['timeout'],
-                    phrase_time_limit=self.config['phrase_time_limit']
+    def _render_to_sink(self, handle: SpeechHandle):
+        """Synthesize one utterance without playing it and record it in the capture sink."""
+        try:
+            if self._render_template(handle.text) is not None:
+                handle.first_audio_at = time.perf_counter()
+                self.sink.write(handle.text, template=True)
+                return
+            if self.fakes:
+                self.fakes.call("tts", handle.text)
+            else:
+                self.tts_cache.fetch_bytes(
+                    handle.text,
+                    self.config.get('tts_language', 'en'),
+                    self.config.get('tts_slow', False),
+                    lambda: self._synthesize_bytes(handle.text)
                 )
+            handle.first_audio_at = time.perf_counter()
+            self.sink.write(handle.text)
+        except Exception as e:
+            logger.error(f"Speech failed: {e}")
+            self.sink.write(handle.text, error=str(e))
+    
+    def warm_up(self):
+        """Start pre-synthesizing the fixed phrases in the background, if tts_warmup is enabled."""
+        if self.config.get('tts_warmup', True):
+            threading.Thread(target=self._warm_up_tts, name="tts-warmup", daemon=True).start()
+    
+    def _warm_up_tts(self):
+        """Pre-synthesize the fixed phrases so they play without a network call.
+
+        With streaming, speech is looked up one sentence at a time, so the
+        phrases are cached as the sentences they are split into.
+        """
+        phrases = STATIC_PHRASES
+        if self.config.get('tts_streaming', True):
+            phrases = dict.fromkeys(segment for phrase in STATIC_PHRASES for segment in split_sentences(phrase))
+        self.tts_cache.warm_up(
+            phrases,
+            self.config.get('tts_language', 'en'),
+            self.config.get('tts_slow', False),
+            self._synthesize
+        )
+        logger.info(f"TTS cache warm-up finished: {self.tts_cache.stats()}")
+        if self.phrases:
+            self.phrases.prerender()
+    
+    def _create_phrase_bank(self) -> Optional[PhraseBank]:
+        """Build the phrase bank for template responses, if audio can be decoded locally."""
+        if not self.config.get('tts_templates', True):
+            return None
+        crossfade = self.config.get('tts_crossfade_ms', 15) / 1000
+        if self.fakes:
+            def fetch(fragment):
+                self.fakes.call("tts", fragment)
+                return b""
+            return PhraseBank(fetch, self.fakes.decode, self.fakes.SAMPLE_RATE, crossfade)
+        if not self.player.can_decode:
+            logger.info("Phrase templates disabled: no audio decoder available")
+            return None
+        
+        lang = self.config.get('tts_language', 'en')
+        slow = self.config.get('tts_slow', False)
+        return PhraseBank(
+            lambda fragment: self.tts_cache.fetch_bytes(fragment, lang, slow, lambda: self._synthesize_bytes(fragment)),
+            self.player.decode,
+            self.player.sample_rate,
+            crossfade
+        )
+    
+    def _render_template(self, text: str):
+        """Return stitched audio for a template response, or None to synthesize it normally."""
+        if not self.phrases:
+            return None
+        try:
+            with self.metrics.span("tts_template"):
+                return self.phrases.render(text)
+        except Exception as e:
+            logger.warning(f"Phrase template failed, synthesizing instead: {e}")
+            return None
+    
+    def speak(self, text: str) -> Optional[SpeechHandle]:
+        """Queue text for speech output and return a handle to the utterance.
+
+        With ``async_speech`` disabled this blocks until playback finishes.
+        """
+        if not text:
+            return None
+        job = current_job()
+        if job is not None and job.cancelled:
+            logger.info(f"Dropping speech from cancelled job {job.name}: {text}")
+            return None
+        session = current_session()
+        if session is not None:
+            self._speak_to_session(session, text)
+            return None
             
-            print("Recognizing...")
-            query = self.recognizer.recognize_google(
-                audio, 
-                language=self.config['language']
-            )
+        print(f"[Assistant]: {text}")
+        logger.info(f"Speaking: {text}")
+        
+        trace = current_trace()
+        if trace is not None:
+            trace.hold()
+        handle = self.output.say(text, trace)
+        if not self.config.get('async_speech', True):
+            handle.wait()
+        return handle
+    
+    def _speak_to_session(self, session: ClientSession, text: str):
+        """Synthesize a reply with the shared TTS cache and send it to a server client."""
+        logger.info(f"Speaking to {session.name}: {text}")
+        audio = None
+        audio_format = "mp3"
+        try:
+            samples = self._render_template(text) if session.audio else None
+            if samples is not None:
+                audio = base64.b64encode(write_wav(samples, self.phrases.sample_rate)).decode()
+                audio_format = "wav"
+            elif session.audio:
+                with self.metrics.span("tts_synthesis"):
+                    if self.fakes:
+                        self.fakes.call("tts", text)
+                        audio = ""
+                    else:
+                        audio = base64.b64encode(self.tts_cache.fetch_bytes(
+                            text,
+                            self.config.get('tts_language', 'en'),
+                            self.config.get('tts_slow', False),
+                            lambda: self._synthesize_bytes(text)
+                        )).decode()
+        except Exception as e:
+            logger.error(f"Speech synthesis for {session.name} failed: {e}")
+        session.send({"type": "reply", "text": text, "audio": audio, "format": audio_format})
+    
+    def _record_speech(self, handle: SpeechHandle):
+        """Record the synthesis and playback timings of a finished utterance."""
+        stages = [
+            ("tts_queue_wait", handle.queued_at, handle.started_at),
+            ("tts_synthesis", handle.started_at, handle.first_audio_at),
+            ("tts_playback", handle.first_audio_at, handle.finished_at),
+        ]
+        for stage, start, end in stages:
+            if start is not None and end is not None:
+                self.metrics.observe(stage, end - start, start, trace=handle.trace)
+        self.metrics.count("utterances", interrupted=str(handle.interrupted).lower())
+        if handle.trace is not None:
+            handle.trace.release()
+    
+    def listen(self) -> Optional[str]:
+        """Listen for voice input, or take the next scripted input, and return recognized text."""
+        session = current_session()
+        if session is not None:
+            return self._session_input(session, self.config['server_reply_timeout']) or None
+        
+        query = None
+        try:
+            query = self._recognize_scripted() if self.script is not None else self._recognize_captured()
+            if query is None:
+                self.metrics.count("asr", outcome="no_speech")
+                return None
             print(f"You said: {query}")
-            logger.info(f"Recognized: {query}")
+            logger.info(f"Recognized: {query}", extra={"fields": {"transcript": query}})
+            self.metrics.count("asr", outcome="ok")
             return query.lower()
             
-        except sr.WaitTimeoutError:
-            print("No speech detected")
-            return None
         except sr.UnknownValueError:
             print("Could not understand audio")
+            self.metrics.count("asr", outcome="unrecognized")
             return None
         except Exception as e:
             logger.error(f"Listen error: {e}")
+            self.metrics.count("asr", outcome="error")
             return None
+        finally:
+            if self.speculator:
+                self.speculator.settle(query.lower() if query else None)
     
-    def greet(self):
-        """Greet the user based on time of day."""
+    def _recognize_captured(self) -> Optional[str]:
+        """Wait for an utterance on the capture stream and recognize it.
+
+        Once playback has ended, utterances that were finished before it
+        ended are stale (said while the last command was being handled) and
+        dropped. A barge-in stops playback, so it ends afterwards and is kept.
+        """
+        print("Listening...")
+        self.capture.configure(self.config['pause_threshold'], self.config['phrase_time_limit'])
+        self.output.wait_idle()
+        self.capture.clear(before=self.output.last_finished_at)
+        with self.metrics.span("capture"):
+            utterance = self.capture.next_utterance(self.config['timeout'], hold=lambda: self.output.busy)
+        if utterance is None:
+            print("No speech detected")
+            return None
+        self.metrics.observe("utterance", utterance.ended_at - utterance.started_at, utterance.started_at)
+        
+        print("Recognizing...")
+        with self.metrics.span("asr"):
+            if utterance.stream is not None:
+                try:
+                    return utterance.stream.finish()
+                except sr.UnknownValueError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Streaming recognition failed, recognizing the whole utterance: {e}")
+            return self.asr.recognize(utterance.audio(), self.config['language'])
+    
+    def _recognize_scripted(self) -> Optional[str]:
+        """Take the next scripted entry, recognizing it if it is a WAV recording."""
+        if not self.script:
+            return None
+        entry = self.script.popleft()
+        print(f"[User]: {entry.get('wav') or entry.get('text')}")
+        
+        if 'wav' not in entry and self.fakes and self.streaming:
+            return self._stream_scripted(entry['text'])
+        
+        with self.metrics.span("asr"):
+            if 'wav' not in entry:
+                if self.fakes:
+                    self.fakes.call("asr")
+                return entry['text']
+            audio = read_wav(entry['wav'])
+            if self.fakes and 'text' in entry:
+                self.fake_asr.expect(audio, entry['text'])
+            return self.asr.recognize(audio, self.config['language'])
+    
+    def _stream_scripted(self, text: str) -> str:
+        """Stream a scripted command through the fake streaming recognizer in real time, as if it were spoken.
+
+        The command is followed by ``pause_threshold`` seconds of silence,
+        as the endpointer would wait for.
+        """
+        sample_rate, sample_width, step = 16000, 2, 0.1
+        self.streaming.transcripts.append(text)
+        stream = self.streaming.open(sample_rate, sample_width)
+        chunk = bytes(int(sample_rate * step) * sample_width)
+        speaking = len(text.split()) / self.streaming.words_per_second + self.config['pause_threshold']
+        
+        started = time.perf_counter()
+        while time.perf_counter() - started < speaking:
+            time.sleep(step)
+            partial = stream.feed(chunk)
+            if partial:
+                self._on_partial(partial)
+        with self.metrics.span("asr"):
+            return stream.finish()
+    
+    def run_script(self, entries: Iterable[Dict[str, str]]) -> list:
+        """Replay scripted input headlessly and return the intent and latency of each turn.
+
+        Each entry is one listen() result, so follow-up answers to prompts
+        are simply the next entries. A turn lasts until its background jobs
+        and replies have finished.
+        """
+        self.script = deque(entries)
+        results = []
+        try:
+            while self.script:
+                self.sink.turn = len(results)
+                started = time.perf_counter()
+                with self.metrics.turn() as turn:
+                    command = self.listen()
+                    if not command:
+                        turn.discard()
+                        continue
+                    match = self.router.match(command)
+                    keep_going = self.process_command(command)
+                self.jobs.join()
+                self.output.wait_idle()
+                results.append(TurnResult(command, match.intent.name if match else "unknown",
+                                          time.perf_counter() - started))
+                if not keep_going:
+                    break
+        finally:
+            self.script = None
+        return results
+    
+    def _session_input(self, session: ClientSession, timeout: Optional[float]) -> Optional[str]:
+        """Wait for a server client's next utterance and return its text.
+
+        Returns None when the client went away or did not answer in time,
+        and an empty string when its audio could not be recognized.
+        """
+        message = session.receive(timeout)
+        if message is None:
+            return None
+        
+        try:
+            with self.metrics.span("asr"):
+                if message.get('type') == "audio":
+                    text = session.server.recognize(message)
+                else:
+                    text = message.get('text', "")
+        except sr.UnknownValueError:
+            self.metrics.count("asr", outcome="unrecognized")
+            text = ""
+        except Exception as e:
+            logger.error(f"Recognition for {session.name} failed: {e}")
+            self.metrics.count("asr", outcome="error")
+            text = ""
+        
+        session.send({"type": "transcript", "text": text})
+        logger.info(f"Recognized from {session.name}: {text}", extra={"fields": {"transcript": text, "client": session.name}})
+        return text.lower()
+    
+    def serve_session(self, session: ClientSession):
+        """Run one server client's dialog on the calling thread until it disconnects or says goodbye."""
+        _session_context.session = session
+        try:
+            while True:
+                started = time.perf_counter()
+                with self.metrics.turn() as turn:
+                    command = self._session_input(session, None)
+                    if command is None:
+                        turn.discard()
+                        return
+                    match = self.router.match(command) if command else None
+                    keep_going = self.process_command(command) if command else True
+                self.jobs.join(session=session)
+                session.send({"type": "turn_done", "turn": turn.id, "intent": match.intent.name if match else None,
+                              "seconds": round(time.perf_counter() - started, 4)})
+                if not keep_going:
+                    return
+        finally:
+            _session_context.session = None
+    
+    def close(self):
+        """Release background threads and files."""
+        self.output.close(timeout=30)
+        self.jobs.close()
+        self._fanout.shutdown(wait=False, cancel_futures=True)
+        self.metrics.close()
+        self.wiki_store.close()
+        self.asr.close()
+    
+    def listen_for_wake_word(self) -> Optional[str]:
+        """Wait on the capture stream until the local wake-word detector fires.
+
+        Nothing is sent to cloud recognition while waiting; returns the
+        wake phrase once it has been heard.
+        """
+        print("Waiting for wake word...")
+        self.capture.configure(0.3, 2.0)
+        while True:
+            utterance = self.capture.next_utterance(None)
+            detected, distance = self.wake_detector.detect(utterance.audio())
+            logger.debug(f"Wake word distance: {distance:.3f}")
+            if detected:
+                logger.info(f"Wake word detected (distance {distance:.3f})")
+                return "wake up"
+    
+    def enroll_wake_word(self, count: int = 3):
+        """Record wake-word templates from the audio source."""
+        directory = Path(self.config['wake_word_dir'])
+        directory.mkdir(parents=True, exist_ok=True)
+        self.capture.configure(0.3, 2.0)
+        
+        saved = 0
+        while saved < count:
+            self.speak(f"Say the wake word now. Sample {saved + 1} of {count}.")
+            utterance = self.capture.next_utterance(self.config['timeout'], hold=lambda: self.output.busy)
+            if utterance is None:
+                continue
+            path = directory / f"template_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{saved}.wav"
+            path.write_bytes(utterance.audio().get_wav_data(convert_rate=WakeWordDetector.SAMPLE_RATE, convert_width=2))
+            logger.info(f"Saved wake word template {path}")
+            saved += 1
+        
+        self.wake_detector = self._load_wake_word()
+        self.speak("Wake word saved.")
+        self.output.wait_idle()
+        self.capture.stop()
+    
+    def _speak_lines(self, lines: Iterable[str]):
+        """Speak each line of a computed report."""
+        for line in lines:
+            self.speak(line)
+    
+    def _greeting_report(self) -> list:
+        """Return a greeting based on time of day."""
         hour = datetime.now().hour
         
         if 0 <= hour < 12:
-            greeting = "Good Morning Sir"
+            return ["Good Morning Sir"]
         elif 12 <= hour < 17:
-            greeting = "Good Afternoon Sir"
+            return ["Good Afternoon Sir"]
         else:
-            greeting = "Good Evening Sir"
-        
-        self.speak(greeting)
+            return ["Good Evening Sir"]
+    
+    def greet(self):
+        """Greet the user based on time of day."""
+        self._speak_lines(self._greeting_report())
         self.speak("How can I help you today?")
     
     def get_contact_number(self, name: str) -> Optional[str]:
-        """Get contact number by name or alias."""
-        name = name.lower()
-        
-        if name in self.contacts:
-            return self.contacts[name].phone
-        
-        for contact in self.contacts.values():
-            if name in [alias.lower() for alias in contact.aliases]:
-                return contact.phone
+        """Get contact number by name or alias, tolerating recognizer spelling variations."""
+        contact = self.find_contact(name)
+        return contact.phone if contact else None
+    
+    def find_contact(self, name: str) -> Optional[Contact]:
+        """Find a contact by name or alias, reloading the contacts file if it changed."""
+        contacts_file = self.config.get('contacts_file', 'contacts.json')
+        if self.contacts.is_stale(contacts_file):
+            contacts = self._load_contacts()
+            if contacts.mtime is not None or not Path(contacts_file).exists():
+                self.contacts = contacts
+                logger.info(f"Reloaded {len(contacts)} contacts from {contacts_file}")
         
-        return None
+        return self.contacts.resolve(name)
+    
+    def _ask(self, prompt: str) -> Optional[str]:
+        """Ask for a missing slot and return the reply, or None if there was none or it was cancelled."""
+        self.speak(prompt)
+        reply = self.listen()
+        if not reply or 'cancel' in reply or 'leave' in reply:
+            return None
+        return reply
     
-    def send_whatsapp_message(self):
-        """Send WhatsApp message to a contact."""
+    def send_whatsapp_message(self, command: str = ""):
+        """Send WhatsApp message to a contact, asking only for details missing from the command."""
         try:
-            self.speak("Whom do you want to send the message to?")
-            recipient = self.listen()
+            slots = extract_slots("whatsapp", command)
+            recipient = slots.get('recipient') or self._ask("Whom do you want to send the message to?")
             
             if not recipient:
-                self.speak("I didn't catch that. Please try again.")
-                return
-            
-            if 'cancel' in recipient or 'leave' in recipient:
                 self.speak("Message cancelled.")
                 return
             
-            phone_number = self.get_contact_number(recipient)
+            contact = self.find_contact(recipient)
             
-            if not phone_number:
+            if not contact:
                 self.speak("Contact not found. Please check the name and try again.")
                 return
             
-            self.speak("What's the message?")
-            message = self.listen()
+            message = slots.get('message') or self._ask("What's the message?")
             
             if not message:
-                self.speak("No message received. Canceling.")
-                return
-            
-            if 'cancel' in message or 'leave' in message:
                 self.speak("Message cancelled.")
                 return
             
-            self.speak("Should I send the message?")
-            confirmation = self.listen()
-            
-            if confirmation and 'yes' in confirmation or 'send' in confirmation:
-                kit.sendwhatmsg_instantly(phone_number, message, 5)
-                self.speak("Message sent successfully.")
+            exact = normalize_name(recipient) in {normalize_name(name) for name in [contact.name] + contact.aliases}
+            if self.config['confirm_messages'] or not exact:
+                confirmation = self._ask(f"Should I send {message} to {contact.name}?")
+                if not confirmation or not ('yes' in confirmation or 'send' in confirmation):
+                    self.speak("Message cancelled.")
+                    return
+                prompt, delay = None, 0
             else:
-                self.speak("Message cancelled.")
+                prompt = self.speak(f"Sending {message} to {contact.name}. Say cancel that to stop it.")
+                delay = self.config['message_undo_seconds']
+            
+            self.jobs.submit("whatsapp message", self._deliver_whatsapp_message, contact.phone, message, delay, prompt)
             
         except Exception as e:
             logger.error(f"WhatsApp message error: {e}")
             self.speak("Sorry, I couldn't send the message.")
     
-    def play_youtube_video(self):
+    def _deliver_whatsapp_message(self, phone_number: str, message: str, delay: float,
+                                  prompt: Optional[SpeechHandle] = None):
+        """Send a message once the read-back and the undo window are over, unless the job was cancelled."""
+        try:
+            self._countdown(prompt, delay)
+            kit.sendwhatmsg_instantly(phone_number, message, 5)
+            self.speak("Message sent successfully.")
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"WhatsApp message error: {e}")
+            self.speak("Sorry, I couldn't send the message.")
+    
+    def play_youtube_video(self, command: str = ""):
         """Play video on YouTube."""
         try:
-            self.speak("What would you like to watch?")
-            query = self.listen()
+            query = extract_slots("play_youtube", command).get('query') or self._ask("What would you like to watch?")
             
-            if query and 'cancel' not in query:
+            if query:
                 self.speak(f"Playing {query} on YouTube")
                 kit.playonyt(query)
             else:
@@ -249,8 +3914,54 @@ class VoiceAssistant:
             logger.error(f"YouTube play error: {e}")
             self.speak("Sorry, I couldn't play the video.")
     
+    def _fetch_wikipedia(self, query: str) -> tuple:
+        """Fetch a summary from Wikipedia and save it to the local store under the resolved page title.
+
+        A fetch already in flight for the same query, such as a speculative
+        prefetch, is joined instead of repeated.
+        """
+        def fetch():
+            page = wikipedia.page(query)
+            summary = " ".join(re.split(r'(?<=[.!?])\s+', page.summary.strip())[:3])
+            self.wiki_store.store(page.title, summary, [query])
+            return page.title, summary
+        
+        return self.wiki_store.fetch_once(query, fetch)
+    
+    def _prefetch_wikipedia(self, titles: Iterable[str]):
+        """Fetch disambiguation candidates into the local store in the background."""
+        def fetch(title):
+            if self.wiki_store.lookup(title):
+                return
+            try:
+                self.wiki_store.store(title, wikipedia.summary(title, sentences=3, auto_suggest=False))
+                logger.info(f"Prefetched Wikipedia page: {title}")
+            except Exception as e:
+                logger.debug(f"Prefetching {title} failed: {e}")
+        
+        for title in titles:
+            threading.Thread(target=fetch, args=(title,), name="wiki-prefetch", daemon=True).start()
+    
+    def _wikipedia_report(self, query: str) -> list:
+        """Return a Wikipedia summary for query from the local store or the live site."""
+        cached = self.wiki_store.lookup(query)
+        if cached:
+            logger.info(f"Wikipedia answer from local store: {cached[0]}")
+            return ["According to Wikipedia:", cached[1]]
+        
+        try:
+            return ["According to Wikipedia:", self._fetch_wikipedia(query)[1]]
+        except (wikipedia.exceptions.DisambiguationError, wikipedia.exceptions.PageError):
+            raise
+        except Exception as e:
+            offline = self.wiki_store.lookup(query, include_expired=True) or self.wiki_store.search(query)
+            if not offline:
+                raise
+            logger.warning(f"Wikipedia unavailable ({e}), answering from local store: {offline[0]}")
+            return ["According to Wikipedia:", offline[1]]
+    
     def search_wikipedia(self, query: str):
-        """Search Wikipedia for information."""
+        """Search Wikipedia for information, answering from the local store when possible."""
         try:
             self.speak("Searching Wikipedia...")
             clean_query = query.replace('wikipedia', '').strip()
@@ -259,13 +3970,12 @@ class VoiceAssistant:
                 self.speak("Please specify what to search for.")
                 return
             
-            results = wikipedia.summary(clean_query, sentences=3)
-            self.speak("According to Wikipedia:")
-            self.speak(results)
+            self._speak_lines(self._wikipedia_report(clean_query))
             
         except wikipedia.exceptions.DisambiguationError as e:
             self.speak("Multiple results found. Please be more specific.")
             logger.info(f"Wikipedia disambiguation: {e.options[:3]}")
+            self._prefetch_wikipedia(e.options[:self.config['wiki_prefetch']])
         except wikipedia.exceptions.PageError:
             self.speak("No Wikipedia page found for that query.")
         except Exception as e:
@@ -276,65 +3986,85 @@ class VoiceAssistant:
         """Get current weather information."""
         try:
             self.speak("Checking weather information...")
-            
-            if location == "current location":
-                response = requests.get('https://ipinfo.io/', timeout=5)
-                data = response.json()
-                location = data.get('city', 'your location')
-            
-            query = f"weather in {location}"
-            url = f"https://www.google.com/search?q={query}"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            response = requests.get(url, headers=headers, timeout=5)
-            soup = BeautifulSoup(response.text, "html.parser")
-            
-            temp_element = soup.find("div", class_="BNeawe")
-            if temp_element:
-                temperature = temp_element.text
-                self.speak(f"The current temperature in {location} is {temperature}")
-            else:
-                self.speak("Sorry, I couldn't fetch the weather information.")
-                
+            self._speak_lines(self._weather_report(location))
         except Exception as e:
             logger.error(f"Weather error: {e}")
             self.speak("Sorry, I couldn't get the weather information.")
     
+    def _weather_report(self, location: str = "current location") -> list:
+        """Return the current temperature for location."""
+        if location == "current location":
+            data = self.http.get_json(
+                self.config['geolocation_url'],
+                ttl=self.config['geolocation_ttl'],
+                stale_ttl=self.config['cache_stale_ttl']
+            )
+            location = data.get('city', 'your location')
+        
+        temperature = self.http.cached(
+            ("weather", location),
+            lambda: extract_element(
+                self.http.get(self.config['weather_url'], params={"q": f"weather in {location}"}).text,
+                "div", "BNeawe"
+            ),
+            ttl=self.config['weather_ttl'],
+            stale_ttl=min(self.config['weather_stale_ttl'], self.config['weather_ttl'])
+        )
+        
+        if temperature:
+            return [f"The current temperature in {location} is {temperature}"]
+        return ["Sorry, I couldn't fetch the weather information."]
+    
+    SPECULATIVE_PREFETCH = {
+        "weather": "_speculate_weather",
+        "wikipedia": "_speculate_wikipedia",
+    }
+    
+    def _speculate_weather(self, command: str) -> Optional[tuple]:
+        return ("weather",), self._weather_report
+    
+    def _speculate_wikipedia(self, command: str) -> Optional[tuple]:
+        query = command.replace('wikipedia', '').strip()
+        if not query:
+            return None
+        return ("wikipedia", query), lambda: self.wiki_store.lookup(query) or self._fetch_wikipedia(query)
+    
+    def _battery_report(self) -> list:
+        """Return battery percentage and status."""
+        battery = psutil.sensors_battery()
+        if not battery:
+            return ["Unable to get battery information."]
+        
+        percentage = int(battery.percent)
+        if percentage >= 75:
+            status = "Battery level is excellent."
+        elif percentage >= 50:
+            status = "Battery level is good."
+        elif percentage >= 25:
+            status = "Battery level is moderate. Consider charging soon."
+        elif percentage >= 15:
+            status = "Battery is getting low. Please charge."
+        else:
+            status = "Battery is very low. Please charge immediately."
+        return [f"Battery is at {percentage} percent", status]
+    
     def get_system_battery(self):
         """Get battery percentage and status."""
         try:
-            battery = psutil.sensors_battery()
-            if battery:
-                percentage = int(battery.percent)
-                self.speak(f"Battery is at {percentage} percent")
-                
-                if percentage >= 75:
-                    self.speak("Battery level is excellent.")
-                elif percentage >= 50:
-                    self.speak("Battery level is good.")
-                elif percentage >= 25:
-                    self.speak("Battery level is moderate. Consider charging soon.")
-                elif percentage >= 15:
-                    self.speak("Battery is getting low. Please charge.")
-                else:
-                    self.speak("Battery is very low. Please charge immediately.")
-            else:
-                self.speak("Unable to get battery information.")
-                
+            self._speak_lines(self._battery_report())
         except Exception as e:
             logger.error(f"Battery error: {e}")
             self.speak("Sorry, I couldn't check the battery status.")
     
-    def take_screenshot(self):
-        """Take and save a screenshot."""
+    def take_screenshot(self, command: str = ""):
+        """Take and save a screenshot, or a burst of them, e.g. "take 5 screenshots every 2 seconds"."""
         try:
-            self.speak("What should I name the screenshot?")
-            name = self.listen()
+            slots = extract_slots("screenshot", command)
+            count = slots.get('count', "1")
+            count = min(SMALL_NUMBERS.get(count) or int(count), self.config['screenshot_burst_max'])
+            name = slots.get('name') or self._ask("What should I name the screenshot?")
             
-            if not name or 'cancel' in name:
+            if not name:
                 self.speak("Screenshot cancelled.")
                 return
             
@@ -343,19 +4073,52 @@ class VoiceAssistant:
             if not name:
                 name = f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             
-            self.speak("Taking screenshot in 3 seconds...")
-            time.sleep(3)
-            
-            screenshot = pyautogui.screenshot()
-            filename = f"{name}.png"
-            screenshot.save(filename)
-            
-            self.speak(f"Screenshot saved as {filename}")
+            delay = self.config['screenshot_delay']
+            prompt = self.speak(f"Taking screenshot in {delay:g} seconds...") if delay else None
+            if count > 1:
+                interval = float(slots.get('interval', self.config['screenshot_burst_interval']))
+                self.jobs.submit("screenshot burst", self._capture_burst, name, count, interval, delay, prompt)
+            else:
+                self.jobs.submit("screenshot", self._capture_screenshot, self.screen.path(name), delay, prompt)
             
         except Exception as e:
             logger.error(f"Screenshot error: {e}")
             self.speak("Sorry, I couldn't take the screenshot.")
     
+    def _countdown(self, prompt: Optional[SpeechHandle], delay: float):
+        """Wait until a prompt has finished playing, then for delay seconds, stopping early on cancellation."""
+        job = current_job()
+        while prompt is not None and not prompt.wait(0.1):
+            job.check()
+        job.sleep(delay)
+    
+    def _capture_screenshot(self, filename: str, delay: float = 3, prompt: Optional[SpeechHandle] = None):
+        """Wait for the countdown, then capture and save the screen."""
+        try:
+            self._countdown(prompt, delay)
+            self.screen.capture(filename)
+            self.speak(f"Screenshot saved as {os.path.basename(filename)}")
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Screenshot error: {e}")
+            self.speak("Sorry, I couldn't take the screenshot.")
+    
+    def _capture_burst(self, name: str, count: int, interval: float, delay: float = 3,
+                       prompt: Optional[SpeechHandle] = None):
+        """Wait for the countdown, then capture a series of screenshots."""
+        try:
+            self._countdown(prompt, delay)
+            timings, dropped = self.screen.burst(name, count, interval, current_job())
+            self.speak(f"Saved {len(timings)} screenshots as {name}")
+            if dropped:
+                self.speak(f"{dropped} frames were skipped because saving fell behind.")
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Screenshot burst error: {e}")
+            self.speak("Sorry, I couldn't take the screenshots.")
+    
     def control_volume(self, action: str):
         """Control system volume."""
         try:
@@ -375,147 +4138,302 @@ class VoiceAssistant:
             logger.error(f"Volume control error: {e}")
             self.speak("Sorry, I couldn't control the volume.")
     
-    def get_internet_speed(self):
-        """Test internet speed."""
+    def get_internet_speed(self, refresh: bool = False):
+        """Test internet speed, reusing a recent result unless refresh is set."""
         try:
-            self.speak("Testing internet speed. Please wait...")
+            if self._speed_result and not refresh:
+                measured_at, download_speed, upload_speed = self._speed_result
+                age = time.time() - measured_at
+                if age < self.config['speed_test_max_age']:
+                    minutes = int(age // 60)
+                    when = "less than a minute ago" if minutes == 0 else f"{minutes} minute{'s' if minutes != 1 else ''} ago"
+                    self.speak(f"As of {when}, download speed was {download_speed:.1f} and "
+                               f"upload speed was {upload_speed:.1f} megabits per second")
+                    return
+            
+            self.speak("Testing internet speed. I'll let you know when it's done.")
+            job = current_job()
             
             st = speedtest.Speedtest()
-            st=speedtest.Speedtest()
-            download_speed = int((st.download())/8000000)
-            upload_speed=int((st.upload())/8000000)
+            st.get_best_server()
+            if job:
+                job.check()
+            download_speed = st.download() / 1_000_000
+            if job:
+                job.check()
+            upload_speed = st.upload() / 1_000_000
+            if job:
+                job.check()
+            self._speed_result = (time.time(), download_speed, upload_speed)
             
-            self.speak(f"Download speed is {download_speed:.2f} megabits per second")
-            self.speak(f"Upload speed is {upload_speed:.2f} megabits per second")
+            self.speak(f"Download speed is {download_speed:.1f} megabits per second")
+            self.speak(f"Upload speed is {upload_speed:.1f} megabits per second")
             
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Speed test error: {e}")
             self.speak("Sorry, I couldn't test the internet speed.")
     
+    def _joke_report(self) -> list:
+        return [pyjokes.get_joke()]
+    
     def tell_joke(self):
         """Tell a random joke."""
         try:
-            joke = pyjokes.get_joke()
-            self.speak(joke)
+            self._speak_lines(self._joke_report())
         except Exception as e:
             logger.error(f"Joke error: {e}")
             self.speak("Sorry, I couldn't get a joke right now.")
     
+    def _time_report(self) -> list:
+        now = datetime.now()
+        return [f"The time is {now.strftime('%I:%M %p')}", f"Today is {now.strftime('%A, %B %d, %Y')}"]
+    
     def get_current_time(self):
         """Get and speak current time."""
         try:
-            current_time = datetime.now().strftime("%I:%M %p")
-            current_date = datetime.now().strftime("%A, %B %d, %Y")
-            self.speak(f"The time is {current_time}")
-            self.speak(f"Today is {current_date}")
+            self._speak_lines(self._time_report())
         except Exception as e:
             logger.error(f"Time error: {e}")
             self.speak("Sorry, I couldn't get the current time.")
     
+    ROUTINE_STEPS = {
+        "greeting": "_greeting_report",
+        "time": "_time_report",
+        "weather": "_weather_report",
+        "battery": "_battery_report",
+        "joke": "_joke_report",
+        "wikipedia": "_wikipedia_report",
+    }
+    
+    def _register_routines(self):
+        """Register an intent for each routine in the config."""
+        for name, steps in self.config.get('routines', {}).items():
+            unknown = [step for step in steps if step.split(':', 1)[0].strip() not in self.ROUTINE_STEPS]
+            if unknown:
+                logger.warning(f"Routine '{name}' has unknown steps: {unknown}")
+                continue
+            self.router.register(
+                f"routine_{name.replace(' ', '_')}",
+                lambda command, name=name, steps=steps: self.jobs.submit(f"{name} routine", self.run_routine, name, steps),
+                phrases=[name],
+                priority=104
+            )
+    
+    def run_routine(self, name: str, steps: Iterable[str]) -> list:
+        """Compute every step of a routine concurrently, then speak the combined result once.
+
+        A step is a name from ROUTINE_STEPS, optionally followed by an
+        argument, e.g. ``"weather: London"`` or ``"wikipedia: Alan Turing"``.
+        """
+        started = time.perf_counter()
+        futures = []
+        for step in steps:
+            step_name, _, argument = step.partition(':')
+            step_name, argument = step_name.strip(), argument.strip()
+            compute = getattr(self, self.ROUTINE_STEPS[step_name])
+            futures.append((step_name, self._fanout.submit(self._timed_step, compute, *([argument] if argument else []))))
+        
+        lines = []
+        step_seconds = {}
+        deadline = time.monotonic() + self.config['routine_timeout']
+        for step_name, future in futures:
+            try:
+                result, step_seconds[step_name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                self.metrics.observe("routine_step", step_seconds[step_name], step=step_name)
+                lines.extend(result)
+            except Exception as e:
+                logger.error(f"Routine '{name}' step {step_name} failed: {e!r}")
+                lines.append(f"Sorry, I couldn't get the {step_name} information.")
+        
+        logger.info(f"Routine '{name}' took {time.perf_counter() - started:.2f}s", extra={"fields": {
+            "routine": name, "seconds": round(time.perf_counter() - started, 4),
+            "steps": {step: round(t, 4) for step, t in step_seconds.items()}}})
+        self.speak(" ".join(line if line.endswith(('.', '!', '?')) else f"{line}." for line in lines))
+        return lines
+    
+    @staticmethod
+    def _timed_step(compute: Callable, *args) -> tuple:
+        started = time.perf_counter()
+        return compute(*args), time.perf_counter() - started
+    
+    @intent(keywords=['wikipedia'], priority=100)
+    def _handle_wikipedia(self, command: str):
+        self.jobs.submit("wikipedia search", self.search_wikipedia, command)
+    
+    @intent(keywords=['spotify', 'music'], priority=95)
+    def _handle_spotify(self, command: str):
+        query = extract_slots("spotify", command).get('query') or self._ask("What would you like to listen to?")
+        if query:
+            webbrowser.open(f"https://open.spotify.com/search/{query}/tracks")
+            self.speak("Opening Spotify")
+    
+    @intent(keywords=['youtube'], requires=['open'], priority=90)
+    def _handle_open_youtube(self, command: str):
+        webbrowser.open("https://www.youtube.com/")
+        self.speak("Opening YouTube")
+    
+    @intent(keywords=['youtube'], requires=['play'], priority=96)
+    def _handle_play_youtube(self, command: str):
+        self.play_youtube_video(command)
+    
+    @intent(keywords=['google'], requires=['search'], priority=80)
+    def _handle_google_search(self, command: str):
+        query = extract_slots("google_search", command).get('query') or self._ask("What should I search on Google?")
+        if query:
+            kit.search(query)
+            self.speak("Searching on Google")
+    
+    @intent(keywords=['time', 'date'], priority=75)
+    def _handle_time(self, command: str):
+        self.get_current_time()
+    
+    @intent('send message', 'send a message', 'message to', keywords=['whatsapp'], priority=70,
+            patterns=ROUTE_PATTERNS['whatsapp'])
+    def _handle_whatsapp(self, command: str):
+        self.send_whatsapp_message(command)
+    
+    @intent('stop playing', keywords=['pause'], priority=65)
+    def _handle_pause(self, command: str):
+        pyautogui.press('space')
+        self.speak("Paused")
+    
+    @intent(keywords=['joke', 'jokes'], priority=60)
+    def _handle_joke(self, command: str):
+        self.tell_joke()
+    
+    @intent(keywords=['weather'], priority=55)
+    def _handle_weather(self, command: str):
+        self.jobs.submit("weather", self.get_weather)
+    
+    @intent(keywords=['battery'], priority=50)
+    def _handle_battery(self, command: str):
+        self.get_system_battery()
+    
+    @intent(keywords=['screenshot', 'screenshots'], priority=45)
+    def _handle_screenshot(self, command: str):
+        self.take_screenshot(command)
+    
+    @intent(keywords=['volume'], priority=40)
+    def _handle_volume(self, command: str):
+        self.control_volume(command)
+    
+    @intent('internet speed', 'speed test', priority=35)
+    def _handle_speed_test(self, command: str):
+        refresh = any(word in tokenize(command) for word in ('again', 'new', 'fresh'))
+        self.jobs.submit("speed test", self.get_internet_speed, refresh)
+    
+    @intent('cancel that', 'stop that', 'never mind', keywords=['cancel'], priority=105)
+    def _handle_cancel(self, command: str):
+        jobs = [job for job in self.jobs.active() if job.session is current_session()]
+        job = self.jobs.cancel(jobs[-1]) if jobs else None
+        self.speak(f"Cancelled the {job.name}." if job else "There's nothing running to cancel.")
+    
+    @intent('what are you doing', keywords=['status'], priority=18)
+    def _handle_status(self, command: str):
+        jobs = [job for job in self.jobs.active() if job.session is current_session()]
+        if not jobs:
+            self.speak("Nothing is running in the background.")
+            return
+        for job in jobs:
+            self.speak(f"The {job.name} has been running for {int(job.elapsed())} seconds.")
+    
+    @intent(keywords=['hello', 'hi'], priority=30)
+    def _handle_hello(self, command: str):
+        self.speak("Hello! How can I help you?")
+    
+    @intent('how are you', priority=25)
+    def _handle_how_are_you(self, command: str):
+        self.speak("I'm doing well, thank you for asking! How can I assist you today?")
+    
+    @intent('what can you do', priority=20)
+    def _handle_capabilities(self, command: str):
+        self.speak("I can help you with many things like searching Wikipedia, playing YouTube videos, sending WhatsApp messages, checking weather, battery status, taking screenshots, controlling volume, and much more!")
+    
+    @intent(keywords=['rest', 'sleep', 'stop'], priority=15)
+    def _handle_rest(self, command: str):
+        self.speak("Going to rest mode. Say 'wake up' to activate me again.")
+        return False
+    
+    @intent(keywords=['goodbye', 'exit', 'quit'], priority=10)
+    def _handle_exit(self, command: str):
+        self.speak("Goodbye! Have a great day!")
+        return False
+    
+    def _allowed_remotely(self, intent_name: str) -> bool:
+        """Return whether server clients may run an intent, per the server_intents patterns."""
+        return any(fnmatch.fnmatchcase(intent_name, pattern) for pattern in self.config['server_intents'])
+    
     def process_command(self, command: str):
         """Process voice commands."""
         command = command.lower()
         
         try:
-            if 'wikipedia' in command:
-                self.search_wikipedia(command)
-            
-            elif any(word in command for word in ['spotify', 'music']):
-                self.speak("What would you like to listen to?")
-                query = self.listen()
-                if query and 'cancel' not in query:
-                    webbrowser.open(f"https://open.spotify.com/search/{query}/tracks")
-                    self.speak("Opening Spotify")
-            
-            elif 'youtube' in command and 'open' in command:
-                webbrowser.open("https://www.youtube.com/")
-                self.speak("Opening YouTube")
-            
-            elif 'play on youtube' in command or 'youtube play' in command:
-                self.play_youtube_video()
-            
-            elif 'google' in command and 'search' in command:
-                self.speak("What should I search on Google?")
-                query = self.listen()
-                if query and 'cancel' not in query:
-                    kit.search(query)
-                    self.speak("Searching on Google")
-            
-            elif any(word in command for word in ['time', 'date']):
-                self.get_current_time()
-            
-            elif 'whatsapp' in command or 'send message' in command:
-                self.send_whatsapp_message()
-            
-            elif any(word in command for word in ['pause', 'stop playing']):
-                pyautogui.press('space')
-                self.speak("Paused")
-            
-            elif 'joke' in command:
-                self.tell_joke()
-            
-            elif 'weather' in command:
-                self.get_weather()
-            
-            elif 'battery' in command:
-                self.get_system_battery()
-            
-            elif 'screenshot' in command:
-                self.take_screenshot()
-            
-            elif 'volume' in command:
-                self.control_volume(command)
-            
-            elif 'internet speed' in command or 'speed test' in command:
-                self.get_internet_speed()
-            
-            elif 'hello' in command or 'hi' in command:
-                self.speak("Hello! How can I help you?")
-            
-            elif 'how are you' in command:
-                self.speak("I'm doing well, thank you for asking! How can I assist you today?")
-            
-            elif 'what can you do' in command:
-                self.speak("I can help you with many things like searching Wikipedia, playing YouTube videos, sending WhatsApp messages, checking weather, battery status, taking screenshots, controlling volume, and much more!")
+            with self.metrics.span("dispatch") as dispatch:
+                match = self.router.match(command)
+            if match is None:
+                self.metrics.count("commands", intent="unknown")
+                logger.info("Intent: unknown", extra={"fields": {"intent": None, "command": command}})
+                self.speak("I didn't understand that command. Please try again or say 'what can you do' to see available commands.")
+                return True
             
-            elif any(word in command for word in ['rest', 'sleep', 'stop']):
-                self.speak("Going to rest mode. Say 'wake up' to activate me again.")
-                return False
+            if current_session() and not self._allowed_remotely(match.intent.name):
+                logger.warning(f"Intent {match.intent.name} refused for client {current_session().name}")
+                self.metrics.count("commands", intent=match.intent.name, outcome="refused")
+                self.speak("Sorry, that command isn't available to remote clients.")
+                return True
             
-            elif any(word in command for word in ['goodbye', 'exit', 'quit']):
-                self.speak("Goodbye! Have a great day!")
+            logger.info(f"Intent: {match.intent.name}", extra={"fields": {"intent": match.intent.name, "command": command}})
+            self.metrics.count("commands", intent=match.intent.name)
+            with self.metrics.span("handler", intent=match.intent.name) as handler:
+                result = match.intent.handler(command)
+            logger.info(f"Handled {match.intent.name}", extra={"fields": {
+                "intent": match.intent.name,
+                "dispatch_seconds": round(dispatch["seconds"], 6),
+                "handler_seconds": round(handler["seconds"], 4)}})
+            if result is False:
                 return False
-            
-            else:
-                self.speak("I didn't understand that command. Please try again or say 'what can you do' to see available commands.")
                 
         except Exception as e:
             logger.error(f"Command processing error: {e}")
+            self.metrics.count("errors", stage="command")
             self.speak("Sorry, I encountered an error processing that command.")
         
         return True
     
     def run(self):
         logger.info("Voice Assistant started")
+        self.metrics.start(self.config['metrics_interval'], self.config['metrics_port'])
+        self.capture.start()
         self.greet()
         
+        preload = self.config.get('preload_integrations', True)
+        if preload:
+            modules = INTEGRATIONS if preload is True else [m for m in INTEGRATIONS if m.name in preload]
+            threading.Thread(target=preload_integrations, args=(modules,), name="preload", daemon=True).start()
+        
         try:
             while True:
                 try:
-                    command = self.listen()
+                    command = self.listen_for_wake_word() if self.wake_detector else self.listen()
                     
                     if command:
                         if any(wake_word in command for wake_word in ['wake up', 'wakeup', 'hey assistant']):
                             self.speak("I'm awake and ready to help!")
                             self.speak("What can I do for you?")
                             while True:
-                                user_input = self.listen()
-                                if user_input:
-                                    if not self.process_command(user_input):
-                                        break
-                                else:
+                                with self.metrics.turn() as turn:
+                                    user_input = self.listen()
+                                    if user_input:
+                                        keep_going = self.process_command(user_input)
+                                    else:
+                                        turn.discard()
+                                if not user_input:
                                     print("I'm still listening...")
                                     continue
+                                if not keep_going:
+                                    break
                         
                         elif any(word in command for word in ['goodbye', 'exit', 'quit']):
                             self.speak("Goodbye! Have a great day!")
@@ -536,6 +4454,15 @@ class VoiceAssistant:
                     continue
         
         finally:
+            self.capture.stop()
+            self.save_calibration()
+            logger.info(f"Audio metrics: {self.capture.metrics()}")
+            logger.info(f"Recognition backend stats: {self.asr.summary()}")
+            logger.info(f"HTTP cache stats: {self.http.cache.stats()}")
+            self.close()
+            logger.info(f"TTS cache stats: {self.tts_cache.stats()}")
+            if self.phrases:
+                logger.info(f"Phrase template stats: {self.phrases.stats()}")
             try:
                 temp_files = [f for f in os.listdir(self.temp_dir) if f.startswith('voice_') and f.endswith('.mp3')]
                 for temp_file in temp_files:
@@ -546,7 +4473,140 @@ class VoiceAssistant:
             except:
                 pass
 
+def is_loopback(host: str) -> bool:
+    """Return whether a bind address only accepts local connections."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def run_server(config: Dict[str, Any], host: Optional[str] = None, port: Optional[int] = None,
+               fakes: Optional["FakeIntegrations"] = None):
+    """Serve clients from one shared headless assistant until interrupted.
+
+    Binding to anything but a loopback address requires ``server_token``.
+    """
+    host = host or config['server_host']
+    if not config.get('server_token') and not is_loopback(host):
+        logger.error(f"Refusing to serve on {host} without a server_token; set one in config.json")
+        return
+    assistant = VoiceAssistant(headless=True, fakes=fakes)
+    assistant.warm_up()
+    server = AssistantServer(
+        assistant,
+        host,
+        port or config['server_port'],
+        config['server_processes'],
+        config['server_max_sessions'],
+        config.get('server_token')
+    )
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        logger.info("Assistant server stopped by user")
+    finally:
+        server.close()
+        assistant.close()
+
 def main():
+    parser = argparse.ArgumentParser(description="Voice Assistant")
+    parser.add_argument("--benchmark", choices=["dispatch", "contacts", "startup", "wakeword", "turns", "latency", "screenshot", "streaming"],
+                        help="run a benchmark instead of the assistant")
+    parser.add_argument("--fixtures", default="fixtures/wake_word",
+                        help="directory with positive/ and negative/ WAV files for the wakeword benchmark")
+    parser.add_argument("--corpus", metavar="PATH",
+                        help="commands for the latency benchmark (.txt or .jsonl, defaults to a built-in corpus)")
+    parser.add_argument("--repeats", type=int, default=5, help="times to replay the corpus in the latency benchmark")
+    parser.add_argument("--script", metavar="PATH",
+                        help="run headless: take input from a .txt/.jsonl script or a WAV file instead of the microphone")
+    parser.add_argument("--fake", action="store_true",
+                        help="answer network and desktop integrations with local fakes in headless runs")
+    parser.add_argument("--latency", type=json.loads, metavar="JSON",
+                        help='fake integration latencies in seconds, e.g. \'{"asr": 0.5, "tts": 0.1}\'')
+    parser.add_argument("--sink", metavar="PATH", help="append headless replies to this JSONL file")
+    parser.add_argument("--serve", action="store_true",
+                        help="serve thin clients over TCP instead of using the local microphone")
+    parser.add_argument("--address", metavar="HOST:PORT",
+                        help="server address for --serve and --load-test (defaults to server_host/server_port)")
+    parser.add_argument("--load-test", type=int, metavar="N", help="simulate N concurrent clients against a running server")
+    parser.add_argument("--turns", type=int, default=10, help="turns per simulated client in the load test")
+    parser.add_argument("--import-wiki", metavar="PATH",
+                        help="bulk-load Wikipedia summaries from a JSONL file into the local store and exit")
+    parser.add_argument("--enroll-wake-word", type=int, metavar="N", help="record N wake word templates and exit")
+    args = parser.parse_args()
+    config = VoiceAssistant._load_config("config.json")
+    setup_logging(config)
+    
+    if args.benchmark:
+        import benchmarks
+    if args.benchmark == "dispatch":
+        benchmarks.benchmark_dispatch()
+        return
+    if args.benchmark == "contacts":
+        benchmarks.benchmark_contacts()
+        return
+    if args.benchmark == "startup":
+        benchmarks.benchmark_startup()
+        return
+    if args.benchmark == "turns":
+        benchmarks.benchmark_turns()
+        return
+    if args.benchmark == "streaming":
+        benchmarks.benchmark_streaming(args.repeats, args.latency)
+        return
+    if args.benchmark == "screenshot":
+        benchmarks.benchmark_screenshot()
+        return
+    if args.benchmark == "latency":
+        benchmarks.benchmark_latency(args.corpus, args.repeats, args.latency)
+        return
+    if args.benchmark == "wakeword":
+        templates = None if Path(args.fixtures, "templates").is_dir() else config['wake_word_dir']
+        benchmarks.benchmark_wake_word(args.fixtures, templates, config['wake_word_threshold'])
+        return
+    if args.script:
+        sink = CaptureSink(args.sink)
+        if args.fake:
+            from fakes import FakeIntegrations
+            fakes = FakeIntegrations(args.latency)
+            with fakes.install():
+                assistant = VoiceAssistant(headless=True, fakes=fakes, sink=sink)
+                results = assistant.run_script(load_script(args.script))
+                assistant.close()
+        else:
+            assistant = VoiceAssistant(headless=True, sink=sink)
+            results = assistant.run_script(load_script(args.script))
+            assistant.close()
+        for result in results:
+            print(f"{result.seconds * 1000:>8.1f} ms  {result.intent:<16} {result.command}")
+        return
+    if args.serve or args.load_test:
+        host, port = config['server_host'], config['server_port']
+        if args.address:
+            host, _, port = args.address.rpartition(':')
+            port = int(port)
+        if args.load_test:
+            from benchmarks import load_test
+            load_test(host, port, args.load_test, args.turns, args.corpus, config.get('server_token'))
+        elif args.fake:
+            from fakes import FakeIntegrations
+            fakes = FakeIntegrations(args.latency)
+            with fakes.install():
+                run_server(config, host, port, fakes)
+        else:
+            run_server(config, host, port)
+        return
+    if args.import_wiki:
+        store = WikiStore(config['wiki_store'], config['wiki_ttl_days'] * 86400)
+        print(f"Imported {store.import_jsonl(args.import_wiki)} Wikipedia summaries into {config['wiki_store']}")
+        store.close()
+        return
+    if args.enroll_wake_word:
+        VoiceAssistant().enroll_wake_word(args.enroll_wake_word)
+        return
+    
     try:
         assistant = VoiceAssistant()
         assistant.run()
@@ -555,4 +4615,7 @@ def main():
         print(f"Fatal error: {e}")
 
 if __name__ == "__main__":
-    main()
+    # fakes.py and benchmarks.py import this module as voiceAssistant; run main() from that
+    # module rather than from __main__, so they share its classes and integrations.
+    import voiceAssistant
+    voiceAssistant.main()